@@ -21,8 +21,8 @@ from app.models import (
     BulkDeal, BlockDeal,
     SurveillanceList, SurveillanceFundamentalFlags,
     SurveillancePriceMovement, SurveillancePriceVariation,
-    IndustryClassification, IndexConstituent, MarketHoliday, IngestionLog,
-    UpstoxToken, UpstoxInstrument, SymbolInstrumentMapping
+    IndustryClassification, IndexConstituent, MarketHoliday, IngestionLog, IngestionJob, IngestCache,
+    UpstoxToken, UpstoxInstrument, SymbolInstrumentMapping, UpstoxLoginJob
 )
 
 # this is the Alembic Config object, which provides
@@ -85,8 +85,11 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        # One transaction per revision so autocommit_block() (CREATE INDEX
+        # CONCURRENTLY) only breaks out of the revision that needs it
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            transaction_per_migration=True
         )
 
         with context.begin_transaction():
@@ -0,0 +1,47 @@
+"""use_timestamptz_for_audit_columns
+
+Revision ID: 0b7d3e9f5a28
+Revises: f2c8d4b6a913
+Create Date: 2026-10-16 16:12:39.405561
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7d3e9f5a28'
+down_revision = 'f2c8d4b6a913'
+branch_labels = None
+depends_on = None
+
+
+TIMESTAMP_COLUMNS = {
+    'upstox_tokens': ['expires_at', 'last_used_at', 'created_at', 'updated_at'],
+    'upstox_instruments': ['created_at', 'updated_at'],
+    'symbol_instrument_mapping': ['created_at'],
+    'upstox_login_jobs': ['expires_at', 'created_at', 'completed_at'],
+    'ingestion_logs': ['timestamp'],
+    'index_ohlcv_daily': ['created_at', 'updated_at'],
+}
+
+
+def _alter_types(table: str, columns, sql_type: str) -> None:
+    # Existing naive values were written via now() / aware datetimes converted
+    # to the session TimeZone, so a plain cast reinterprets them in that zone.
+    clauses = ", ".join(
+        f"ALTER COLUMN {column} TYPE {sql_type} USING {column}::{sql_type}" for column in columns
+    )
+    op.execute(f"ALTER TABLE {table} {clauses}")
+
+
+def upgrade() -> None:
+    # timestamptz matches now() and aware datetimes, so range filters like
+    # expires_at > now() compare without an implicit cast on the indexed column
+    for table, columns in TIMESTAMP_COLUMNS.items():
+        _alter_types(table, columns, 'timestamptz')
+
+
+def downgrade() -> None:
+    for table, columns in TIMESTAMP_COLUMNS.items():
+        _alter_types(table, columns, 'timestamp')
@@ -0,0 +1,31 @@
+"""partial_active_token_index
+
+Revision ID: 1f6a8c3e2d70
+Revises: 0b7d3e9f5a28
+Create Date: 2026-10-16 16:34:05.218447
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1f6a8c3e2d70'
+down_revision = '0b7d3e9f5a28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Token lookups always filter is_active = true; inactive rows only bloat the index
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_upstox_tokens_active_expires")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_upstox_tokens_active_expires "
+                   "ON upstox_tokens (expires_at DESC) WHERE is_active = true")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_upstox_tokens_active_expires")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_upstox_tokens_active_expires "
+                   "ON upstox_tokens (is_active, expires_at)")
@@ -0,0 +1,36 @@
+"""hash_index_for_instrument_isin
+
+Revision ID: 2a9d5f7b1c84
+Revises: 1f6a8c3e2d70
+Create Date: 2026-10-16 16:51:47.903126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a9d5f7b1c84'
+down_revision = '1f6a8c3e2d70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # Duplicates the btree behind the UNIQUE (instrument_key) constraint
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_upstox_instruments_instrument_key")
+
+        # ISIN is only matched by equality: HASH is smaller than the btree
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_upstox_instruments_isin")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_upstox_instruments_isin "
+                   "ON upstox_instruments USING HASH (isin)")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_upstox_instruments_isin")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_upstox_instruments_isin "
+                   "ON upstox_instruments (isin)")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_upstox_instruments_instrument_key "
+                   "ON upstox_instruments (instrument_key)")
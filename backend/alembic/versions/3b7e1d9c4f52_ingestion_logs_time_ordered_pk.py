@@ -0,0 +1,46 @@
+"""ingestion_logs_time_ordered_pk
+
+Revision ID: 3b7e1d9c4f52
+Revises: 2a9d5f7b1c84
+Create Date: 2026-10-16 17:09:12.573018
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e1d9c4f52'
+down_revision = '2a9d5f7b1c84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # timestamp becomes part of the primary key
+    op.execute("UPDATE ingestion_logs SET timestamp = now() WHERE timestamp IS NULL")
+
+    # (timestamp, id) PK: time-range reads and retention deletes walk the PK directly
+    op.execute(
+        "ALTER TABLE ingestion_logs "
+        "ALTER COLUMN timestamp SET NOT NULL, "
+        "DROP CONSTRAINT ingestion_logs_pkey, "
+        "ADD CONSTRAINT ingestion_logs_pkey PRIMARY KEY (timestamp, id)"
+    )
+
+    # Covered by the leading column of the new PK
+    op.execute("DROP INDEX IF EXISTS ix_ingestion_logs_timestamp")
+    op.execute("DROP INDEX IF EXISTS idx_ingestion_logs_timestamp")
+
+    # One-off physical sort; the table is small and append-only afterwards
+    op.execute("CLUSTER ingestion_logs USING ingestion_logs_pkey")
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_ingestion_logs_timestamp'), 'ingestion_logs', ['timestamp'], unique=False)
+    op.execute(
+        "ALTER TABLE ingestion_logs "
+        "DROP CONSTRAINT ingestion_logs_pkey, "
+        "ADD CONSTRAINT ingestion_logs_pkey PRIMARY KEY (id), "
+        "ALTER COLUMN timestamp DROP NOT NULL"
+    )
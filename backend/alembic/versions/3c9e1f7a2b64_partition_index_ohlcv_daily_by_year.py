@@ -0,0 +1,105 @@
+"""partition_index_ohlcv_daily_by_year
+
+Revision ID: 3c9e1f7a2b64
+Revises: 6ba5b534906f
+Create Date: 2026-10-16 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e1f7a2b64'
+down_revision = '6ba5b534906f'
+branch_labels = None
+depends_on = None
+
+# Yearly partitions; rows outside this window land in the DEFAULT partition
+PARTITION_START_YEAR = 2015
+PARTITION_END_YEAR = 2030
+
+
+def upgrade() -> None:
+    # Move the plain heap out of the way (index names are schema-global)
+    op.execute("ALTER TABLE index_ohlcv_daily RENAME TO index_ohlcv_daily_old")
+    op.execute("ALTER TABLE index_ohlcv_daily_old DROP CONSTRAINT uq_index_ohlcv_symbol_date")
+    op.execute("ALTER TABLE index_ohlcv_daily_old DROP CONSTRAINT index_ohlcv_daily_pkey")
+    op.drop_index('idx_index_ohlcv_symbol_date_desc', table_name='index_ohlcv_daily_old')
+    op.drop_index('idx_index_ohlcv_date', table_name='index_ohlcv_daily_old')
+
+    # Partitioned parent; unique constraints must include the partition key
+    op.execute("""
+        CREATE TABLE index_ohlcv_daily (
+            id BIGINT NOT NULL DEFAULT nextval('index_ohlcv_daily_id_seq'),
+            symbol VARCHAR(50) NOT NULL,
+            date DATE NOT NULL,
+            open NUMERIC(12, 2) NOT NULL,
+            high NUMERIC(12, 2) NOT NULL,
+            low NUMERIC(12, 2) NOT NULL,
+            close NUMERIC(12, 2) NOT NULL,
+            volume BIGINT,
+            created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+            updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+            CONSTRAINT index_ohlcv_daily_pkey PRIMARY KEY (id, date),
+            CONSTRAINT uq_index_ohlcv_symbol_date UNIQUE (date, symbol)
+        ) PARTITION BY RANGE (date)
+    """)
+    op.execute("COMMENT ON TABLE index_ohlcv_daily IS "
+               "'Daily OHLCV data for NSE indices (NIFTY 50, sectoral indices, etc.)'")
+    op.execute("ALTER SEQUENCE index_ohlcv_daily_id_seq OWNED BY index_ohlcv_daily.id")
+
+    for year in range(PARTITION_START_YEAR, PARTITION_END_YEAR + 1):
+        op.execute(
+            f"CREATE TABLE index_ohlcv_daily_y{year} PARTITION OF index_ohlcv_daily "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        )
+    op.execute("CREATE TABLE index_ohlcv_daily_default PARTITION OF index_ohlcv_daily DEFAULT")
+
+    # Indexes on the parent cascade to every partition as local indexes
+    op.create_index('idx_index_ohlcv_symbol_date_desc', 'index_ohlcv_daily', ['symbol', sa.text('date DESC')])
+    op.create_index('idx_index_ohlcv_date', 'index_ohlcv_daily', ['date'])
+
+    # Copy existing rows into the partitions and drop the old heap
+    op.execute("""
+        INSERT INTO index_ohlcv_daily (id, symbol, date, open, high, low, close, volume, created_at, updated_at)
+        SELECT id, symbol, date, open, high, low, close, volume, created_at, updated_at
+        FROM index_ohlcv_daily_old
+    """)
+    op.drop_table('index_ohlcv_daily_old')
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE index_ohlcv_daily RENAME TO index_ohlcv_daily_part")
+    op.execute("ALTER TABLE index_ohlcv_daily_part DROP CONSTRAINT uq_index_ohlcv_symbol_date")
+    op.execute("ALTER TABLE index_ohlcv_daily_part DROP CONSTRAINT index_ohlcv_daily_pkey")
+    op.drop_index('idx_index_ohlcv_symbol_date_desc', table_name='index_ohlcv_daily_part')
+    op.drop_index('idx_index_ohlcv_date', table_name='index_ohlcv_daily_part')
+
+    op.execute("""
+        CREATE TABLE index_ohlcv_daily (
+            id BIGINT NOT NULL DEFAULT nextval('index_ohlcv_daily_id_seq'),
+            symbol VARCHAR(50) NOT NULL,
+            date DATE NOT NULL,
+            open NUMERIC(12, 2) NOT NULL,
+            high NUMERIC(12, 2) NOT NULL,
+            low NUMERIC(12, 2) NOT NULL,
+            close NUMERIC(12, 2) NOT NULL,
+            volume BIGINT,
+            created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+            updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+            CONSTRAINT index_ohlcv_daily_pkey PRIMARY KEY (id),
+            CONSTRAINT uq_index_ohlcv_symbol_date UNIQUE (symbol, date)
+        )
+    """)
+    op.execute("ALTER SEQUENCE index_ohlcv_daily_id_seq OWNED BY index_ohlcv_daily.id")
+    op.create_index('idx_index_ohlcv_symbol_date_desc', 'index_ohlcv_daily', ['symbol', sa.text('date DESC')])
+    op.create_index('idx_index_ohlcv_date', 'index_ohlcv_daily', ['date'])
+
+    op.execute("""
+        INSERT INTO index_ohlcv_daily (id, symbol, date, open, high, low, close, volume, created_at, updated_at)
+        SELECT id, symbol, date, open, high, low, close, volume, created_at, updated_at
+        FROM index_ohlcv_daily_part
+    """)
+    # Dropping the parent drops all yearly partitions with it
+    op.drop_table('index_ohlcv_daily_part')
@@ -0,0 +1,35 @@
+"""recent_index_ohlcv_partial_index
+
+Revision ID: 4c2f8a6e9b13
+Revises: 3b7e1d9c4f52
+Create Date: 2026-10-16 17:27:40.118659
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c2f8a6e9b13'
+down_revision = '3b7e1d9c4f52'
+branch_labels = None
+depends_on = None
+
+
+# Index predicates must be immutable, so the window start is a literal
+# (aligned to a partition boundary). It is rolled forward by later revisions;
+# the current value lives in app/constants/index_ohlcv.py.
+RECENT_CUTOFF = '2024-01-01'
+
+
+def upgrade() -> None:
+    # Supplements idx_index_ohlcv_symbol_date_desc for 1Y/2Y reads (index-only on close/volume).
+    # Partitioned parents do not support CONCURRENTLY; the table is small.
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_index_ohlcv_recent ON index_ohlcv_daily "
+        f"(symbol, date DESC) INCLUDE (close, volume) WHERE date >= '{RECENT_CUTOFF}'"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_index_ohlcv_recent")
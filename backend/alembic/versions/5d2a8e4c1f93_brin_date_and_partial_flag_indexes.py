@@ -0,0 +1,43 @@
+"""brin_date_and_partial_flag_indexes
+
+Revision ID: 5d2a8e4c1f93
+Revises: 3c9e1f7a2b64
+Create Date: 2026-10-16 11:03:17.552910
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2a8e4c1f93'
+down_revision = '3c9e1f7a2b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # index_ohlcv_daily is append-only by date: BRIN is tiny and still prunes range scans
+    # (partitioned parents do not support CONCURRENTLY; the table is small)
+    op.drop_index('idx_index_ohlcv_date', table_name='index_ohlcv_daily')
+    op.execute("CREATE INDEX idx_index_ohlcv_date ON index_ohlcv_daily USING BRIN (date) WITH (pages_per_range = 32)")
+
+    # Screeners only ever look for flag = 1 on a given date.
+    # Built CONCURRENTLY (outside the migration transaction) to keep calculated_metrics writable.
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_metrics_volume_surge")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_metrics_volume_surge "
+                   "ON calculated_metrics (date) WHERE is_volume_surge = 1")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_metrics_ma_stacked "
+                   "ON calculated_metrics (date) WHERE is_ma_stacked = 1")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_metrics_ma_stacked")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_metrics_volume_surge")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_metrics_volume_surge "
+                   "ON calculated_metrics (is_volume_surge, date)")
+
+    op.drop_index('idx_index_ohlcv_date', table_name='index_ohlcv_daily')
+    op.create_index('idx_index_ohlcv_date', 'index_ohlcv_daily', ['date'])
@@ -0,0 +1,36 @@
+"""deferrable_mapping_fks
+
+Revision ID: 5e9b3c7a1d26
+Revises: 4c2f8a6e9b13
+Create Date: 2026-10-16 17:44:58.360271
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9b3c7a1d26'
+down_revision = '4c2f8a6e9b13'
+branch_labels = None
+depends_on = None
+
+
+MAPPING_FKS = [
+    'symbol_instrument_mapping_security_id_fkey',
+    'symbol_instrument_mapping_instrument_id_fkey',
+]
+
+
+def upgrade() -> None:
+    # Still checked per statement by default; bulk rebuilds opt in to
+    # commit-time checks with SET CONSTRAINTS ALL DEFERRED
+    op.execute("ALTER TABLE symbol_instrument_mapping " + ", ".join(
+        f"ALTER CONSTRAINT {name} DEFERRABLE INITIALLY IMMEDIATE" for name in MAPPING_FKS
+    ))
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE symbol_instrument_mapping " + ", ".join(
+        f"ALTER CONSTRAINT {name} NOT DEFERRABLE" for name in MAPPING_FKS
+    ))
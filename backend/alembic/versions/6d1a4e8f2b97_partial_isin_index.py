@@ -0,0 +1,31 @@
+"""partial_isin_index
+
+Revision ID: 6d1a4e8f2b97
+Revises: 5e9b3c7a1d26
+Create Date: 2026-10-16 17:58:21.774910
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d1a4e8f2b97'
+down_revision = '5e9b3c7a1d26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # isin is NULL for non-equity instruments; `isin = :value` implies the predicate
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_upstox_instruments_isin")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_upstox_instruments_isin "
+                   "ON upstox_instruments USING HASH (isin) WHERE isin IS NOT NULL")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_upstox_instruments_isin")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_upstox_instruments_isin "
+                   "ON upstox_instruments USING HASH (isin)")
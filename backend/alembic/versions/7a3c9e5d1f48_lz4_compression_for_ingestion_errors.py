@@ -0,0 +1,32 @@
+"""lz4_compression_for_ingestion_errors
+
+Revision ID: 7a3c9e5d1f48
+Revises: 6d1a4e8f2b97
+Create Date: 2026-10-16 18:12:06.491832
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3c9e5d1f48'
+down_revision = '6d1a4e8f2b97'
+branch_labels = None
+depends_on = None
+
+
+def _supports_lz4() -> bool:
+    # Column compression methods were added in PostgreSQL 14
+    return op.get_bind().dialect.server_version_info >= (14, 0)
+
+
+def upgrade() -> None:
+    # Applies to newly written values only; existing rows keep pglz until rewritten
+    if _supports_lz4():
+        op.execute("ALTER TABLE ingestion_logs ALTER COLUMN errors SET COMPRESSION lz4")
+
+
+def downgrade() -> None:
+    if _supports_lz4():
+        op.execute("ALTER TABLE ingestion_logs ALTER COLUMN errors SET COMPRESSION default")
@@ -0,0 +1,39 @@
+"""roll_index_ohlcv_recent_cutoff_2025
+
+Revision ID: 7e3b9d2f1a46
+Revises: a1d7c4e8f205
+Create Date: 2026-10-17 15:42:08.316274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e3b9d2f1a46'
+down_revision = 'a1d7c4e8f205'
+branch_labels = None
+depends_on = None
+
+
+# Frozen copies of app.constants.index_ohlcv.INDEX_OHLCV_RECENT_CUTOFF before
+# and after this roll-forward; next year, copy this revision with new values.
+PREVIOUS_CUTOFF = '2024-01-01'
+RECENT_CUTOFF = '2025-01-01'
+
+
+def _recreate_recent_index(cutoff: str) -> None:
+    # Partitioned parents do not support CONCURRENTLY; the table is small.
+    op.execute("DROP INDEX IF EXISTS idx_index_ohlcv_recent")
+    op.execute(
+        "CREATE INDEX idx_index_ohlcv_recent ON index_ohlcv_daily "
+        f"(symbol, date DESC) INCLUDE (close, volume) WHERE date >= '{cutoff}'"
+    )
+
+
+def upgrade() -> None:
+    _recreate_recent_index(RECENT_CUTOFF)
+
+
+def downgrade() -> None:
+    _recreate_recent_index(PREVIOUS_CUTOFF)
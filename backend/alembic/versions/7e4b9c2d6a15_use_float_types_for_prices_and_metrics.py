@@ -0,0 +1,98 @@
+"""use_float_types_for_prices_and_metrics
+
+Revision ID: 7e4b9c2d6a15
+Revises: 5d2a8e4c1f93
+Create Date: 2026-10-16 11:41:08.904377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e4b9c2d6a15'
+down_revision = '5d2a8e4c1f93'
+branch_labels = None
+depends_on = None
+
+
+INDEX_OHLCV_COLUMNS = {
+    'open': sa.Numeric(precision=12, scale=2),
+    'high': sa.Numeric(precision=12, scale=2),
+    'low': sa.Numeric(precision=12, scale=2),
+    'close': sa.Numeric(precision=12, scale=2),
+}
+
+# Bounded 0-100 metrics fit in REAL (4 bytes)
+METRICS_REAL_COLUMNS = {
+    'rs_percentile': sa.Numeric(precision=5, scale=2),
+    'darvas_position_percent': sa.Numeric(precision=10, scale=4),
+}
+
+# Unbounded metrics go to DOUBLE PRECISION (8 bytes)
+METRICS_DOUBLE_COLUMNS = {
+    'change_1d_percent': sa.Numeric(precision=10, scale=4),
+    'change_1d_value': sa.Numeric(precision=12, scale=2),
+    'change_1w_percent': sa.Numeric(precision=10, scale=4),
+    'change_1m_percent': sa.Numeric(precision=10, scale=4),
+    'change_3m_percent': sa.Numeric(precision=10, scale=4),
+    'change_6m_percent': sa.Numeric(precision=10, scale=4),
+    'vars_score': sa.Numeric(precision=10, scale=4),
+    'varw_score': sa.Numeric(precision=10, scale=4),
+    'atr_14': sa.Numeric(precision=10, scale=4),
+    'atr_percent': sa.Numeric(precision=10, scale=4),
+    'adr_percent': sa.Numeric(precision=10, scale=4),
+    'today_range_percent': sa.Numeric(precision=10, scale=4),
+    'rvol': sa.Numeric(precision=10, scale=4),
+    'ema_10': sa.Numeric(precision=10, scale=4),
+    'sma_20': sa.Numeric(precision=10, scale=4),
+    'sma_50': sa.Numeric(precision=10, scale=4),
+    'sma_100': sa.Numeric(precision=10, scale=4),
+    'sma_200': sa.Numeric(precision=10, scale=4),
+    'distance_from_ema10_percent': sa.Numeric(precision=10, scale=4),
+    'distance_from_sma50_percent': sa.Numeric(precision=10, scale=4),
+    'distance_from_sma200_percent': sa.Numeric(precision=10, scale=4),
+    'atr_extension_from_sma50': sa.Numeric(precision=10, scale=4),
+    'lod_atr_percent': sa.Numeric(precision=10, scale=4),
+    'darvas_20d_high': sa.Numeric(precision=15, scale=2),
+    'darvas_20d_low': sa.Numeric(precision=15, scale=2),
+    'orh_proxy': sa.Numeric(precision=15, scale=2),
+    'mcclellan_oscillator': sa.Numeric(precision=10, scale=4),
+    'mcclellan_summation': sa.Numeric(precision=12, scale=4),
+    'rs_ratio': sa.Numeric(precision=10, scale=4),
+    'rs_momentum': sa.Numeric(precision=10, scale=4),
+}
+
+
+def _alter_types(table: str, column_types: dict) -> None:
+    # One ALTER TABLE so the table is rewritten once, not once per column
+    clauses = ", ".join(
+        f"ALTER COLUMN {column} TYPE {sql_type} USING {column}::{sql_type}"
+        for column, sql_type in column_types.items()
+    )
+    op.execute(f"ALTER TABLE {table} {clauses}")
+
+
+def _numeric(numeric_type: sa.Numeric) -> str:
+    return f"numeric({numeric_type.precision}, {numeric_type.scale})"
+
+
+def upgrade() -> None:
+    # Index OHLC values (ALTER on the partitioned parent cascades to partitions)
+    _alter_types('index_ohlcv_daily', {column: 'double precision' for column in INDEX_OHLCV_COLUMNS})
+
+    # Calculated metrics
+    _alter_types('calculated_metrics', {
+        **{column: 'real' for column in METRICS_REAL_COLUMNS},
+        **{column: 'double precision' for column in METRICS_DOUBLE_COLUMNS},
+    })
+
+
+def downgrade() -> None:
+    _alter_types('calculated_metrics', {
+        column: _numeric(numeric_type)
+        for column, numeric_type in {**METRICS_REAL_COLUMNS, **METRICS_DOUBLE_COLUMNS}.items()
+    })
+    _alter_types('index_ohlcv_daily', {
+        column: _numeric(numeric_type) for column, numeric_type in INDEX_OHLCV_COLUMNS.items()
+    })
@@ -0,0 +1,36 @@
+"""add_ingestion_jobs_table
+
+Revision ID: 8b4d2f6a1c39
+Revises: 7a3c9e5d1f48
+Create Date: 2026-10-17 09:14:37.205816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4d2f6a1c39'
+down_revision = '7a3c9e5d1f48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Background NSE ingestion runs, polled via /ingest/status/{job_id}
+    op.create_table(
+        'ingestion_jobs',
+        sa.Column('id', sa.String(length=36), nullable=False, comment='Job identifier (UUID4)'),
+        sa.Column('source', sa.String(length=50), nullable=False,
+                  comment="Ingestion source (e.g., 'nse_securities', 'nse_bulk_deals')"),
+        sa.Column('status', sa.String(length=20), nullable=False, comment='pending, running, success, failed'),
+        sa.Column('message', sa.Text(), nullable=True, comment='Outcome summary'),
+        sa.Column('result', sa.JSON(), nullable=True, comment='Result dict returned by the ingestion service'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True, comment='When the job reached success/failed'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ingestion_jobs')
@@ -0,0 +1,71 @@
+"""pack_metric_flags_into_bitmask
+
+Revision ID: 9a6f3d1b8e27
+Revises: 7e4b9c2d6a15
+Create Date: 2026-10-16 12:26:53.117640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a6f3d1b8e27'
+down_revision = '7e4b9c2d6a15'
+branch_labels = None
+depends_on = None
+
+
+# Bit positions (mirrors app/constants/indicator_flags.py at the time of writing)
+FLAG_BITS = {
+    'is_volume_surge': 1 << 0,
+    'is_ma_stacked': 1 << 1,
+    'is_lod_tight': 1 << 2,
+    'is_new_20d_high': 1 << 3,
+    'is_new_20d_low': 1 << 4,
+    'is_m30_reclaim': 1 << 5,
+    'is_green_candle': 1 << 6,
+}
+
+
+def upgrade() -> None:
+    op.add_column('calculated_metrics', sa.Column(
+        'indicator_flags', sa.SmallInteger(), server_default=sa.text('0'), nullable=False,
+        comment='Bitmask of boolean screener flags (see app.constants.indicator_flags)'))
+
+    # Populate from the per-flag integer columns
+    packed = ' | '.join(
+        f"(CASE WHEN {column} = 1 THEN {bit} ELSE 0 END)" for column, bit in FLAG_BITS.items()
+    )
+    op.execute(f"UPDATE calculated_metrics SET indicator_flags = {packed}")
+
+    # Rebuild partial indexes on the bitmask without blocking writes
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_metrics_volume_surge")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_metrics_ma_stacked")
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_metrics_volume_surge ON calculated_metrics (date) "
+                   f"WHERE (indicator_flags & {FLAG_BITS['is_volume_surge']}) <> 0")
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_metrics_ma_stacked ON calculated_metrics (date) "
+                   f"WHERE (indicator_flags & {FLAG_BITS['is_ma_stacked']}) <> 0")
+
+    op.execute("ALTER TABLE calculated_metrics " + ", ".join(f"DROP COLUMN {column}" for column in FLAG_BITS))
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE calculated_metrics " + ", ".join(f"ADD COLUMN {column} integer" for column in FLAG_BITS))
+
+    assignments = ', '.join(
+        f"{column} = CASE WHEN (indicator_flags & {bit}) <> 0 THEN 1 ELSE 0 END"
+        for column, bit in FLAG_BITS.items()
+    )
+    op.execute(f"UPDATE calculated_metrics SET {assignments}")
+
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_metrics_ma_stacked")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_metrics_volume_surge")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_metrics_volume_surge "
+                   "ON calculated_metrics (date) WHERE is_volume_surge = 1")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_metrics_ma_stacked "
+                   "ON calculated_metrics (date) WHERE is_ma_stacked = 1")
+
+    op.drop_column('calculated_metrics', 'indicator_flags')
@@ -0,0 +1,29 @@
+"""add_ingestion_jobs_idempotency_key
+
+Revision ID: 9c5e3a7b2d14
+Revises: 8b4d2f6a1c39
+Create Date: 2026-10-17 11:02:51.638240
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c5e3a7b2d14'
+down_revision = '8b4d2f6a1c39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Duplicate ingest triggers are matched on this key instead of re-running
+    op.add_column('ingestion_jobs', sa.Column(
+        'idempotency_key', sa.String(length=64), nullable=True,
+        comment='sha256 of the Idempotency-Key header, or of source + parameters'))
+    op.create_index('ix_ingestion_jobs_idempotency_key', 'ingestion_jobs', ['idempotency_key'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ingestion_jobs_idempotency_key', table_name='ingestion_jobs')
+    op.drop_column('ingestion_jobs', 'idempotency_key')
@@ -0,0 +1,33 @@
+"""add_ingest_cache_table
+
+Revision ID: a1d7c4e8f205
+Revises: 9c5e3a7b2d14
+Create Date: 2026-10-17 12:14:37.502918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d7c4e8f205'
+down_revision = '9c5e3a7b2d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ingest_cache',
+        sa.Column('url', sa.Text(), nullable=False, comment='NSE archive URL'),
+        sa.Column('etag', sa.Text(), nullable=True, comment='ETag of the ingested download'),
+        sa.Column('last_modified', sa.Text(), nullable=True, comment='Last-Modified of the ingested download'),
+        sa.Column('content_hash', sa.String(length=64), nullable=True, comment='sha256 of the ingested response body'),
+        sa.Column('fetched_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False,
+                  comment='When the download was ingested'),
+        sa.PrimaryKeyConstraint('url')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ingest_cache')
@@ -0,0 +1,35 @@
+"""add_upstox_login_jobs_table
+
+Revision ID: b18e5c7a3d42
+Revises: 9a6f3d1b8e27
+Create Date: 2026-10-16 13:08:22.640193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b18e5c7a3d42'
+down_revision = '9a6f3d1b8e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Background Playwright login runs, polled via /auth/upstox/token-status?job_id=
+    op.create_table(
+        'upstox_login_jobs',
+        sa.Column('id', sa.String(length=36), nullable=False, comment='Job identifier (UUID4)'),
+        sa.Column('status', sa.String(length=20), nullable=False, comment='pending, running, success, failed'),
+        sa.Column('message', sa.Text(), nullable=True, comment='Status message from the login flow'),
+        sa.Column('errors', sa.JSON(), nullable=True, comment='JSON array of error strings if login failed'),
+        sa.Column('expires_at', sa.DateTime(), nullable=True, comment='Expiry of the token obtained by this job'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True, comment='When the job reached success/failed'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('upstox_login_jobs')
@@ -0,0 +1,49 @@
+"""add_covering_screener_index
+
+Revision ID: c4a7e2f9b316
+Revises: b18e5c7a3d42
+Create Date: 2026-10-16 13:47:35.208816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a7e2f9b316'
+down_revision = 'b18e5c7a3d42'
+branch_labels = None
+depends_on = None
+
+
+# Columns read by the screener endpoints for a single date slice
+SCREENER_INCLUDE_COLUMNS = [
+    'id', 'stage', 'stage_detail', 'rs_percentile', 'vars_score', 'varw_score',
+    'change_1d_percent', 'change_1w_percent', 'change_1m_percent',
+    'rvol', 'volume_50d_avg', 'atr_percent', 'adr_percent',
+    'atr_extension_from_sma50', 'lod_atr_percent', 'darvas_position_percent',
+    'vcp_score', 'indicator_flags',
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # Covering index so per-date screener scans are index-only
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_metrics_screener "
+            "ON calculated_metrics (date DESC, symbol) "
+            f"INCLUDE ({', '.join(SCREENER_INCLUDE_COLUMNS)})"
+        )
+
+        # Screeners never sort by these metrics without a date filter
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_metrics_vars_desc")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_metrics_rs_percentile_desc")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_metrics_rs_percentile_desc "
+                   "ON calculated_metrics (rs_percentile DESC)")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_metrics_vars_desc "
+                   "ON calculated_metrics (vars_score DESC)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_metrics_screener")
@@ -0,0 +1,36 @@
+"""drop_redundant_upstox_indexes
+
+Revision ID: d83b6f0c2e59
+Revises: c4a7e2f9b316
+Create Date: 2026-10-16 14:20:11.734952
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd83b6f0c2e59'
+down_revision = 'c4a7e2f9b316'
+branch_labels = None
+depends_on = None
+
+
+# index name -> (table, column); each is the leading column of a composite index
+REDUNDANT_INDEXES = {
+    'ix_upstox_instruments_symbol': ('upstox_instruments', 'symbol'),              # idx_upstox_instr_symbol_exchange
+    'ix_symbol_instrument_mapping_symbol': ('symbol_instrument_mapping', 'symbol'),  # idx_mapping_symbol_instrument
+    'ix_upstox_tokens_is_active': ('upstox_tokens', 'is_active'),                  # idx_upstox_tokens_active_expires
+}
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name in REDUNDANT_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name, (table, column) in REDUNDANT_INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table} ({column})")
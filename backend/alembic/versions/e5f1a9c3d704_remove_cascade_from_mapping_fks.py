@@ -0,0 +1,44 @@
+"""remove_cascade_from_mapping_fks
+
+Revision ID: e5f1a9c3d704
+Revises: d83b6f0c2e59
+Create Date: 2026-10-16 14:58:46.091327
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f1a9c3d704'
+down_revision = 'd83b6f0c2e59'
+branch_labels = None
+depends_on = None
+
+
+# constraint name -> (local column, referent table)
+MAPPING_FKS = {
+    'symbol_instrument_mapping_security_id_fkey': ('security_id', 'securities'),
+    'symbol_instrument_mapping_instrument_id_fkey': ('instrument_id', 'upstox_instruments'),
+}
+
+
+def _recreate_fks(ondelete) -> None:
+    for name, (column, referent) in MAPPING_FKS.items():
+        op.drop_constraint(name, 'symbol_instrument_mapping', type_='foreignkey')
+        # NOT VALID + VALIDATE avoids holding the strong lock during the scan
+        op.execute(
+            f"ALTER TABLE symbol_instrument_mapping ADD CONSTRAINT {name} "
+            f"FOREIGN KEY ({column}) REFERENCES {referent} (id)"
+            f"{' ON DELETE ' + ondelete if ondelete else ''} NOT VALID"
+        )
+        op.execute(f"ALTER TABLE symbol_instrument_mapping VALIDATE CONSTRAINT {name}")
+
+
+def upgrade() -> None:
+    # Mapping rows are regenerated by create_symbol_mappings(); no cascade triggers needed
+    _recreate_fks(ondelete=None)
+
+
+def downgrade() -> None:
+    _recreate_fks(ondelete='CASCADE')
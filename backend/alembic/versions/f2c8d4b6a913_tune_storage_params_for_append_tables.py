@@ -0,0 +1,44 @@
+"""tune_storage_params_for_append_tables
+
+Revision ID: f2c8d4b6a913
+Revises: e5f1a9c3d704
+Create Date: 2026-10-16 15:31:02.877415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8d4b6a913'
+down_revision = 'e5f1a9c3d704'
+branch_labels = None
+depends_on = None
+
+
+def _set_on_index_ohlcv_partitions(storage_clause: str) -> None:
+    # Storage parameters cannot be set on a partitioned parent, only on its partitions
+    op.execute(f"""
+        DO $$
+        DECLARE part regclass;
+        BEGIN
+            FOR part IN SELECT inhrelid::regclass FROM pg_inherits
+                        WHERE inhparent = 'index_ohlcv_daily'::regclass
+            LOOP
+                EXECUTE format('ALTER TABLE %s {storage_clause}', part);
+            END LOOP;
+        END $$;
+    """)
+
+
+def upgrade() -> None:
+    # Append-only log: pack pages fully, vacuum early to keep bloat bounded
+    op.execute("ALTER TABLE ingestion_logs SET (fillfactor = 100, autovacuum_vacuum_scale_factor = 0.02)")
+
+    # Leave a little room for HOT updates of updated_at on re-ingested days
+    _set_on_index_ohlcv_partitions("SET (fillfactor = 95)")
+
+
+def downgrade() -> None:
+    _set_on_index_ohlcv_partitions("RESET (fillfactor)")
+    op.execute("ALTER TABLE ingestion_logs RESET (fillfactor, autovacuum_vacuum_scale_factor)")
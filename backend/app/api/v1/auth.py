@@ -4,30 +4,87 @@ Authentication API endpoints.
 This module provides endpoints for Upstox authentication and token management.
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select, text
 from sqlalchemy.orm import Session
-from app.database.session import get_db
-from app.schemas.upstox import UpstoxLoginRequest, UpstoxLoginResponse
-from app.services.upstox.auth_service import automate_upstox_login
-from app.services.upstox.token_manager import UpstoxTokenManager
-from app.services.upstox.upstox_client import UpstoxClient
-from app.models.upstox import SymbolInstrumentMapping
-import requests
-from datetime import datetime, timedelta
+from app.database.session import AsyncSessionLocal, get_db
+from app.schemas.upstox import UpstoxLoginRequest, UpstoxLoginJobResponse
+from app.services.upstox.auth_service import run_upstox_login_job
+from app.services.upstox.token_manager import get_cached_token_info
+from app.services.upstox.upstox_client import get_coalesced, get_http_client, get_upstox_headers
+from app.services.upstox.instrument_service import get_symbol_instrument_map
+from app.models.upstox import UpstoxLoginJob
+from app.utils.etag import cache_headers, compute_etag, not_modified_response
+import asyncio
+import httpx
+import orjson
+from functools import wraps
+from cachetools import TTLCache
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional
+from uuid import uuid4
 
 
 router = APIRouter()
 
+# Upstox holiday lists change rarely; keep successful responses (and their ETag) per date for 6 hours
+HOLIDAYS_MAX_AGE = 6 * 60 * 60
+_HOLIDAYS_CACHE = TTLCache(maxsize=64, ttl=HOLIDAYS_MAX_AGE)
 
-@router.post("/upstox/login", response_model=UpstoxLoginResponse)
+# A pending/running login job older than this is treated as abandoned
+# (e.g. the process restarted mid-login) and no longer blocks new logins
+LOGIN_JOB_STALE_AFTER = timedelta(minutes=10)
+
+
+def upstox_errors(message: str):
+    """
+    Turn unexpected errors in an Upstox endpoint into a 500 with `message`.
+
+    HTTPExceptions raised by the endpoint (e.g. 404 for unknown symbols)
+    pass through unchanged.
+    """
+    def decorator(endpoint):
+        @wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500,
+                    detail={"message": message, "error": str(e)}
+                )
+        return wrapper
+    return decorator
+
+
+def get_symbol_map(db: Session = Depends(get_db)) -> Dict[str, str]:
+    """FastAPI dependency returning the symbol -> instrument_key map (reloaded when mappings change)."""
+    return get_symbol_instrument_map(db)
+
+
+def _job_response(job: UpstoxLoginJob) -> UpstoxLoginJobResponse:
+    """Build the API view of a login job row (trusted DB values, no validation)."""
+    return UpstoxLoginJobResponse.model_construct(
+        job_id=job.id,
+        status=job.status,
+        message=job.message,
+        expires_at=job.expires_at,
+        errors=job.errors
+    )
+
+
+@router.post("/upstox/login", response_model=UpstoxLoginJobResponse, status_code=202)
 async def login_upstox(
     request: UpstoxLoginRequest,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks
 ):
     """
-    Automate Upstox login using Playwright and TOTP.
+    Start automated Upstox login (Playwright + TOTP) as a background job.
 
-    This endpoint uses headless browser automation to:
+    The browser flow takes 10-30 seconds, so it runs after the response is sent:
     1. Navigate to Upstox authorization dialog
     2. Enter mobile number
     3. Generate and enter TOTP-based OTP
@@ -36,64 +93,125 @@ async def login_upstox(
     6. Exchange code for access token
     7. Store token in database with 23:59 IST expiry
 
-    **Returns:**
-    - success: Whether authentication succeeded
-    - message: Status message
-    - access_token: Current access token (masked for security)
-    - expires_at: Token expiration time (23:59 IST)
-    - errors: List of errors if failed
+    Only one login runs at a time: while a job is pending/running, repeated
+    calls return that job instead of launching another browser session
+    (retry storms against the Upstox login page risk an IP block).
+
+    **Returns (202 Accepted):**
+    - job_id: Poll `/upstox/login/status/<job_id>` for the outcome
+    - status: "pending" for a new job, or the in-flight job's status
 
     **Note:** This endpoint is for internal use only (n8n workflows, manual refresh).
     """
-
-    result = await automate_upstox_login(
-        mobile=request.mobile,
-        pin=request.pin,
-        totp_secret=request.totp_secret,
-        db=db
+    job_id = str(uuid4())
+    # AsyncSession: the lock wait must not block the event loop, and the
+    # session is opened only around the check-then-insert
+    async with AsyncSessionLocal() as db:
+        # Serialise the check-then-insert across requests and workers: a
+        # concurrent caller waits here and then sees this job as in flight.
+        # Released when the transaction commits (or rolls back on close).
+        await db.execute(text("SELECT pg_advisory_xact_lock(hashtext('upstox_login'))"))
+        in_flight = (await db.execute(
+            select(UpstoxLoginJob)
+            .where(
+                UpstoxLoginJob.status.in_(("pending", "running")),
+                UpstoxLoginJob.created_at > datetime.now(timezone.utc) - LOGIN_JOB_STALE_AFTER
+            )
+            .order_by(UpstoxLoginJob.created_at.desc())
+            .limit(1)
+        )).scalars().first()
+        if in_flight is not None:
+            return _job_response(in_flight)
+
+        db.add(UpstoxLoginJob(id=job_id, status="pending"))
+        await db.commit()
+
+    background_tasks.add_task(
+        run_upstox_login_job,
+        job_id,
+        request.mobile,
+        request.pin,
+        request.totp_secret
     )
 
-    if not result["success"]:
+    # Values are produced here, not by the client: skip re-validation
+    return UpstoxLoginJobResponse.model_construct(job_id=job_id, status="pending", message="Login job queued")
+
+
+@router.get("/upstox/login/status/{job_id}", response_model=UpstoxLoginJobResponse)
+async def get_login_job_status(job_id: str, db: Session = Depends(get_db)):
+    """
+    Get the state of a background login job.
+
+    **Returns:**
+    - status: pending, running, success or failed
+    - message / errors: Outcome of the login flow
+    - expires_at: Expiry of the token obtained (on success)
+    """
+    job = db.get(UpstoxLoginJob, job_id)
+    if job is None:
         raise HTTPException(
-            status_code=401,
-            detail={
-                "message": result["message"],
-                "errors": result.get("errors", [])
-            }
+            status_code=404,
+            detail={"message": f"Login job {job_id} not found"}
         )
-
-    return UpstoxLoginResponse(**result)
+    return _job_response(job)
 
 
 @router.get("/upstox/token-status")
-async def get_token_status(db: Session = Depends(get_db)):
+async def get_token_status(
+    job_id: Optional[str] = Query(None, description="Login job id returned by POST /upstox/login"),
+    db: Session = Depends(get_db)
+):
     """
     Get current Upstox token status.
 
+    **Query Parameters:**
+    - job_id: Optional login job id; includes that job's state in the response
+
     **Returns:**
     - Token metadata (masked) if active token exists
     - null if no active token
+    - job: Login job state when job_id is given
 
     **Use case:** Check if token refresh is needed before making API calls
+
+    **Note:** Token info is cached in-process for 60s (cleared when a new token is stored).
     """
+    job_state = None
+    if job_id:
+        job = db.get(UpstoxLoginJob, job_id)
+        if job is None:
+            raise HTTPException(
+                status_code=404,
+                detail={"message": f"Login job {job_id} not found"}
+            )
+        job_state = _job_response(job)
 
-    token_manager = UpstoxTokenManager(db)
-    token_info = token_manager.get_token_info()
+    token_info = get_cached_token_info(db)
 
     if not token_info:
-        return {
+        response = {
             "active": False,
             "message": "No active token found. Please login."
         }
+    else:
+        response = {
+            "active": True,
+            "token_info": token_info
+        }
 
-    return {
-        "active": True,
-        "token_info": token_info
-    }
+    if job_state is not None:
+        response["job"] = job_state
+
+    return response
 
 
 @router.get("/upstox/test-api")
-async def test_upstox_api(db: Session = Depends(get_db)):
+@upstox_errors("Failed to test Upstox API")
+async def test_upstox_api(
+    client: httpx.AsyncClient = Depends(get_http_client),
+    headers: Dict[str, str] = Depends(get_upstox_headers)
+):
     """
     Test endpoint to verify Upstox API token works.
 
@@ -104,46 +222,32 @@ async def test_upstox_api(db: Session = Depends(get_db)):
     - API response data
     - Token validity confirmation
     """
-    try:
-        upstox_client = UpstoxClient(db)
-        headers = upstox_client.get_headers()
-
-        # Test API call: Get user profile
-        response = requests.get(
-            "https://api.upstox.com/v2/user/profile",
-            headers=headers,
-            timeout=10
-        )
+    # Test API call: Get user profile
+    response = await client.get("/v2/user/profile", headers=headers)
 
-        if response.status_code == 200:
-            return {
-                "success": True,
-                "message": "Upstox API token is valid",
-                "token_valid": True,
-                "user_profile": response.json()
-            }
-        else:
-            return {
-                "success": False,
-                "message": f"Upstox API returned error: {response.status_code}",
-                "token_valid": False,
-                "error": response.text
-            }
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "message": "Failed to test Upstox API",
-                "error": str(e)
-            }
-        )
+    if response.status_code == 200:
+        return {
+            "success": True,
+            "message": "Upstox API token is valid",
+            "token_valid": True,
+            "user_profile": response.json()
+        }
+    else:
+        return {
+            "success": False,
+            "message": f"Upstox API returned error: {response.status_code}",
+            "token_valid": False,
+            "error": response.text
+        }
 
 
 @router.get("/upstox/test-market-quotes")
+@upstox_errors("Failed to fetch market quote")
 async def test_market_quotes(
     symbol: str = "RELIANCE",
-    db: Session = Depends(get_db)
+    client: httpx.AsyncClient = Depends(get_http_client),
+    headers: Dict[str, str] = Depends(get_upstox_headers),
+    symbol_map: Dict[str, str] = Depends(get_symbol_map)
 ):
     """
     Test endpoint to fetch market quotes for a symbol.
@@ -154,56 +258,46 @@ async def test_market_quotes(
     **Returns:**
     - Latest market quote (OHLC, LTP, volume, etc.)
     """
-    try:
-        upstox_client = UpstoxClient(db)
-        headers = upstox_client.get_headers()
-
-        # Get instrument_key for symbol from mapping
-        mapping = db.query(SymbolInstrumentMapping).filter(
-            SymbolInstrumentMapping.symbol == symbol
-        ).first()
+    # Resolve instrument_key from the in-memory map (reloaded when mappings change)
+    instrument_key = symbol_map.get(symbol)
 
-        if not mapping:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No instrument mapping found for symbol: {symbol}"
-            )
-
-        instrument_key = mapping.instrument_key
-
-        # Fetch market quote
-        response = requests.get(
-            f"https://api.upstox.com/v2/market-quote/quotes?instrument_key={instrument_key}",
-            headers=headers,
-            timeout=10
+    if not instrument_key:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No instrument mapping found for symbol: {symbol}"
         )
 
-        if response.status_code == 200:
-            return {
-                "success": True,
-                "symbol": symbol,
-                "instrument_key": instrument_key,
-                "quote_data": response.json()
-            }
-        else:
-            return {
-                "success": False,
-                "error": response.text
-            }
+    # Fetch market quote (concurrent identical requests share one upstream call)
+    response = await get_coalesced(
+        client,
+        "/v2/market-quote/quotes",
+        params={"instrument_key": instrument_key},
+        headers=headers
+    )
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={"message": "Failed to fetch market quote", "error": str(e)}
-        )
+    if response.status_code == 200:
+        return {
+            "success": True,
+            "symbol": symbol,
+            "instrument_key": instrument_key,
+            "quote_data": response.json()
+        }
+    else:
+        return {
+            "success": False,
+            "error": response.text
+        }
 
 
 @router.get("/upstox/test-historical-data")
+@upstox_errors("Failed to fetch historical data")
 async def test_historical_data(
     symbol: str = "RELIANCE",
     interval: str = "day",
     to_date: str = "2025-12-04",
-    db: Session = Depends(get_db)
+    client: httpx.AsyncClient = Depends(get_http_client),
+    headers: Dict[str, str] = Depends(get_upstox_headers),
+    symbol_map: Dict[str, str] = Depends(get_symbol_map)
 ):
     """
     Test endpoint to fetch historical candle data.
@@ -216,61 +310,57 @@ async def test_historical_data(
     **Returns:**
     - Historical OHLCV data
     """
-    try:
-        upstox_client = UpstoxClient(db)
-        headers = upstox_client.get_headers()
-
-        # Get instrument_key for symbol
-        mapping = db.query(SymbolInstrumentMapping).filter(
-            SymbolInstrumentMapping.symbol == symbol
-        ).first()
-
-        if not mapping:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No instrument mapping found for symbol: {symbol}"
-            )
-
-        instrument_key = mapping.instrument_key
-
-        # Calculate from_date (30 days back)
-        to_dt = datetime.strptime(to_date, "%Y-%m-%d")
-        from_dt = to_dt - timedelta(days=30)
-        from_date = from_dt.strftime("%Y-%m-%d")
-
-        # Fetch historical data
-        url = f"https://api.upstox.com/v2/historical-candle/{instrument_key}/{interval}/{to_date}/{from_date}"
-        response = requests.get(url, headers=headers, timeout=10)
+    # Resolve instrument_key from the in-memory map (reloaded when mappings change)
+    instrument_key = symbol_map.get(symbol)
 
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                "success": True,
-                "symbol": symbol,
-                "instrument_key": instrument_key,
-                "interval": interval,
-                "from_date": from_date,
-                "to_date": to_date,
-                "candles_count": len(data.get("data", {}).get("candles", [])),
-                "historical_data": data
-            }
-        else:
-            return {
-                "success": False,
-                "error": response.text
-            }
+    if not instrument_key:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No instrument mapping found for symbol: {symbol}"
+        )
 
-    except Exception as e:
+    # Calculate from_date (30 days back)
+    try:
+        from_date = (date.fromisoformat(to_date) - timedelta(days=30)).isoformat()
+    except ValueError:
         raise HTTPException(
-            status_code=500,
-            detail={"message": "Failed to fetch historical data", "error": str(e)}
+            status_code=400,
+            detail=f"Invalid to_date '{to_date}', expected YYYY-MM-DD"
         )
 
+    # Fetch historical data
+    url = f"/v2/historical-candle/{instrument_key}/{interval}/{to_date}/{from_date}"
+    response = await get_coalesced(client, url, headers=headers)
+
+    if response.status_code == 200:
+        # Parse and re-encode with orjson and return the response directly so
+        # the candle arrays skip jsonable_encoder's per-element walk
+        data = orjson.loads(response.content)
+        return ORJSONResponse({
+            "success": True,
+            "symbol": symbol,
+            "instrument_key": instrument_key,
+            "interval": interval,
+            "from_date": from_date,
+            "to_date": to_date,
+            "candles_count": len(data.get("data", {}).get("candles", [])),
+            "historical_data": data
+        })
+    else:
+        return {
+            "success": False,
+            "error": response.text
+        }
+
 
 @router.get("/upstox/test-market-holidays")
+@upstox_errors("Failed to fetch market holidays")
 async def test_market_holidays(
+    request: Request,
+    response: Response,
     date: str = "2025-12-04",
-    db: Session = Depends(get_db)
+    client: httpx.AsyncClient = Depends(get_http_client),
+    headers: Dict[str, str] = Depends(get_upstox_headers)
 ):
     """
     Test endpoint to fetch market holidays.
@@ -279,33 +369,98 @@ async def test_market_holidays(
     - date: Date in YYYY-MM-DD format
 
     **Returns:**
-    - List of market holidays
+    - List of market holidays (cached per date for 6 hours)
+    - ETag header; a matching If-None-Match returns 304 with no body
     """
-    try:
-        upstox_client = UpstoxClient(db)
-        headers = upstox_client.get_headers()
-
+    cached = _HOLIDAYS_CACHE.get(date)
+    if cached is None:
         # Fetch market holidays
-        response = requests.get(
-            f"https://api.upstox.com/v2/market/holidays/{date}",
-            headers=headers,
-            timeout=10
-        )
+        upstream = await get_coalesced(client, f"/v2/market/holidays/{date}", headers=headers)
 
-        if response.status_code == 200:
-            return {
-                "success": True,
-                "date": date,
-                "holidays": response.json()
-            }
-        else:
+        if upstream.status_code != 200:
             return {
                 "success": False,
-                "error": response.text
+                "error": upstream.text
             }
 
-    except Exception as e:
+        result = {
+            "success": True,
+            "date": date,
+            "holidays": upstream.json()
+        }
+        cached = _HOLIDAYS_CACHE[date] = (result, compute_etag(date, upstream.content))
+
+    result, etag = cached
+    not_modified = not_modified_response(request, etag, max_age=HOLIDAYS_MAX_AGE)
+    if not_modified is not None:
+        return not_modified
+    response.headers.update(cache_headers(etag, max_age=HOLIDAYS_MAX_AGE))
+    return result
+
+
+def _sub_check(response) -> Dict:
+    """Summarize one healthcheck sub-call (an httpx.Response or a raised exception)."""
+    if isinstance(response, Exception):
+        return {"ok": False, "status_code": None, "error": str(response)}
+    ok = response.status_code == 200
+    return {
+        "ok": ok,
+        "status_code": response.status_code,
+        "error": None if ok else response.text
+    }
+
+
+@router.get("/upstox/healthcheck")
+async def upstox_healthcheck(
+    symbol: str = "RELIANCE",
+    client: httpx.AsyncClient = Depends(get_http_client),
+    headers: Dict[str, str] = Depends(get_upstox_headers),
+    symbol_map: Dict[str, str] = Depends(get_symbol_map)
+):
+    """
+    Run the profile, quote, holidays and historical checks in one call.
+
+    The four Upstox requests are issued concurrently (asyncio.gather over the
+    shared HTTP/2 client), so latency is the slowest call, not the sum.
+
+    **Parameters:**
+    - symbol: Stock symbol used for the quote and historical checks (default: RELIANCE)
+
+    **Returns:**
+    - success: True only if every sub-check returned HTTP 200
+    - checks: Per-call status (ok, status_code, error)
+    """
+    instrument_key = symbol_map.get(symbol)
+    if not instrument_key:
         raise HTTPException(
-            status_code=500,
-            detail={"message": "Failed to fetch market holidays", "error": str(e)}
+            status_code=404,
+            detail=f"No instrument mapping found for symbol: {symbol}"
         )
+
+    to_date = datetime.now().date()
+    from_date = to_date - timedelta(days=30)
+
+    profile, quote, holidays, historical = await asyncio.gather(
+        client.get("/v2/user/profile", headers=headers),
+        client.get("/v2/market-quote/quotes", params={"instrument_key": instrument_key}, headers=headers),
+        client.get(f"/v2/market/holidays/{to_date.isoformat()}", headers=headers),
+        client.get(
+            f"/v2/historical-candle/{instrument_key}/day/{to_date.isoformat()}/{from_date.isoformat()}",
+            headers=headers
+        ),
+        return_exceptions=True
+    )
+
+    checks = {
+        "profile": _sub_check(profile),
+        "market_quote": _sub_check(quote),
+        "market_holidays": _sub_check(holidays),
+        "historical_data": _sub_check(historical),
+    }
+
+    return {
+        "success": all(check["ok"] for check in checks.values()),
+        "symbol": symbol,
+        "instrument_key": instrument_key,
+        "checks": checks
+    }
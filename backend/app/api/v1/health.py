@@ -1,18 +1,51 @@
 """
 Health check and status endpoints.
 """
-from fastapi import APIRouter, HTTPException, Depends
+import time
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
-from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from app.database.session import check_db_connection, get_db
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Optional, Tuple
+from cachetools import TTLCache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.session import check_db_connection_async, get_async_db
 from app.core.config import settings
 from app.models.metadata import MarketHoliday
+from app.utils.etag import cache_headers, compute_etag, not_modified_response
 import pytz
 
 
 router = APIRouter()
 
+# Resolved once per process instead of per market-status call
+IST = pytz.timezone('Asia/Kolkata')
+MARKET_OPEN = dtime(9, 15)
+MARKET_CLOSE = dtime(15, 30)
+
+# Per-date holiday calendar, see _get_trading_calendar()
+_CALENDAR_CACHE = TTLCache(maxsize=8, ttl=60 * 60)
+
+# Last DB ping result, see _cached_db_ping()
+DB_PING_TTL_SECONDS = 5.0
+_DB_PING_STATE = {"t": 0.0, "ok": False}
+
+
+async def _cached_db_ping() -> bool:
+    """
+    DB connectivity check reused for DB_PING_TTL_SECONDS.
+
+    Liveness probes hit /health/detailed every few seconds; within the TTL
+    they get the last result instead of another SELECT 1 round-trip.
+    """
+    now = time.monotonic()
+    if now - _DB_PING_STATE["t"] < DB_PING_TTL_SECONDS:
+        return _DB_PING_STATE["ok"]
+
+    ok = await check_db_connection_async()
+    _DB_PING_STATE.update(t=now, ok=ok)
+    return ok
+
 
 class HealthResponse(BaseModel):
     """Health check response model."""
@@ -38,6 +71,53 @@ class MarketStatusResponse(BaseModel):
     message: str
 
 
+async def _get_trading_calendar(db: AsyncSession, current_date: date) -> Tuple[Optional[str], Optional[date]]:
+    """
+    Holiday lookups for a date, cached per date for an hour.
+
+    The holiday table only changes when holidays are re-ingested, so
+    market-status polls reuse this instead of querying on every call.
+
+    Args:
+        db: Database session (only used on cache miss)
+        current_date: Date in IST
+
+    Returns:
+        Tuple of (holiday name if current_date is a holiday, next trading date
+        after current_date within 2 weeks)
+    """
+    if current_date in _CALENDAR_CACHE:
+        return _CALENDAR_CACHE[current_date]
+
+    # One range query covers today and the 2-week look-ahead window
+    rows = await db.execute(
+        select(MarketHoliday.holiday_date, MarketHoliday.holiday_name).where(
+            MarketHoliday.holiday_date.between(current_date, current_date + timedelta(days=14))
+        )
+    )
+    holidays = dict(rows.all())
+    holiday_name = holidays.get(current_date)
+
+    # Find next trading day (skip weekends and holidays)
+    next_trading_date = None
+    for days_ahead in range(1, 15):
+        check_date = current_date + timedelta(days=days_ahead)
+        if check_date.weekday() < 5 and check_date not in holidays:
+            next_trading_date = check_date
+            break
+
+    _CALENDAR_CACHE[current_date] = (holiday_name, next_trading_date)
+    return holiday_name, next_trading_date
+
+
+# Constant for the process lifetime: built once, without validation
+_HEALTH_RESPONSE = HealthResponse.model_construct(
+    status="healthy",
+    message="Stock Screener API is running",
+    environment=settings.ENV
+)
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """
@@ -46,17 +126,13 @@ async def health_check():
     Returns:
         HealthResponse: Service status
     """
-    return HealthResponse(
-        status="healthy",
-        message="Stock Screener API is running",
-        environment=settings.ENV
-    )
+    return _HEALTH_RESPONSE
 
 
 @router.get("/health/detailed", response_model=DetailedHealthResponse)
 async def detailed_health_check():
     """
-    Detailed health check including database connectivity.
+    Detailed health check including database connectivity (cached for 5 seconds).
 
     Returns:
         DetailedHealthResponse: Detailed service status
@@ -64,7 +140,7 @@ async def detailed_health_check():
     Raises:
         HTTPException: If critical services are down
     """
-    db_connected = check_db_connection()
+    db_connected = await _cached_db_ping()
 
     if not db_connected:
         raise HTTPException(
@@ -72,7 +148,7 @@ async def detailed_health_check():
             detail="Database connection failed"
         )
 
-    return DetailedHealthResponse(
+    return DetailedHealthResponse.model_construct(
         status="healthy",
         environment=settings.ENV,
         database_connected=db_connected,
@@ -81,78 +157,72 @@ async def detailed_health_check():
 
 
 @router.get("/health/market-status", response_model=MarketStatusResponse)
-async def market_status(db: Session = Depends(get_db)):
+async def market_status(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Check if the market is currently open and if today is a trading day.
 
     Market hours: Mon-Fri, 9:15 AM - 3:30 PM IST (except holidays)
 
+    The ETag covers the market state (open/trading day/next open/message), not
+    current_time, so pollers sending If-None-Match get 304 until the state changes.
+
     Args:
-        db: Database session
+        request: Incoming request (for If-None-Match)
+        response: Outgoing response (ETag/Cache-Control headers)
+        db: Async database session
 
     Returns:
         MarketStatusResponse: Current market status with next open time
     """
-    ist = pytz.timezone('Asia/Kolkata')
-    current_time = datetime.now(ist)
+    current_time = datetime.now(IST)
     current_date = current_time.date()
+    current_clock = current_time.time()
 
     # Check if today is weekend (Saturday=5, Sunday=6)
     is_weekend = current_time.weekday() >= 5
 
-    # Check if today is a market holiday
-    holiday = db.query(MarketHoliday).filter(
-        MarketHoliday.holiday_date == current_date
-    ).first()
-    is_holiday = holiday is not None
+    # Check if today is a market holiday (cached per day)
+    holiday_name, next_trading_date = await _get_trading_calendar(db, current_date)
+    is_holiday = holiday_name is not None
 
     # Check if market is currently open (9:15 AM - 3:30 PM IST on trading days)
-    market_open_time = current_time.replace(hour=9, minute=15, second=0, microsecond=0)
-    market_close_time = current_time.replace(hour=15, minute=30, second=0, microsecond=0)
-
     is_trading_day = not (is_weekend or is_holiday)
     is_market_open = (
         is_trading_day and
-        market_open_time <= current_time <= market_close_time
+        MARKET_OPEN <= current_clock <= MARKET_CLOSE
     )
 
     # Calculate next market open time
     next_open = None
     if is_market_open:
         message = "Market is currently open for trading"
-    elif is_trading_day and current_time < market_open_time:
-        next_open = market_open_time.isoformat()
+    elif is_trading_day and current_clock < MARKET_OPEN:
+        next_open = IST.localize(datetime.combine(current_date, MARKET_OPEN)).isoformat()
         message = f"Market opens today at 9:15 AM IST"
     else:
-        # Find next trading day
-        check_date = current_date + timedelta(days=1)
-        days_checked = 0
-        while days_checked < 14:  # Check up to 2 weeks ahead
-            # Skip weekends
-            if check_date.weekday() < 5:
-                # Check if it's a holiday
-                holiday_check = db.query(MarketHoliday).filter(
-                    MarketHoliday.holiday_date == check_date
-                ).first()
-                if not holiday_check:
-                    next_open_datetime = ist.localize(
-                        datetime.combine(check_date, datetime.min.time())
-                    ).replace(hour=9, minute=15)
-                    next_open = next_open_datetime.isoformat()
-                    break
-            check_date += timedelta(days=1)
-            days_checked += 1
+        if next_trading_date:
+            next_open = IST.localize(datetime.combine(next_trading_date, MARKET_OPEN)).isoformat()
 
         if is_holiday:
-            message = f"Market closed - {holiday.holiday_name}"
+            message = f"Market closed - {holiday_name}"
         elif is_weekend:
             message = "Market closed - Weekend"
-        elif current_time > market_close_time:
+        elif current_clock > MARKET_CLOSE:
             message = "Market closed for the day"
         else:
             message = "Market is closed"
 
-    return MarketStatusResponse(
+    etag = compute_etag(current_date, is_market_open, is_trading_day, next_open, message)
+    not_modified = not_modified_response(request, etag, max_age=60)
+    if not_modified is not None:
+        return not_modified
+    response.headers.update(cache_headers(etag, max_age=60))
+
+    return MarketStatusResponse.model_construct(
         is_market_open=is_market_open,
         is_trading_day=is_trading_day,
         current_time=current_time.isoformat(),
@@ -4,33 +4,152 @@ Data Ingestion API Endpoints.
 Provides endpoints for triggering data ingestion from various sources.
 These endpoints are typically called by n8n workflows or manual triggers.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import logging
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_, select, text
 from sqlalchemy.orm import Session
-from typing import Optional, List
-from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Callable, Dict, Optional, List
+from datetime import date, datetime, timedelta, timezone
+from hashlib import sha256
+from uuid import uuid4
+
+import orjson
 
-from app.database.session import get_db
+from app.database.session import AsyncSessionLocal, get_db, get_async_db
+from app.models.metadata import IngestionJob
 from app.services.nse.securities_service import ingest_securities_from_nse
 from app.services.nse.market_cap_service import ingest_market_cap_from_nse
 from app.services.nse.deals_service import ingest_deals_from_nse
-from app.services.nse.surveillance_service import fetch_surveillance_data, ingest_surveillance
+from app.services.nse.ingestion_jobs import (
+    ERROR_LIST_KEYS,
+    collect_errors,
+    run_all_nse_ingestion,
+    run_historical_ohlcv_batch,
+    run_indices_historical_ohlcv,
+    run_ingestion_job,
+    run_surveillance_ingestion,
+    run_upstox_instruments_ingestion,
+)
 from app.services.nse.industry_service import scrape_all_securities
 from app.schemas.industry import IndustryIngestionRequest, IndustryIngestionResponse
-from app.services.upstox.instrument_service import ingest_instruments_from_upstox
 from app.services.upstox.daily_quotes_service import DailyQuotesService
 from app.services.upstox.historical_service import HistoricalDataService
 from app.services.upstox.batch_historical_service import BatchHistoricalService
-from app.services.upstox.index_historical_service import IndexHistoricalService
-from app.schemas.upstox import InstrumentIngestionResponse
 from app.utils.resource_monitor import monitor_resources
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+
+# Identical requests (n8n retries, double triggers) reuse a job that is still
+# pending/running unless it is older than this (a crashed worker never finishes)
+INGEST_JOB_STALE_AFTER = timedelta(hours=1)
+
+# A repeated Idempotency-Key header also replays a finished job for this long
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# How often /status/{job_id}/stream re-reads the job row
+INGEST_STREAM_POLL_SECONDS = 1.0
+
+# Error lists in responses are cut to this many entries; the full lists are
+# logged (and streamed line by line by /status/{job_id}/stream)
+INGEST_MAX_RESPONSE_ERRORS = 20
+
+
+def _cap_errors(result: Dict[str, Any], max_errors: int = INGEST_MAX_RESPONSE_ERRORS) -> Dict[str, Any]:
+    """
+    Copy a result dict with every error list cut to max_errors entries.
+
+    Nested results (e.g. /all's per-source results) are capped too. A cut list
+    gets <key>_truncated: true and <key>_count with its full length.
+    """
+    capped = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            capped[key] = _cap_errors(value, max_errors)
+        elif key in ERROR_LIST_KEYS and isinstance(value, list) and len(value) > max_errors:
+            capped[key] = value[:max_errors]
+            capped[f"{key}_truncated"] = True
+            capped[f"{key}_count"] = len(value)
+        else:
+            capped[key] = value
+    return capped
+
+
+def _job_accepted(job_id: str, status: str, message: str) -> Dict[str, Any]:
+    return {
+        "message": message,
+        "job_id": job_id,
+        "status": status,
+        "status_url": f"/api/v1/ingest/status/{job_id}"
+    }
+
 
-@router.post("/securities")
+async def _queue_ingestion_job(
+    background_tasks: BackgroundTasks,
+    db: AsyncSession,
+    source: str,
+    ingest_func: Callable[..., Dict[str, Any]],
+    idempotency_key: Optional[str] = None,
+    **kwargs
+) -> Dict[str, Any]:
+    """
+    Create a pending ingestion_jobs row and run ingest_func after the response is sent.
+
+    Duplicate triggers return the existing job instead of re-running the ingest.
+    Without an Idempotency-Key header the key is derived from source + kwargs
+    and only matches jobs still in flight. kwargs must therefore be plain
+    request parameters; bind process-local objects into ingest_func instead.
+    """
+    material = (
+        f"key:{idempotency_key}" if idempotency_key
+        else "params:" + orjson.dumps(kwargs, default=str, option=orjson.OPT_SORT_KEYS).decode()
+    )
+    key = sha256(f"{source}|{material}".encode()).hexdigest()
+
+    now = datetime.now(timezone.utc)
+    reusable = and_(
+        IngestionJob.status.in_(("pending", "running")),
+        IngestionJob.created_at > now - INGEST_JOB_STALE_AFTER
+    )
+    if idempotency_key:
+        reusable = or_(reusable, IngestionJob.created_at > now - IDEMPOTENCY_KEY_TTL)
+
+    # Serialise lookup + insert per key across requests and workers, so two
+    # simultaneous retries cannot both miss each other and start the ingest.
+    # Released by the commit below (or the rollback when the session closes).
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"ingestion_job:{key}"})
+
+    existing = (await db.execute(
+        select(IngestionJob.id, IngestionJob.status)
+        .where(IngestionJob.idempotency_key == key, reusable)
+        .order_by(IngestionJob.created_at.desc())
+        .limit(1)
+    )).first()
+    if existing is not None:
+        return _job_accepted(existing.id, existing.status, f"Duplicate {source} request; returning existing job")
+
+    job_id = str(uuid4())
+    db.add(IngestionJob(id=job_id, source=source, status="pending", idempotency_key=key))
+    await db.commit()
+
+    background_tasks.add_task(run_ingestion_job, job_id, ingest_func, **kwargs)
+
+    return _job_accepted(job_id, "pending", f"{source} ingestion queued")
+
+
+@router.post("/securities", status_code=202)
 async def ingest_securities(
+    background_tasks: BackgroundTasks,
     file_path: Optional[str] = Query(None, description="Optional local file path for testing"),
-    db: Session = Depends(get_db)
+    batch_size: int = Query(10000, ge=1, le=10000, description="Rows per COPY/MERGE batch (max 10,000)"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Replays the job of an earlier request with the same key (24h)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Ingest NSE equity securities list (EQUITY_L.csv).
@@ -48,13 +167,24 @@ async def ingest_securities(
 
     **Query Parameters:**
     - file_path: Optional local file path (for testing with sample files)
+    - batch_size: Rows per COPY/MERGE batch (default and max 10,000)
 
-    **Returns:**
+    **Headers:**
+    - Idempotency-Key: Optional; a repeated key returns the earlier job (for 24h) instead of
+      re-running the ingest. Without it, an identical request returns the job still in flight.
+
+    **Returns (202 Accepted):**
+    - job_id: Poll `/api/v1/ingest/status/<job_id>` for the outcome
+    - status: "pending"
+    - status_url: Polling URL for this job
+
+    The job result holds the fields below once the job finishes:
     - success: Whether the ingestion completed successfully
     - source: URL or file path that was processed
     - parse_stats: Statistics from CSV parsing (total_rows, parsed_successfully, failed)
     - ingestion_result: Database insertion results (records_inserted, records_failed)
     - total_errors: List of all errors encountered
+    - not_modified: True if the file is unchanged since the last successful ingestion (304 or identical body; nothing written)
 
     **Example Usage:**
     ```bash
@@ -65,33 +195,20 @@ async def ingest_securities(
     curl -X POST "http://localhost:8000/api/v1/ingest/securities?file_path=/path/to/EQUITY_L_sample.csv"
     ```
     """
-    result = ingest_securities_from_nse(db=db, use_equity=True, file_path=file_path)
-
-    if not result["success"]:
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "message": "Securities ingestion failed",
-                "errors": result.get("total_errors", []),
-                "parse_stats": result.get("parse_stats", {}),
-                "ingestion_result": result.get("ingestion_result")
-            }
-        )
-
-    return {
-        "message": "Securities ingestion completed",
-        "success": True,
-        "source": result["source"],
-        "parse_stats": result["parse_stats"],
-        "ingestion_result": result["ingestion_result"],
-        "errors": result.get("total_errors", [])
-    }
+    return await _queue_ingestion_job(
+        background_tasks, db, "nse_securities",
+        ingest_securities_from_nse, use_equity=True, file_path=file_path, batch_size=batch_size,
+        idempotency_key=idempotency_key
+    )
 
 
-@router.post("/etf")
+@router.post("/etf", status_code=202)
 async def ingest_etf(
+    background_tasks: BackgroundTasks,
     file_path: Optional[str] = Query(None, description="Optional local file path for testing"),
-    db: Session = Depends(get_db)
+    batch_size: int = Query(10000, ge=1, le=10000, description="Rows per COPY/MERGE batch (max 10,000)"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Replays the job of an earlier request with the same key (24h)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Ingest NSE ETF list (eq_etfseclist.csv).
@@ -110,13 +227,24 @@ async def ingest_etf(
 
     **Query Parameters:**
     - file_path: Optional local file path (for testing with sample files)
+    - batch_size: Rows per COPY/MERGE batch (default and max 10,000)
 
-    **Returns:**
+    **Headers:**
+    - Idempotency-Key: Optional; a repeated key returns the earlier job (for 24h) instead of
+      re-running the ingest. Without it, an identical request returns the job still in flight.
+
+    **Returns (202 Accepted):**
+    - job_id: Poll `/api/v1/ingest/status/<job_id>` for the outcome
+    - status: "pending"
+    - status_url: Polling URL for this job
+
+    The job result holds the fields below once the job finishes:
     - success: Whether the ingestion completed successfully
     - source: URL or file path that was processed
     - parse_stats: Statistics from CSV parsing (total_rows, parsed_successfully, failed)
     - ingestion_result: Database insertion results (records_inserted, records_failed)
     - total_errors: List of all errors encountered
+    - not_modified: True if the file is unchanged since the last successful ingestion (304 or identical body; nothing written)
 
     **Example Usage:**
     ```bash
@@ -127,34 +255,22 @@ async def ingest_etf(
     curl -X POST "http://localhost:8000/api/v1/ingest/etf?file_path=/path/to/eq_etfseclist_sample.csv"
     ```
     """
-    result = ingest_securities_from_nse(db=db, use_equity=False, file_path=file_path)
-
-    if not result["success"]:
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "message": "ETF ingestion failed",
-                "errors": result.get("total_errors", []),
-                "parse_stats": result.get("parse_stats", {}),
-                "ingestion_result": result.get("ingestion_result")
-            }
-        )
-
-    return {
-        "message": "ETF ingestion completed",
-        "success": True,
-        "source": result["source"],
-        "parse_stats": result["parse_stats"],
-        "ingestion_result": result["ingestion_result"],
-        "errors": result.get("total_errors", [])
-    }
+    return await _queue_ingestion_job(
+        background_tasks, db, "nse_etf",
+        ingest_securities_from_nse, use_equity=False, file_path=file_path, batch_size=batch_size,
+        idempotency_key=idempotency_key
+    )
 
 
-@router.post("/market-cap")
+@router.post("/market-cap", status_code=202)
 async def ingest_market_cap(
-    target_date: Optional[str] = Query(None, description="Date to fetch market cap for (YYYY-MM-DD format)"),
+    background_tasks: BackgroundTasks,
+    target_date: Optional[date] = Query(None, description="Date to fetch market cap for (YYYY-MM-DD format)"),
     file_path: Optional[str] = Query(None, description="Optional local ZIP file path for testing"),
-    db: Session = Depends(get_db)
+    batch_size: int = Query(10000, ge=1, le=10000, description="Rows per COPY/MERGE batch (max 10,000)"),
+    rebuild_indexes: bool = Query(False, description="Drop secondary indexes during the load and rebuild once (initial loads/catch-ups)"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Replays the job of an earlier request with the same key (24h)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Ingest NSE market cap data from PR{DDMMYY}.zip archives.
@@ -174,10 +290,22 @@ async def ingest_market_cap(
     6. Return statistics and any errors encountered
 
     **Query Parameters:**
-    - target_date: Date to fetch data for (YYYY-MM-DD format). Defaults to today.
+    - target_date: Date to fetch data for (YYYY-MM-DD format, 422 if malformed). Defaults to today.
     - file_path: Optional local ZIP file path (for testing with sample files)
+    - batch_size: Rows per COPY/MERGE batch (default and max 10,000)
+    - rebuild_indexes: Drop the table's secondary indexes for the load and rebuild them once afterwards.
+      Faster for first-time loads and large catch-ups; blocks reads of the table until the load commits.
 
-    **Returns:**
+    **Headers:**
+    - Idempotency-Key: Optional; a repeated key returns the earlier job (for 24h) instead of
+      re-running the ingest. Without it, an identical request returns the job still in flight.
+
+    **Returns (202 Accepted):**
+    - job_id: Poll `/api/v1/ingest/status/<job_id>` for the outcome
+    - status: "pending"
+    - status_url: Polling URL for this job
+
+    The job result holds the fields below once the job finishes:
     - success: Whether the ingestion completed successfully
     - source: URL or file path that was processed
     - trade_date: Actual trade date from the CSV file
@@ -197,62 +325,26 @@ async def ingest_market_cap(
     curl -X POST "http://localhost:8000/api/v1/ingest/market-cap?file_path=/app/.claude/samples/PR160125_sample.zip"
     ```
     """
-    # Parse target_date or use today
-    if target_date:
-        try:
-            parsed_date = date.fromisoformat(target_date)
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail={"message": f"Invalid date format: {target_date}. Use YYYY-MM-DD format."}
-            )
-    else:
-        parsed_date = date.today()
-
-    # Ingest market cap data
-    try:
-        result = ingest_market_cap_from_nse(
-            db=db,
-            target_date=parsed_date,
-            file_path=file_path,
-            skip_missing_symbols=True
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "message": f"Unexpected error during market cap ingestion: {str(e)}",
-                "error_type": type(e).__name__
-            }
-        )
-
-    if not result.get("success", False):
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "message": "Market cap ingestion failed",
-                "errors": result.get("total_errors", result.get("fetch_errors", [])),
-                "trade_date": result.get("trade_date"),
-                "parse_stats": result.get("parse_stats", {}),
-                "ingestion_result": result.get("ingestion_result")
-            }
-        )
-
-    return {
-        "message": "Market cap ingestion completed",
-        "success": True,
-        "source": result.get("source", ""),
-        "trade_date": result.get("trade_date"),
-        "parse_stats": result.get("parse_stats", {}),
-        "ingestion_result": result.get("ingestion_result", {}),
-        "errors": result.get("total_errors", [])
-    }
+    return await _queue_ingestion_job(
+        background_tasks, db, "nse_market_cap",
+        ingest_market_cap_from_nse,
+        target_date=target_date or date.today(),
+        file_path=file_path,
+        skip_missing_symbols=True,
+        batch_size=batch_size,
+        rebuild_indexes=rebuild_indexes,
+        idempotency_key=idempotency_key
+    )
 
 
-@router.post("/bulk-deals")
+@router.post("/bulk-deals", status_code=202)
 async def ingest_bulk_deals(
+    background_tasks: BackgroundTasks,
     file_path: Optional[str] = Query(None, description="Optional local CSV file path for testing"),
-    db: Session = Depends(get_db)
+    batch_size: int = Query(10000, ge=1, le=10000, description="Rows per COPY/MERGE batch (max 10,000)"),
+    rebuild_indexes: bool = Query(False, description="Drop secondary indexes during the load and rebuild once (initial loads/catch-ups)"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Replays the job of an earlier request with the same key (24h)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Ingest NSE bulk deals data.
@@ -271,14 +363,27 @@ async def ingest_bulk_deals(
 
     **Query Parameters:**
     - file_path: Optional local CSV file path (for testing with sample files)
+    - batch_size: Rows per COPY/MERGE batch (default and max 10,000)
+    - rebuild_indexes: Drop the table's secondary indexes for the load and rebuild them once afterwards.
+      Faster for first-time loads and large catch-ups; blocks reads of the table until the load commits.
 
-    **Returns:**
+    **Headers:**
+    - Idempotency-Key: Optional; a repeated key returns the earlier job (for 24h) instead of
+      re-running the ingest. Without it, an identical request returns the job still in flight.
+
+    **Returns (202 Accepted):**
+    - job_id: Poll `/api/v1/ingest/status/<job_id>` for the outcome
+    - status: "pending"
+    - status_url: Polling URL for this job
+
+    The job result holds the fields below once the job finishes:
     - success: Whether the ingestion completed successfully
     - source: URL or file path that was processed
     - deal_date: The date from the CSV file
     - parse_stats: Statistics from CSV parsing (total_rows, parsed_successfully, failed)
     - ingestion_result: Database insertion results (records_inserted, records_skipped)
     - total_errors: List of all errors encountered
+    - not_modified: True if the file is unchanged since the last successful ingestion (304 or identical body; nothing written)
 
     **Example Usage:**
     ```bash
@@ -289,49 +394,25 @@ async def ingest_bulk_deals(
     curl -X POST "http://localhost:8000/api/v1/ingest/bulk-deals?file_path=/app/.claude/samples/bulk_sample.csv"
     ```
     """
-    try:
-        result = ingest_deals_from_nse(
-            db=db,
-            deal_type="BULK",
-            file_path=file_path,
-            skip_missing_symbols=False
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "message": f"Unexpected error during bulk deals ingestion: {str(e)}",
-                "error_type": type(e).__name__
-            }
-        )
-
-    if not result.get("success", False):
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "message": "Bulk deals ingestion failed",
-                "errors": result.get("total_errors", result.get("fetch_errors", [])),
-                "deal_date": result.get("deal_date"),
-                "parse_stats": result.get("parse_stats", {}),
-                "ingestion_result": result.get("ingestion_result")
-            }
-        )
-
-    return {
-        "message": "Bulk deals ingestion completed",
-        "success": True,
-        "source": result.get("source", ""),
-        "deal_date": result.get("deal_date"),
-        "parse_stats": result.get("parse_stats", {}),
-        "ingestion_result": result.get("ingestion_result", {}),
-        "errors": result.get("total_errors", [])
-    }
+    return await _queue_ingestion_job(
+        background_tasks, db, "nse_bulk_deals",
+        ingest_deals_from_nse,
+        deal_type="BULK",
+        file_path=file_path,
+        skip_missing_symbols=False,
+        batch_size=batch_size,
+        rebuild_indexes=rebuild_indexes,
+        idempotency_key=idempotency_key
+    )
 
 
-@router.post("/block-deals")
+@router.post("/block-deals", status_code=202)
 async def ingest_block_deals(
+    background_tasks: BackgroundTasks,
     file_path: Optional[str] = Query(None, description="Optional local CSV file path for testing"),
-    db: Session = Depends(get_db)
+    batch_size: int = Query(10000, ge=1, le=10000, description="Rows per COPY/MERGE batch (max 10,000)"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Replays the job of an earlier request with the same key (24h)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Ingest NSE block deals data.
@@ -350,14 +431,25 @@ async def ingest_block_deals(
 
     **Query Parameters:**
     - file_path: Optional local CSV file path (for testing with sample files)
+    - batch_size: Rows per COPY/MERGE batch (default and max 10,000)
 
-    **Returns:**
+    **Headers:**
+    - Idempotency-Key: Optional; a repeated key returns the earlier job (for 24h) instead of
+      re-running the ingest. Without it, an identical request returns the job still in flight.
+
+    **Returns (202 Accepted):**
+    - job_id: Poll `/api/v1/ingest/status/<job_id>` for the outcome
+    - status: "pending"
+    - status_url: Polling URL for this job
+
+    The job result holds the fields below once the job finishes:
     - success: Whether the ingestion completed successfully
     - source: URL or file path that was processed
     - deal_date: The date from the CSV file
     - parse_stats: Statistics from CSV parsing (total_rows, parsed_successfully, failed)
     - ingestion_result: Database insertion results (records_inserted, records_skipped)
     - total_errors: List of all errors encountered
+    - not_modified: True if the file is unchanged since the last successful ingestion (304 or identical body; nothing written)
 
     **Example Usage:**
     ```bash
@@ -368,51 +460,25 @@ async def ingest_block_deals(
     curl -X POST "http://localhost:8000/api/v1/ingest/block-deals?file_path=/app/.claude/samples/block_sample.csv"
     ```
     """
-    try:
-        result = ingest_deals_from_nse(
-            db=db,
-            deal_type="BLOCK",
-            file_path=file_path,
-            skip_missing_symbols=False
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "message": f"Unexpected error during block deals ingestion: {str(e)}",
-                "error_type": type(e).__name__
-            }
-        )
-
-    if not result.get("success", False):
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "message": "Block deals ingestion failed",
-                "errors": result.get("total_errors", result.get("fetch_errors", [])),
-                "deal_date": result.get("deal_date"),
-                "parse_stats": result.get("parse_stats", {}),
-                "ingestion_result": result.get("ingestion_result")
-            }
-        )
-
-    return {
-        "message": "Block deals ingestion completed",
-        "success": True,
-        "source": result.get("source", ""),
-        "deal_date": result.get("deal_date"),
-        "parse_stats": result.get("parse_stats", {}),
-        "ingestion_result": result.get("ingestion_result", {}),
-        "errors": result.get("total_errors", [])
-    }
+    return await _queue_ingestion_job(
+        background_tasks, db, "nse_block_deals",
+        ingest_deals_from_nse,
+        deal_type="BLOCK",
+        file_path=file_path,
+        skip_missing_symbols=False,
+        batch_size=batch_size,
+        idempotency_key=idempotency_key
+    )
 
 
-@router.post("/surveillance")
+@router.post("/surveillance", status_code=202)
 async def ingest_surveillance_data(
+    background_tasks: BackgroundTasks,
     filename: Optional[str] = Query(None, description="NSE filename (e.g., 'REG1_IND160125.csv')"),
-    ingestion_date: Optional[str] = Query(None, description="Date override (YYYY-MM-DD format)"),
+    ingestion_date: Optional[date] = Query(None, description="Date override (YYYY-MM-DD format)"),
     file_path: Optional[str] = Query(None, description="Optional local file path for testing"),
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Replays the job of an earlier request with the same key (24h)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Ingest NSE Surveillance Measures data (REG1_IND format).
@@ -448,15 +514,25 @@ async def ingest_surveillance_data(
 
     **Query Parameters:**
     - filename: NSE filename (e.g., "REG1_IND160125.csv") - date extracted from filename
-    - ingestion_date: Optional date override (YYYY-MM-DD format) - overrides filename date
+    - ingestion_date: Optional date override (YYYY-MM-DD format, 422 if malformed) - overrides filename date
     - file_path: Optional local file path (for testing with sample files)
 
-    **Returns:**
+    **Headers:**
+    - Idempotency-Key: Optional; a repeated key returns the earlier job (for 24h) instead of
+      re-running the ingest. Without it, an identical request returns the job still in flight.
+
+    **Returns (202 Accepted):**
+    - job_id: Poll `/api/v1/ingest/status/<job_id>` for the outcome
+    - status: "pending"
+    - status_url: Polling URL for this job
+
+    The job result holds the fields below once the job finishes:
     - success: Whether the ingestion completed successfully
     - ingestion_date: Date of the surveillance snapshot
     - source: URL or file path that was processed
     - parse_stats: Statistics from CSV parsing (total_rows, parsed_rows, error_rows)
     - records_inserted: Per-table insertion counts
+    - not_modified: True if the file is unchanged since the last successful ingestion (304 or identical body; nothing written)
     - errors: List of all errors encountered
 
     **Example Usage:**
@@ -476,69 +552,175 @@ async def ingest_surveillance_data(
     - NSE Circular: NSE/SURV/65097 dated November 14, 2024
     - Database Models: app/models/surveillance.py
     """
-    # Convert date string to date object if provided
-    date_override = None
-    if ingestion_date:
-        try:
-            date_override = date.fromisoformat(ingestion_date)
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail={"message": f"Invalid date format: {ingestion_date}. Use YYYY-MM-DD."}
-            )
-
-    # Fetch and parse surveillance data
-    fetch_result = fetch_surveillance_data(
+    return await _queue_ingestion_job(
+        background_tasks, db, "nse_surveillance",
+        run_surveillance_ingestion,
         filename=filename,
-        ingestion_date=date_override,
-        file_path=file_path
+        ingestion_date=ingestion_date,
+        file_path=file_path,
+        idempotency_key=idempotency_key
     )
 
-    if not fetch_result["success"]:
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "message": "Surveillance data fetch/parse failed",
-                "errors": fetch_result.get("errors", []),
-                "parse_stats": fetch_result.get("stats", {}),
-                "source": fetch_result.get("source", "")
-            }
-        )
 
-    # Ingest into database
-    ingest_result = ingest_surveillance(
-        db=db,
-        surveillance_data=fetch_result["data"],
-        skip_missing_symbols=True
+@router.post("/all", status_code=202)
+async def ingest_all_nse(
+    background_tasks: BackgroundTasks,
+    target_date: Optional[date] = Query(None, description="Market cap trade date (YYYY-MM-DD, defaults to today)"),
+    batch_size: int = Query(10000, ge=1, le=10000, description="Rows per COPY/MERGE batch (max 10,000)"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Replays the job of an earlier request with the same key (24h)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Ingest all daily NSE archives (securities, ETFs, market cap, bulk and block deals) in one job.
+
+    Replaces five sequential calls from n8n. Downloads overlap (at most 3 at a time,
+    NSE throttles aggressive clients): securities and ETFs first, then market cap and
+    both deal files. The individual endpoints remain available.
+
+    **Query Parameters:**
+    - target_date: Market cap trade date (YYYY-MM-DD, defaults to today)
+    - batch_size: Rows per COPY/MERGE batch (default and max 10,000)
+
+    **Headers:**
+    - Idempotency-Key: Optional; a repeated key returns the earlier job (for 24h) instead of
+      re-running the ingest. Without it, an identical request returns the job still in flight.
+
+    **Returns (202 Accepted):**
+    - job_id: Poll `/api/v1/ingest/status/<job_id>` for the outcome
+    - status: "pending"
+    - status_url: Polling URL for this job
+
+    The job result holds the fields below once the job finishes:
+    - success: True only if every source succeeded
+    - failed_sources: Sources whose ingestion failed
+    - results: Per-source result (securities, etf, market_cap, bulk_deals, block_deals),
+      same fields as the individual endpoints
+
+    **Example Usage:**
+    ```bash
+    curl -X POST http://localhost:8000/api/v1/ingest/all
+    ```
+    """
+    return await _queue_ingestion_job(
+        background_tasks, db, "nse_all",
+        run_all_nse_ingestion,
+        target_date=target_date or date.today(),
+        batch_size=batch_size,
+        idempotency_key=idempotency_key
     )
 
-    if not ingest_result["success"]:
+
+@router.get("/status/{job_id}")
+async def get_ingestion_job_status(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get the state of a background ingestion job.
+
+    **Returns:**
+    - job_id, source
+    - status: pending, running, success or failed
+    - message: Outcome summary
+    - result: Result of the ingestion service (parse_stats, ingestion_result, errors, ...);
+      error lists are cut to the first 20 entries (errors_truncated / errors_count are
+      added), use `/status/{job_id}/stream` for the full lists
+    - created_at / completed_at
+    """
+    job = await db.get(IngestionJob, job_id)
+    if job is None:
         raise HTTPException(
-            status_code=500,
-            detail={
-                "message": "Surveillance data ingestion failed",
-                "errors": ingest_result.get("errors", []),
-                "parse_stats": fetch_result.get("stats", {}),
-                "records_inserted": ingest_result.get("records_inserted", {})
-            }
+            status_code=404,
+            detail={"message": f"Ingestion job {job_id} not found"}
         )
 
-    # Calculate total records inserted across all tables
-    total_inserted = sum(ingest_result["records_inserted"].values())
-
     return {
-        "message": f"Surveillance data ingestion completed for {fetch_result['ingestion_date']}",
-        "success": True,
-        "ingestion_date": fetch_result["ingestion_date"],
-        "source": fetch_result.get("source", ""),
-        "parse_stats": fetch_result.get("stats", {}),
-        "records_inserted": ingest_result.get("records_inserted", {}),
-        "records_updated": ingest_result.get("records_updated", {}),
-        "total_records": total_inserted,
-        "errors": fetch_result.get("errors", []) + ingest_result.get("errors", [])
+        "job_id": job.id,
+        "source": job.source,
+        "status": job.status,
+        "message": job.message,
+        "result": _cap_errors(job.result) if job.result else job.result,
+        "created_at": job.created_at,
+        "completed_at": job.completed_at
     }
 
 
+def _ndjson(event: Dict[str, Any]) -> bytes:
+    return orjson.dumps(event, default=str) + b"\n"
+
+
+async def _job_progress(job_id: str):
+    """Yield NDJSON events for a job until it finishes (or goes stale)."""
+    deadline = datetime.now(timezone.utc) + INGEST_JOB_STALE_AFTER
+    last_status = None
+
+    while True:
+        # Short-lived session per poll: no pooled connection is held while sleeping
+        async with AsyncSessionLocal() as db:
+            job = await db.get(IngestionJob, job_id)
+
+        # Row deleted while streaming (e.g. a manual cleanup): end the stream cleanly
+        if job is None:
+            yield _ndjson({"event": "not_found", "job_id": job_id})
+            return
+
+        if job.status != last_status:
+            last_status = job.status
+            yield _ndjson({"event": "status", "job_id": job_id, "status": job.status, "message": job.message})
+
+        if job.status in ("success", "failed"):
+            break
+        if datetime.now(timezone.utc) > deadline:
+            yield _ndjson({"event": "timeout", "job_id": job_id, "status": job.status})
+            return
+        await asyncio.sleep(INGEST_STREAM_POLL_SECONDS)
+
+    # Error lists can run to thousands of entries: one line each, then the
+    # summary with every list (nested ones too) emptied
+    result = job.result or {}
+    errors = collect_errors(result)
+    result = _cap_errors(result, max_errors=0)
+    for error in errors:
+        yield _ndjson({"event": "error", "error": error})
+
+    yield _ndjson({
+        "event": "result",
+        "job_id": job_id,
+        "status": job.status,
+        "message": job.message,
+        "error_count": len(errors),
+        "result": result,
+        "completed_at": job.completed_at
+    })
+
+
+@router.get("/status/{job_id}/stream")
+async def stream_ingestion_job_status(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Stream the progress of a background ingestion job as NDJSON.
+
+    Emits a line as soon as the job changes state, so clients can show progress
+    instead of polling `/status/{job_id}` and downloading the whole result at the end.
+
+    **Returns (application/x-ndjson), one JSON object per line:**
+    - {"event": "status", "status": ...}: On every status change (pending, running, success, failed)
+    - {"event": "error", "error": ...}: One per error once the job finishes
+    - {"event": "result", ...}: Final summary (result with error lists emptied, <key>_count kept; error_count)
+    - {"event": "timeout", ...}: Job still unfinished after an hour; the stream ends
+    - {"event": "not_found", ...}: Job row deleted while streaming; the stream ends
+
+    **Example Usage:**
+    ```bash
+    # The stream is never gzip-compressed, so lines arrive as they are emitted
+    curl -N http://localhost:8000/api/v1/ingest/status/<job_id>/stream
+    ```
+    """
+    if await db.get(IngestionJob, job_id) is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"message": f"Ingestion job {job_id} not found"}
+        )
+
+    return StreamingResponse(_job_progress(job_id), media_type="application/x-ndjson")
+
+
 @router.post("/industry-classification", response_model=IndustryIngestionResponse)
 async def ingest_industry_classification(
     limit: Optional[int] = Query(None, gt=0, le=5000, description="Limit number of symbols to scrape (for testing)"),
@@ -548,14 +730,14 @@ async def ingest_industry_classification(
     """
     Scrape industry classification and index constituents from NSE Quote Equity API.
 
-    This endpoint uses Playwright to authenticate with NSE and scrape the Quote Equity API
-    for all active securities, extracting:
+    This endpoint primes NSE session cookies with a plain GET of the homepage and scrapes
+    the Quote Equity API for all active securities, extracting:
     1. **Industry Classification**: 4-level hierarchy (Macro > Sector > Industry > Basic Industry)
     2. **Index Constituents**: Which indices each security belongs to (from pdSectorIndAll)
 
     **Data Source:** https://www.nseindia.com/api/quote-equity?symbol={SYMBOL}
 
-    **Rate Limiting:** 1 request/second to respect NSE server limits
+    **Rate Limiting:** At most 10 concurrent requests, each followed by a 0.1s pause
     """
     try:
         # Run async scraper
@@ -566,17 +748,20 @@ async def ingest_industry_classification(
         )
 
         if not result["success"]:
+            logger.error("Industry classification scraping failed", extra={"errors": result.get("errors", [])})
             raise HTTPException(
                 status_code=500,
                 detail={
                     "message": "Industry classification scraping failed",
-                    "errors": result.get("errors", []),
+                    **_cap_errors({"errors": result.get("errors", [])}),
                     "symbols_processed": result.get("symbols_processed", 0),
                     "symbols_failed": result.get("symbols_failed", 0)
                 }
             )
 
-        return IndustryIngestionResponse(**result)
+        # Plain dict: response_model validates it once (building the model here
+        # would be dumped and validated a second time)
+        return result
 
     except Exception as e:
         raise HTTPException(
@@ -588,8 +773,12 @@ async def ingest_industry_classification(
         )
 
 
-@router.post("/upstox-instruments", response_model=InstrumentIngestionResponse)
-async def ingest_upstox_instruments(db: Session = Depends(get_db)):
+@router.post("/upstox-instruments", status_code=202)
+async def ingest_upstox_instruments(
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Replays the job of an earlier request with the same key (24h)"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Ingest Upstox instrument master data from NSE.json.gz.
 
@@ -604,13 +793,23 @@ async def ingest_upstox_instruments(db: Session = Depends(get_db)):
     2. Decompress and parse JSON
     3. UPSERT instruments to upstox_instruments table (batch size: 500)
     4. Auto-create symbol mappings (match by ISIN first, then symbol)
-    5. Return statistics
+    5. Workers reload their in-memory symbol -> instrument_key map on next use
+    6. Return statistics
 
     **Matching Logic:**
     - Equities: exchange='NSE_EQ', match by ISIN (confidence=100) or symbol (confidence=90)
     - Indices: Manual mapping only (not automated)
 
-    **Returns:**
+    **Headers:**
+    - Idempotency-Key: Optional; a repeated key returns the earlier job (for 24h) instead of
+      re-running the ingest. Without it, an identical request returns the job still in flight.
+
+    **Returns (202 Accepted):**
+    - job_id: Poll `/api/v1/ingest/status/<job_id>` for the outcome
+    - status: "pending"
+    - status_url: Polling URL for this job
+
+    The job result holds the fields below once the job finishes:
     - success: Whether ingestion completed successfully
     - total_instruments: Total instruments in source file (~2000+ for NSE)
     - instruments_inserted: New instruments added
@@ -623,25 +822,15 @@ async def ingest_upstox_instruments(db: Session = Depends(get_db)):
     - Initially after setting up the database
     - Daily via n8n workflow (instruments may change)
     """
-
-    result = ingest_instruments_from_upstox(db=db)
-
-    if not result["success"]:
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "message": "Upstox instrument ingestion failed",
-                "errors": result.get("errors", []),
-                "total_instruments": result.get("total_instruments", 0),
-                "mappings_created": result.get("mappings_created", 0)
-            }
-        )
-
-    return InstrumentIngestionResponse(**result)
+    return await _queue_ingestion_job(
+        background_tasks, db, "upstox_instruments",
+        run_upstox_instruments_ingestion,
+        idempotency_key=idempotency_key
+    )
 
 
 @router.post("/daily-ohlcv")
-async def ingest_daily_ohlcv(
+def ingest_daily_ohlcv(
     symbols: Optional[List[str]] = Query(None, description="Optional list of symbols to fetch. If not provided, fetches all active securities"),
     db: Session = Depends(get_db)
 ):
@@ -683,6 +872,7 @@ async def ingest_daily_ohlcv(
     result = service.fetch_daily_ohlcv(symbols=symbols)
 
     if not result["success"]:
+        logger.error("Daily OHLCV ingestion failed", extra={"errors": result["errors"]})
         raise HTTPException(
             status_code=400,
             detail={
@@ -690,7 +880,7 @@ async def ingest_daily_ohlcv(
                 "total_symbols": result["total_symbols"],
                 "successful": result["successful"],
                 "failed": result["failed"],
-                "errors": result["errors"][:10]  # Limit to first 10 errors
+                **_cap_errors({"errors": result["errors"]})
             }
         )
 
@@ -698,7 +888,7 @@ async def ingest_daily_ohlcv(
 
 
 @router.post("/historical-ohlcv/{symbol}")
-async def ingest_historical_ohlcv(
+def ingest_historical_ohlcv(
     symbol: str,
     from_date: Optional[date] = Query(None, description="Start date (YYYY-MM-DD). Defaults to 5 years ago or listing_date"),
     to_date: Optional[date] = Query(None, description="End date (YYYY-MM-DD). Defaults to today"),
@@ -758,26 +948,28 @@ async def ingest_historical_ohlcv(
     )
 
     if not result["success"]:
+        logger.error(f"Historical OHLCV ingestion failed for {symbol}", extra={"errors": result["errors"]})
         raise HTTPException(
             status_code=400,
             detail={
                 "message": f"Historical OHLCV ingestion failed for {symbol}",
                 "symbol": symbol,
-                "errors": result["errors"]
+                **_cap_errors({"errors": result["errors"]})
             }
         )
 
-    return result
+    return _cap_errors(result)
 
 
-@router.post("/historical-ohlcv-batch")
-@monitor_resources("Historical OHLCV Batch Ingestion")
+@router.post("/historical-ohlcv-batch", status_code=202)
 async def ingest_historical_ohlcv_batch(
+    background_tasks: BackgroundTasks,
     symbols: Optional[List[str]] = Query(None, description="Optional list of symbols. If not provided, processes all active securities"),
     start_date: Optional[date] = Query(None, description="Start date (default: 5 years ago)"),
     end_date: Optional[date] = Query(None, description="End date (default: yesterday)"),
     batch_size: int = Query(50, description="Number of symbols to process per batch"),
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Replays the job of an earlier request with the same key (24h)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Batch ingest historical OHLCV data from Upstox for multiple securities.
@@ -806,13 +998,22 @@ async def ingest_historical_ohlcv_batch(
     - end_date: End date for historical data (default: yesterday)
     - batch_size: Number of symbols per batch (default: 50)
 
-    **Returns:**
+    **Headers:**
+    - Idempotency-Key: Optional; a repeated key returns the earlier job (for 24h) instead of
+      re-running the ingest. Without it, an identical request returns the job still in flight.
+
+    **Returns (202 Accepted):**
+    - job_id: Poll `/api/v1/ingest/status/<job_id>` for the outcome
+    - status: "pending"
+    - status_url: Polling URL for this job
+
+    The job result holds the fields below once the job finishes:
     - success: Whether the overall ingestion succeeded
     - symbols_processed: Number of symbols successfully processed
     - records_inserted: Total OHLCV records inserted
     - records_updated: Total OHLCV records updated
     - symbols_failed: Number of symbols that failed
-    - errors: List of errors (capped at 50 for readability)
+    - errors: List of errors
     - execution_time_ms: Total execution time in milliseconds
 
     **Example Usage:**
@@ -827,41 +1028,23 @@ async def ingest_historical_ohlcv_batch(
     curl -X POST "http://localhost:8001/api/v1/ingest/historical-ohlcv-batch?batch_size=10"
     ```
 
-    **Note:** This operation can take 10-30 minutes for 2000+ securities.
-    Monitor progress in backend logs and Grafana dashboards.
+    **Note:** This operation can take 10-30 minutes for 2000+ securities, hence the
+    background job. Monitor progress in backend logs and Grafana dashboards.
     """
-    service = BatchHistoricalService(db)
-    result = service.fetch_batch_historical_ohlcv(
+    return await _queue_ingestion_job(
+        background_tasks, db, "upstox_historical_ohlcv",
+        run_historical_ohlcv_batch,
         symbols=symbols,
         start_date=start_date,
         end_date=end_date,
-        batch_size=batch_size
+        batch_size=batch_size,
+        idempotency_key=idempotency_key
     )
 
-    if not result["success"] and result["symbols_processed"] == 0:
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "message": "Historical OHLCV batch ingestion completely failed",
-                "errors": result["errors"]
-            }
-        )
-
-    return {
-        "message": "Historical OHLCV batch ingestion completed",
-        "success": result["success"],
-        "symbols_processed": result["symbols_processed"],
-        "records_inserted": result["records_inserted"],
-        "records_updated": result["records_updated"],
-        "symbols_failed": result["symbols_failed"],
-        "errors": result["errors"][:50],  # Limit errors in response
-        "execution_time_ms": result["execution_time_ms"]
-    }
-
 
 @router.post("/daily-ohlcv")
 @monitor_resources("Daily OHLCV Ingestion")
-async def ingest_daily_ohlcv(
+def ingest_daily_ohlcv(
     symbols: Optional[List[str]] = Query(None, description="Optional list of symbols. If not provided, processes all active securities"),
     target_date: Optional[date] = Query(None, description="Target date (default: yesterday)"),
     batch_size: int = Query(50, description="Number of symbols to process per batch"),
@@ -934,13 +1117,16 @@ async def ingest_daily_ohlcv(
     # Override source to 'upstox_daily' for ingestion logs
     # (BatchHistoricalService logs as 'upstox_historical' by default)
 
+    if result["errors"]:
+        logger.error(f"Daily OHLCV ingestion for {target_date} had errors", extra={"errors": result["errors"]})
+
     if not result["success"] and result["symbols_processed"] == 0:
         raise HTTPException(
             status_code=400,
             detail={
                 "message": f"Daily OHLCV ingestion failed for date {target_date}",
                 "date": str(target_date),
-                "errors": result["errors"]
+                **_cap_errors({"errors": result["errors"]})
             }
         )
 
@@ -952,19 +1138,20 @@ async def ingest_daily_ohlcv(
         "records_inserted": result["records_inserted"],
         "records_updated": result["records_updated"],
         "symbols_failed": result["symbols_failed"],
-        "errors": result["errors"][:50],
+        **_cap_errors({"errors": result["errors"]}),
         "execution_time_ms": result["execution_time_ms"]
     }
 
 
-@router.post("/indices-historical-ohlcv")
-@monitor_resources("Historical Index OHLCV Ingestion")
+@router.post("/indices-historical-ohlcv", status_code=202)
 async def ingest_indices_historical_ohlcv(
+    background_tasks: BackgroundTasks,
     index_symbols: Optional[List[str]] = Query(None, description="Optional list of index symbols. If not provided, fetches all NSE indices"),
     start_date: Optional[date] = Query(None, description="Start date (default: 5 years ago)"),
     end_date: Optional[date] = Query(None, description="End date (default: yesterday)"),
     batch_size: int = Query(20, description="Number of indices to process in parallel (default: 20)"),
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Replays the job of an earlier request with the same key (24h)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Ingest historical OHLCV data for NSE indices from Upstox.
@@ -992,7 +1179,16 @@ async def ingest_indices_historical_ohlcv(
     - end_date: End date (YYYY-MM-DD, default: yesterday)
     - batch_size: Number of indices to process in parallel (default: 20)
 
-    **Returns:**
+    **Headers:**
+    - Idempotency-Key: Optional; a repeated key returns the earlier job (for 24h) instead of
+      re-running the ingest. Without it, an identical request returns the job still in flight.
+
+    **Returns (202 Accepted):**
+    - job_id: Poll `/api/v1/ingest/status/<job_id>` for the outcome
+    - status: "pending"
+    - status_url: Polling URL for this job
+
+    The job result holds the fields below once the job finishes:
     - total_indices: Number of indices processed
     - records_inserted: Total OHLCV records inserted
     - records_updated: Total OHLCV records updated
@@ -1009,29 +1205,12 @@ async def ingest_indices_historical_ohlcv(
     curl -X POST "http://localhost:8000/api/v1/ingest/indices-historical-ohlcv?index_symbols=NIFTY%2050&index_symbols=NIFTY%20BANK"
     ```
     """
-    try:
-        # Use IndexHistoricalService to fetch OHLCV data
-        service = IndexHistoricalService(db)
-        result = service.ingest_historical_ohlcv_batch(
-            index_symbols=index_symbols,
-            start_date=start_date,
-            end_date=end_date,
-            batch_size=batch_size
-        )
-
-        return {
-            "message": "Index OHLCV ingestion completed",
-            "success": result["success"],
-            "indices_processed": result["indices_processed"],
-            "records_inserted": result["records_inserted"],
-            "records_updated": result["records_updated"],
-            "indices_failed": result["indices_failed"],
-            "errors": result["errors"][:50] if result["errors"] else [],
-            "execution_time_ms": result["execution_time_ms"]
-        }
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to ingest index OHLCV data: {str(e)}"
-        )
+    return await _queue_ingestion_job(
+        background_tasks, db, "upstox_index_historical_ohlcv",
+        run_indices_historical_ohlcv,
+        index_symbols=index_symbols,
+        start_date=start_date,
+        end_date=end_date,
+        batch_size=batch_size,
+        idempotency_key=idempotency_key
+    )
@@ -5,7 +5,7 @@ Provides endpoints for all 11 stock screeners based on calculated metrics.
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc, func
+from sqlalchemy import and_, or_, desc, func, cast, Integer
 from typing import Optional, List
 from datetime import date, timedelta
 
@@ -304,7 +304,7 @@ async def get_ma_stacked_breakouts(
     ).filter(
         and_(
             CalculatedMetrics.date == target_date,
-            CalculatedMetrics.is_ma_stacked == 1,
+            CalculatedMetrics.is_ma_stacked,
             CalculatedMetrics.vcp_score >= min_vcp,
             CalculatedMetrics.stage == max_stage
         )
@@ -462,7 +462,7 @@ async def get_stage_analysis(
         CalculatedMetrics.stage_detail,
         func.count(CalculatedMetrics.id).label('count'),
         func.avg(CalculatedMetrics.lod_atr_percent).label('avg_lod_atr'),
-        func.sum(CalculatedMetrics.is_lod_tight).label('tight_lod_count')
+        func.sum(cast(CalculatedMetrics.is_lod_tight, Integer)).label('tight_lod_count')
     ).filter(
         CalculatedMetrics.date == target_date
     ).group_by(
@@ -538,8 +538,8 @@ async def get_momentum_watchlist(
         CalculatedMetrics.stage_detail,
         CalculatedMetrics.atr_extension_from_sma50,
         CalculatedMetrics.lod_atr_percent,
-        CalculatedMetrics.is_lod_tight,
-        CalculatedMetrics.is_green_candle,
+        CalculatedMetrics.is_lod_tight.label('is_lod_tight'),
+        CalculatedMetrics.is_green_candle.label('is_green_candle'),
         CalculatedMetrics.change_1d_percent,
         Security.security_name
     ).join(
@@ -621,7 +621,7 @@ async def get_breadth_metrics(
     up_count = db.query(func.count(CalculatedMetrics.id)).filter(
         and_(
             CalculatedMetrics.date == target_date,
-            CalculatedMetrics.is_green_candle == 1
+            CalculatedMetrics.is_green_candle
         )
     ).scalar()
 
@@ -646,14 +646,14 @@ async def get_breadth_metrics(
     new_highs = db.query(func.count(CalculatedMetrics.id)).filter(
         and_(
             CalculatedMetrics.date == target_date,
-            CalculatedMetrics.is_new_20d_high == 1
+            CalculatedMetrics.is_new_20d_high
         )
     ).scalar()
 
     new_lows = db.query(func.count(CalculatedMetrics.id)).filter(
         and_(
             CalculatedMetrics.date == target_date,
-            CalculatedMetrics.is_new_20d_low == 1
+            CalculatedMetrics.is_new_20d_low
         )
     ).scalar()
 
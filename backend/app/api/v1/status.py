@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, Query
 from pydantic import BaseModel
 from datetime import datetime, timedelta, date as date_type
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, desc
+from sqlalchemy import func, and_, desc, select
 from typing import Dict, List, Optional, Any
 from app.database.session import get_db
 from app.models.security import Security
@@ -283,19 +283,19 @@ async def is_trading_day(
     # Check if weekend (Saturday=5, Sunday=6)
     is_weekend = date.weekday() >= 5
 
-    # Check if market holiday
-    holiday = db.query(MarketHoliday).filter(
-        MarketHoliday.holiday_date == date
-    ).first()
+    # Check if market holiday (only the name is needed)
+    holiday_name = db.execute(
+        select(MarketHoliday.holiday_name).where(MarketHoliday.holiday_date == date)
+    ).scalar()
 
-    is_holiday = holiday is not None
+    is_holiday = holiday_name is not None
     is_trading = not (is_weekend or is_holiday)
 
     # Determine reason
     if is_trading:
         reason = "trading"
     elif is_holiday:
-        reason = f"holiday - {holiday.holiday_name}"
+        reason = f"holiday - {holiday_name}"
     else:
         day_name = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"][date.weekday()]
         reason = f"weekend - {day_name}"
@@ -0,0 +1,17 @@
+"""
+Recent-window cutoff for the idx_index_ohlcv_recent partial index.
+
+Index predicates must be immutable (no CURRENT_DATE), so the window start is a
+literal aligned to a yearly partition boundary. The model reads it from here;
+migrations freeze the value they were written against.
+
+Yearly roll-forward (each January, once the new year has data):
+    1. Bump INDEX_OHLCV_RECENT_CUTOFF to 1 January of the previous year, so the
+       index still covers the 1Y/2Y reads.
+    2. Add an Alembic revision that drops idx_index_ohlcv_recent and recreates
+       it with the new literal (see 7e3b9d2f1a46 for the template).
+Older rows are still served by idx_index_ohlcv_symbol_date_desc and partition
+pruning, so a late bump only makes the index larger, never wrong.
+"""
+
+INDEX_OHLCV_RECENT_CUTOFF = '2025-01-01'
@@ -0,0 +1,29 @@
+"""
+Bit positions for the calculated_metrics.indicator_flags bitmask.
+
+The boolean screener flags used to be one INTEGER column each; they are now
+packed into a single SMALLINT. Multi-flag filters become a single bitwise AND:
+
+    (indicator_flags & (MA_STACKED | VOLUME_SURGE)) = (MA_STACKED | VOLUME_SURGE)
+"""
+from typing import Dict
+
+
+VOLUME_SURGE = 1 << 0       # RVOL >= 1.5
+MA_STACKED = 1 << 1         # close > EMA10 > SMA20 > SMA50 > SMA100 > SMA200
+LOD_TIGHT = 1 << 2          # LoD < 60% ATR
+NEW_20D_HIGH = 1 << 3       # high >= 20-day max high
+NEW_20D_LOW = 1 << 4        # low <= 20-day min low
+M30_RECLAIM = 1 << 5        # close > ORH proxy
+GREEN_CANDLE = 1 << 6       # close >= open
+
+# Legacy column name -> bit (used by the model properties and the migration)
+INDICATOR_FLAG_BITS: Dict[str, int] = {
+    'is_volume_surge': VOLUME_SURGE,
+    'is_ma_stacked': MA_STACKED,
+    'is_lod_tight': LOD_TIGHT,
+    'is_new_20d_high': NEW_20D_HIGH,
+    'is_new_20d_low': NEW_20D_LOW,
+    'is_m30_reclaim': M30_RECLAIM,
+    'is_green_candle': GREEN_CANDLE,
+}
@@ -28,12 +28,18 @@ class Settings(BaseSettings):
     # Application Configuration
     ENV: str = "development"
     LOG_LEVEL: str = "INFO"
+    WEB_WORKERS: int = 1  # Uvicorn worker processes; DB pools are split across them
 
     @property
     def database_url(self) -> str:
         """Construct PostgreSQL database URL."""
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def async_database_url(self) -> str:
+        """Construct PostgreSQL database URL for the asyncpg driver."""
+        return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+
     @property
     def is_development(self) -> bool:
         """Check if running in development mode."""
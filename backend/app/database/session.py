@@ -4,21 +4,52 @@ Replaces hardcoded credentials with environment-based configuration.
 """
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from contextlib import contextmanager
 from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every Uvicorn worker process builds its own engines (workers are spawned and
+# import the app afresh, so no pooled connection is shared across a fork).
+# The pool budgets below are for the whole deployment and split per worker.
+_WORKERS = max(1, settings.WEB_WORKERS)
 
 # Create SQLAlchemy engine with connection pooling
 engine = create_engine(
     settings.database_url,
-    pool_size=20,           # Number of connections to maintain in the pool
-    max_overflow=40,        # Maximum number of connections to create beyond pool_size
-    pool_pre_ping=True,     # Verify connections before using them
+    pool_size=max(2, 20 // _WORKERS),       # Connections to maintain in the pool
+    max_overflow=max(4, 40 // _WORKERS),    # Maximum connections to create beyond pool_size
+    pool_pre_ping=False,    # No SELECT 1 per checkout; stale connections are
+    pool_recycle=1800,      # recycled after 30 min instead
+    query_cache_size=1200,  # Compiled-statement cache entries (default 500); screener/metrics
+                            # queries vary by filter combination and would otherwise evict
+    # executemany: INSERTs are sent as multi-row VALUES pages (SQLAlchemy's default),
+    # UPDATE/DELETE batches (ORM bulk updates, mapping rebuilds) via execute_batch
+    # instead of one round-trip per row
+    executemany_mode="values_plus_batch",
+    insertmanyvalues_page_size=1000,
+    executemany_batch_page_size=500,
     echo=settings.is_development  # Log SQL queries in development
 )
 
 # Create SessionLocal class for database sessions
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine (asyncpg) for request handlers that await their queries
+# instead of blocking the event loop; services keep using the sync engine
+async_engine = create_async_engine(
+    settings.async_database_url,
+    pool_size=max(1, 10 // _WORKERS),       # Health + ingest-job endpoints only; keeps sync + async
+    max_overflow=max(2, 20 // _WORKERS),    # worst case (60 + 30) under PostgreSQL's default 100
+    pool_pre_ping=False,
+    pool_recycle=1800,
+    echo=settings.is_development
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
 
 def get_db():
     """
@@ -37,6 +68,20 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    Dependency function to get an async database session.
+
+    Usage in FastAPI:
+        @app.get("/items")
+        async def read_items(db: AsyncSession = Depends(get_async_db)):
+            result = await db.execute(select(Item))
+            return result.scalars().all()
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 @contextmanager
 def get_db_context():
     """
@@ -65,5 +110,21 @@ def check_db_connection() -> bool:
             db.execute(text("SELECT 1"))
         return True
     except Exception as e:
-        print(f"Database connection failed: {e}")
+        logger.error(f"Database connection failed: {e}")
+        return False
+
+
+async def check_db_connection_async() -> bool:
+    """
+    Async variant of check_db_connection() using the asyncpg engine.
+
+    Returns:
+        bool: True if database is accessible, False otherwise
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        logger.error(f"Database connection failed: {e}")
         return False
@@ -4,14 +4,14 @@ SQLAlchemy models for all database tables.
 Import all models here to ensure they're registered with Base.metadata
 before Alembic migration generation.
 
-Total Tables: 18 (15 original + 3 Upstox tables)
+Total Tables: 21 (17 original + 4 Upstox tables)
 - Master tables (5): Security, Index, IndustryClassification, IndexConstituent, MarketHoliday
 - Time-series tables (3): OHLCVDaily, MarketCapHistory, CalculatedMetrics
 - Event tables (2): BulkDeal, BlockDeal
 - Surveillance tables (4): SurveillanceList, SurveillanceFundamentalFlags,
                            SurveillancePriceMovement, SurveillancePriceVariation
-- Metadata table (1): IngestionLog
-- Upstox tables (3): UpstoxToken, UpstoxInstrument, SymbolInstrumentMapping
+- Metadata tables (3): IngestionLog, IngestionJob, IngestCache
+- Upstox tables (4): UpstoxToken, UpstoxInstrument, SymbolInstrumentMapping, UpstoxLoginJob
 
 Schema Status: BASELINE - Models will be refined as we process actual data in Phase 1.2+
 Surveillance models follow .claude/file-formats-surveillance.md specification
@@ -25,8 +25,8 @@ from app.models.surveillance import (
     SurveillancePriceMovement,
     SurveillancePriceVariation
 )
-from app.models.metadata import IndustryClassification, IndexConstituent, MarketHoliday, IngestionLog
-from app.models.upstox import UpstoxToken, UpstoxInstrument, SymbolInstrumentMapping
+from app.models.metadata import IndustryClassification, IndexConstituent, MarketHoliday, IngestionLog, IngestionJob, IngestCache
+from app.models.upstox import UpstoxToken, UpstoxInstrument, SymbolInstrumentMapping, UpstoxLoginJob
 
 __all__ = [
     # Master tables
@@ -54,9 +54,12 @@ __all__ = [
     'IndexConstituent',
     'MarketHoliday',
     'IngestionLog',
+    'IngestionJob',
+    'IngestCache',
 
     # Upstox tables
     'UpstoxToken',
     'UpstoxInstrument',
     'SymbolInstrumentMapping',
+    'UpstoxLoginJob',
 ]
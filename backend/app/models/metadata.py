@@ -1,9 +1,10 @@
 """
-Metadata models: Industry Classification, Index Constituents, Market Holidays, and Ingestion Logs.
+Metadata models: Industry Classification, Index Constituents, Market Holidays, Ingestion Logs,
+Ingestion Jobs and the NSE archive download cache.
 
 NOTE: These models support core platform operations and data tracking.
 """
-from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, ForeignKey, JSON, Index, Numeric
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, DateTime, ForeignKey, JSON, Index, Numeric, PrimaryKeyConstraint, event, DDL
 from sqlalchemy.sql import func
 from app.database.base import Base
 
@@ -12,13 +13,13 @@ class IndustryClassification(Base):
     """
     Industry/sector classification for each security.
 
-    Data Source: NSE website API (scraped via Playwright)
+    Data Source: NSE website API (scraped with httpx)
     Endpoint: https://www.nseindia.com/api/quote-equity?symbol={symbol}
 
     Schema Status: BASELINE - Will verify with actual API response in Phase 1.4
 
     Note: NSE provides 4-level classification: Macro > Sector > Industry > Basic Industry
-    This data requires cookie management via Playwright for API access
+    This data requires NSE session cookies (primed from the homepage) for API access
     """
     __tablename__ = 'industry_classification'
 
@@ -147,10 +148,17 @@ class IngestionLog(Base):
     2. Aggregation node queries this table with date filter
     3. Alerts/notifications based on status field
     4. Manual retry by querying failed sources
+
+    Storage: append-only, so fillfactor=100 and autovacuum_vacuum_scale_factor=0.02.
+    `errors` uses LZ4 TOAST compression on PostgreSQL 14+ (long tracebacks).
+    Primary key is (timestamp, id): reads and retention deletes are time ranges,
+    so the PK doubles as the time index and CLUSTER keeps rows in time order.
+    Writer contract: one row per ingestion run; bulk backfills must batch rows
+    (multi-row INSERT / COPY), not loop single-row INSERTs.
     """
     __tablename__ = 'ingestion_logs'
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(BigInteger, autoincrement=True)
     source = Column(String(50), nullable=False, index=True,
                    comment="Data source identifier (e.g., 'nse_securities', 'upstox_ohlcv', 'nse_market_cap')")
     status = Column(String(20), nullable=False,
@@ -161,8 +169,101 @@ class IngestionLog(Base):
     records_failed = Column(Integer, comment="Number of records that failed validation/insertion")
     errors = Column(JSON, comment="JSON array of error details for debugging")
     execution_time_ms = Column(Integer, comment="Execution time in milliseconds")
-    timestamp = Column(DateTime, server_default=func.now(), index=True,
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False,
                       comment="Execution timestamp for this ingestion run")
 
+    __table_args__ = (
+        PrimaryKeyConstraint('timestamp', 'id', name='ingestion_logs_pkey'),
+    )
+
     def __repr__(self):
         return f"<IngestionLog(source='{self.source}', status='{self.status}', timestamp='{self.timestamp}')>"
+
+
+event.listen(
+    IngestionLog.__table__,
+    'after_create',
+    DDL(
+        "ALTER TABLE ingestion_logs SET (fillfactor = 100, autovacuum_vacuum_scale_factor = 0.02)"
+    ).execute_if(dialect='postgresql')
+)
+event.listen(
+    IngestionLog.__table__,
+    'after_create',
+    DDL(
+        "ALTER TABLE ingestion_logs ALTER COLUMN errors SET COMPRESSION lz4"
+    ).execute_if(
+        dialect='postgresql',
+        callable_=lambda ddl, target, bind, **kw: bind.dialect.server_version_info >= (14, 0)
+    )
+)
+
+
+class IngestionJob(Base):
+    """
+    Tracks background ingestion runs.
+
+    Purpose: POST /ingest/{securities,etf,market-cap,bulk-deals,block-deals,surveillance,all}
+    and the long-running Upstox ingests (upstox-instruments, historical-ohlcv-batch,
+    indices-historical-ohlcv) return 202 with a job_id immediately and run the
+    fetch/parse/write in a background task; clients poll GET /ingest/status/{job_id}
+    for the outcome.
+
+    Status lifecycle: pending -> running -> success | failed
+
+    Duplicate triggers (n8n retries) are matched on idempotency_key: an
+    identical in-flight request reuses the running job, and a repeated
+    Idempotency-Key header replays the earlier job for 24 hours.
+    """
+    __tablename__ = 'ingestion_jobs'
+
+    # Primary key (UUID4 string handed back to the client)
+    id = Column(String(36), primary_key=True,
+               comment="Job identifier (UUID4)")
+
+    source = Column(String(50), nullable=False,
+                   comment="Ingestion source (e.g., 'nse_securities', 'upstox_instruments')")
+    idempotency_key = Column(String(64), nullable=True, index=True,
+                            comment="sha256 of the Idempotency-Key header, or of source + parameters")
+    status = Column(String(20), nullable=False, default='pending',
+                   comment="pending, running, success, failed")
+    message = Column(Text, nullable=True,
+                    comment="Outcome summary")
+    result = Column(JSON, nullable=True,
+                   comment="Result dict returned by the ingestion service")
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True,
+                         comment="When the job reached success/failed")
+
+    def __repr__(self):
+        return f"<IngestionJob(id='{self.id}', source='{self.source}', status='{self.status}')>"
+
+
+class IngestCache(Base):
+    """
+    HTTP validators of the last successfully ingested NSE archive download.
+
+    Purpose: EQUITY_L.csv, eq_etfseclist.csv and bulk/block.csv keep the same
+    URL and change at most daily. Their ETag / Last-Modified are sent back as
+    If-None-Match / If-Modified-Since so an unchanged file comes back as a 304;
+    content_hash also catches a 200 whose body is identical to the last copy.
+
+    Stored in the database (not per process) so every worker and restart
+    shares them. Rows are written only after the data was committed.
+    """
+    __tablename__ = 'ingest_cache'
+
+    url = Column(Text, primary_key=True,
+                comment="NSE archive URL")
+    etag = Column(Text, nullable=True,
+                 comment="ETag of the ingested download")
+    last_modified = Column(Text, nullable=True,
+                          comment="Last-Modified of the ingested download")
+    content_hash = Column(String(64), nullable=True,
+                         comment="sha256 of the ingested response body")
+    fetched_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(),
+                       comment="When the download was ingested")
+
+    def __repr__(self):
+        return f"<IngestCache(url='{self.url}', etag='{self.etag}')>"
@@ -4,12 +4,36 @@ Time-series data models for OHLCV, Market Cap, and Calculated Metrics.
 NOTE: These models will be refined in Phase 1.2-1.3 when actual data sources are integrated.
 Column names and types should match Upstox API and NSE CSV formats exactly.
 """
-from sqlalchemy import Column, BigInteger, String, Date, Numeric, DateTime, Integer, ForeignKey
-from sqlalchemy import UniqueConstraint, CheckConstraint, Index, text
+from sqlalchemy import Column, BigInteger, String, Date, Numeric, DateTime, Integer, SmallInteger, ForeignKey, Double, REAL
+from sqlalchemy import UniqueConstraint, CheckConstraint, Index, text, event, DDL
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.sql import func
+from app.constants import indicator_flags as flags
+from app.constants.index_ohlcv import INDEX_OHLCV_RECENT_CUTOFF
 from app.database.base import Base
 
 
+def _flag_property(bit: int) -> hybrid_property:
+    """
+    Expose one bit of indicator_flags as a 0/1 attribute.
+
+    Instance access returns an int (matching the old INTEGER flag columns) and
+    assignment sets/clears the bit. At class level it renders as
+    `(indicator_flags & bit) != 0`, matching the partial index predicates.
+    """
+    def fget(self):
+        return 1 if (self.indicator_flags or 0) & bit else 0
+
+    def fset(self, value):
+        current = self.indicator_flags or 0
+        self.indicator_flags = (current | bit) if value else (current & ~bit)
+
+    def expr(cls):
+        return cls.indicator_flags.op('&')(bit) != 0
+
+    return hybrid_property(fget, fset, expr=expr)
+
+
 class IndexOHLCVDaily(Base):
     """
     Daily OHLCV data for NSE indices (NIFTY 50, sectoral indices, etc.).
@@ -20,33 +44,68 @@ class IndexOHLCVDaily(Base):
 
     Note: Indices have different characteristics than stocks (no volume for some indices)
     Used for: RRG Charts, Benchmarking, Sectoral analysis
+
+    Partitioning: PARTITION BY RANGE (date) with one child table per year
+    (index_ohlcv_daily_y2015 .. _y2030) plus a DEFAULT partition. The partition
+    key must be part of every unique constraint, hence the (id, date) primary key.
+    Partitions use fillfactor=95 to leave room for HOT updates of updated_at.
+
+    Writer contract: load rows in batches (multi-row INSERT ... VALUES /
+    INSERT ... SELECT FROM unnest(...) / COPY), never one INSERT per candle.
     """
     __tablename__ = 'index_ohlcv_daily'
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
-    symbol = Column(String(50), nullable=False, index=True,
+    symbol = Column(String(50), nullable=False,
                    comment="Index symbol (e.g., NIFTY 50, NIFTY BANK)")
-    date = Column(Date, nullable=False, index=True, comment="Trading date")
+    date = Column(Date, primary_key=True, nullable=False, comment="Trading date")
 
-    open = Column(Numeric(12, 2), nullable=False, comment="Opening index value")
-    high = Column(Numeric(12, 2), nullable=False, comment="Highest index value")
-    low = Column(Numeric(12, 2), nullable=False, comment="Lowest index value")
-    close = Column(Numeric(12, 2), nullable=False, comment="Closing index value")
+    open = Column(Double, nullable=False, comment="Opening index value")
+    high = Column(Double, nullable=False, comment="Highest index value")
+    low = Column(Double, nullable=False, comment="Lowest index value")
+    close = Column(Double, nullable=False, comment="Closing index value")
     volume = Column(BigInteger, nullable=True, comment="Volume (may be null for some indices)")
 
-    created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     __table_args__ = (
-        UniqueConstraint('symbol', 'date', name='uq_index_ohlcv_symbol_date'),
+        UniqueConstraint('date', 'symbol', name='uq_index_ohlcv_symbol_date'),
         Index('idx_index_ohlcv_symbol_date_desc', 'symbol', text('date DESC')),
-        Index('idx_index_ohlcv_date', 'date'),
+        # Covering partial index for recent-window (1Y/2Y) reads; the cutoff is
+        # rolled forward yearly (see app/constants/index_ohlcv.py)
+        Index('idx_index_ohlcv_recent', 'symbol', text('date DESC'),
+              postgresql_include=['close', 'volume'],
+              postgresql_where=f"date >= '{INDEX_OHLCV_RECENT_CUTOFF}'"),
+        Index('idx_index_ohlcv_date', 'date', postgresql_using='brin',
+              postgresql_with={'pages_per_range': 32}),
+        {'postgresql_partition_by': 'RANGE (date)'},
     )
 
     def __repr__(self):
         return f"<IndexOHLCVDaily(symbol='{self.symbol}', date='{self.date}', close={self.close})>"
 
 
+# Yearly partitions for Base.metadata.create_all (Alembic creates the same set)
+for _year in range(2015, 2031):
+    event.listen(
+        IndexOHLCVDaily.__table__,
+        'after_create',
+        DDL(
+            f"CREATE TABLE IF NOT EXISTS index_ohlcv_daily_y{_year} PARTITION OF index_ohlcv_daily "
+            f"FOR VALUES FROM ('{_year}-01-01') TO ('{_year + 1}-01-01') WITH (fillfactor = 95)"
+        ).execute_if(dialect='postgresql')
+    )
+event.listen(
+    IndexOHLCVDaily.__table__,
+    'after_create',
+    DDL(
+        "CREATE TABLE IF NOT EXISTS index_ohlcv_daily_default PARTITION OF index_ohlcv_daily DEFAULT "
+        "WITH (fillfactor = 95)"
+    ).execute_if(dialect='postgresql')
+)
+
+
 class OHLCVDaily(Base):
     """
     Daily OHLCV (Open-High-Low-Close-Volume) data for all securities and indices.
@@ -153,70 +212,70 @@ class CalculatedMetrics(Base):
     date = Column(Date, nullable=False, index=True)
 
     # ===== PRICE CHANGES =====
-    change_1d_percent = Column(Numeric(10, 4), comment="1-day % change")
-    change_1d_value = Column(Numeric(12, 2), comment="1-day absolute change")
-    change_1w_percent = Column(Numeric(10, 4), comment="1-week (5 trading days) % change")
-    change_1m_percent = Column(Numeric(10, 4), comment="1-month (21 days) % change")
-    change_3m_percent = Column(Numeric(10, 4), comment="3-month (63 days) % change")
-    change_6m_percent = Column(Numeric(10, 4), comment="6-month (126 days) % change")
+    change_1d_percent = Column(Double, comment="1-day % change")
+    change_1d_value = Column(Double, comment="1-day absolute change")
+    change_1w_percent = Column(Double, comment="1-week (5 trading days) % change")
+    change_1m_percent = Column(Double, comment="1-month (21 days) % change")
+    change_3m_percent = Column(Double, comment="3-month (63 days) % change")
+    change_6m_percent = Column(Double, comment="6-month (126 days) % change")
 
     # ===== RELATIVE STRENGTH =====
-    rs_percentile = Column(Numeric(5, 2), comment="RS percentile rank (0-100) based on 1M change")
-    vars_score = Column(Numeric(10, 4), comment="Volatility-Adjusted RS = RS / ADR%")
-    varw_score = Column(Numeric(10, 4), comment="Volatility-Adjusted Relative Weakness for laggards")
+    rs_percentile = Column(REAL, comment="RS percentile rank (0-100) based on 1M change")
+    vars_score = Column(Double, comment="Volatility-Adjusted RS = RS / ADR%")
+    varw_score = Column(Double, comment="Volatility-Adjusted Relative Weakness for laggards")
 
     # ===== VOLATILITY METRICS =====
-    atr_14 = Column(Numeric(10, 4), comment="14-day ATR (Average True Range)")
-    atr_percent = Column(Numeric(10, 4), comment="ATR as % of close (ATR/close * 100)")
-    adr_percent = Column(Numeric(10, 4), comment="20-day Average Daily Range %")
-    today_range_percent = Column(Numeric(10, 4), comment="Today's (high-low)/close %")
+    atr_14 = Column(Double, comment="14-day ATR (Average True Range)")
+    atr_percent = Column(Double, comment="ATR as % of close (ATR/close * 100)")
+    adr_percent = Column(Double, comment="20-day Average Daily Range %")
+    today_range_percent = Column(Double, comment="Today's (high-low)/close %")
 
     # ===== VOLUME METRICS =====
     volume_50d_avg = Column(BigInteger, comment="50-day average volume")
-    rvol = Column(Numeric(10, 4), comment="Relative Volume (today/50d avg)")
-    is_volume_surge = Column(Integer, comment="1 if RVOL >= 1.5, else 0")
+    rvol = Column(Double, comment="Relative Volume (today/50d avg)")
+    is_volume_surge = _flag_property(flags.VOLUME_SURGE)  # 1 if RVOL >= 1.5, else 0
 
     # ===== MOVING AVERAGES =====
-    ema_10 = Column(Numeric(10, 4), comment="10-day EMA")
-    sma_20 = Column(Numeric(10, 4), comment="20-day SMA")
-    sma_50 = Column(Numeric(10, 4), comment="50-day SMA")
-    sma_100 = Column(Numeric(10, 4), comment="100-day SMA")
-    sma_200 = Column(Numeric(10, 4), comment="200-day SMA")
+    ema_10 = Column(Double, comment="10-day EMA")
+    sma_20 = Column(Double, comment="20-day SMA")
+    sma_50 = Column(Double, comment="50-day SMA")
+    sma_100 = Column(Double, comment="100-day SMA")
+    sma_200 = Column(Double, comment="200-day SMA")
 
     # Distance from MAs (as %)
-    distance_from_ema10_percent = Column(Numeric(10, 4), comment="(close - EMA10) / EMA10 * 100")
-    distance_from_sma50_percent = Column(Numeric(10, 4), comment="(close - SMA50) / SMA50 * 100")
-    distance_from_sma200_percent = Column(Numeric(10, 4), comment="(close - SMA200) / SMA200 * 100")
+    distance_from_ema10_percent = Column(Double, comment="(close - EMA10) / EMA10 * 100")
+    distance_from_sma50_percent = Column(Double, comment="(close - SMA50) / SMA50 * 100")
+    distance_from_sma200_percent = Column(Double, comment="(close - SMA200) / SMA200 * 100")
 
     # MA Alignment (for MA Stacked screener)
-    is_ma_stacked = Column(Integer, comment="1 if close > EMA10 > SMA20 > SMA50 > SMA100 > SMA200")
+    is_ma_stacked = _flag_property(flags.MA_STACKED)  # 1 if close > EMA10 > SMA20 > SMA50 > SMA100 > SMA200
 
     # ===== ATR EXTENSION =====
     atr_extension_from_sma50 = Column(
-        Numeric(10, 4),
+        Double,
         comment="((close/SMA50) - 1) / (ATR/close) - how extended from SMA50 in ATR units"
     )
     lod_atr_percent = Column(
-        Numeric(10, 4),
+        Double,
         comment="((low - close) / ATR * 100) - Low of Day distance in ATR%"
     )
-    is_lod_tight = Column(Integer, comment="1 if LoD < 60% ATR, else 0")
+    is_lod_tight = _flag_property(flags.LOD_TIGHT)  # 1 if LoD < 60% ATR, else 0
 
     # ===== DARVAS BOX (20-DAY) =====
-    darvas_20d_high = Column(Numeric(15, 2), comment="20-day highest high")
-    darvas_20d_low = Column(Numeric(15, 2), comment="20-day lowest low")
+    darvas_20d_high = Column(Double, comment="20-day highest high")
+    darvas_20d_low = Column(Double, comment="20-day lowest low")
     darvas_position_percent = Column(
-        Numeric(10, 4),
+        REAL,
         comment="(close - low) / (high - low) * 100 within 20-day range"
     )
 
     # ===== NEW HIGHS/LOWS =====
-    is_new_20d_high = Column(Integer, comment="1 if high >= 20-day max high")
-    is_new_20d_low = Column(Integer, comment="1 if low <= 20-day min low")
+    is_new_20d_high = _flag_property(flags.NEW_20D_HIGH)  # 1 if high >= 20-day max high
+    is_new_20d_low = _flag_property(flags.NEW_20D_LOW)  # 1 if low <= 20-day min low
 
     # ===== ORH/M30 Re-ORH (Proxy from Daily) =====
-    orh_proxy = Column(Numeric(15, 2), comment="Opening Range High proxy (first bar high)")
-    is_m30_reclaim = Column(Integer, comment="1 if close > ORH proxy (approximation)")
+    orh_proxy = Column(Double, comment="Opening Range High proxy (first bar high)")
+    is_m30_reclaim = _flag_property(flags.M30_RECLAIM)  # 1 if close > ORH proxy (approximation)
 
     # ===== VCP PATTERN SCORE =====
     vcp_score = Column(Integer, comment="1-5 based on narrowing range over 3-5 bars")
@@ -228,15 +287,19 @@ class CalculatedMetrics(Base):
     # ===== BREADTH METRICS (Universe-wide, same for all stocks on a date) =====
     universe_up_count = Column(Integer, comment="# stocks up for the day (universe-wide)")
     universe_down_count = Column(Integer, comment="# stocks down for the day (universe-wide)")
-    mcclellan_oscillator = Column(Numeric(10, 4), comment="McClellan Oscillator (advances-declines)")
-    mcclellan_summation = Column(Numeric(12, 4), comment="McClellan Summation Index (cumulative)")
+    mcclellan_oscillator = Column(Double, comment="McClellan Oscillator (advances-declines)")
+    mcclellan_summation = Column(Double, comment="McClellan Summation Index (cumulative)")
 
     # ===== RRG METRICS (for sector/industry level) =====
-    rs_ratio = Column(Numeric(10, 4), comment="(security close / benchmark close) * 100")
-    rs_momentum = Column(Numeric(10, 4), comment="1-week ROC of RS-Ratio, smoothed")
+    rs_ratio = Column(Double, comment="(security close / benchmark close) * 100")
+    rs_momentum = Column(Double, comment="1-week ROC of RS-Ratio, smoothed")
 
     # ===== CANDLE TYPE =====
-    is_green_candle = Column(Integer, comment="1 if close >= open, else 0")
+    is_green_candle = _flag_property(flags.GREEN_CANDLE)  # 1 if close >= open, else 0
+
+    # ===== BOOLEAN FLAGS (bitmask, see app.constants.indicator_flags) =====
+    indicator_flags = Column(SmallInteger, nullable=False, server_default=text('0'), default=0,
+                             comment="Bitmask of boolean screener flags (see app.constants.indicator_flags)")
 
     # Timestamps
     created_at = Column(DateTime, server_default=func.now())
@@ -245,11 +308,20 @@ class CalculatedMetrics(Base):
     __table_args__ = (
         UniqueConstraint('symbol', 'date', name='uq_metrics_symbol_date'),
         Index('idx_metrics_symbol_date_desc', 'symbol', text('date DESC')),
-        Index('idx_metrics_rs_percentile_desc', text('rs_percentile DESC')),
-        Index('idx_metrics_vars_desc', text('vars_score DESC')),
+        # Covering index: per-date screener scans are index-only
+        Index('idx_metrics_screener', text('date DESC'), 'symbol',
+              postgresql_include=['id', 'stage', 'stage_detail', 'rs_percentile', 'vars_score',
+                                  'varw_score', 'change_1d_percent', 'change_1w_percent',
+                                  'change_1m_percent', 'rvol', 'volume_50d_avg', 'atr_percent',
+                                  'adr_percent', 'atr_extension_from_sma50', 'lod_atr_percent',
+                                  'darvas_position_percent', 'vcp_score', 'indicator_flags']),
         Index('idx_metrics_stage', 'stage'),
         Index('idx_metrics_date_rs', 'date', text('rs_percentile DESC')),
-        Index('idx_metrics_volume_surge', 'is_volume_surge', 'date'),
+        # Partial indexes: screeners only filter flag = 1 for a date
+        Index('idx_metrics_volume_surge', 'date',
+              postgresql_where=f'(indicator_flags & {flags.VOLUME_SURGE}) <> 0'),
+        Index('idx_metrics_ma_stacked', 'date',
+              postgresql_where=f'(indicator_flags & {flags.MA_STACKED}) <> 0'),
     )
 
     def __repr__(self):
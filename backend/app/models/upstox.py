@@ -5,13 +5,14 @@ This module contains models for:
 - UpstoxToken: Access token storage with daily expiry (23:59 IST)
 - UpstoxInstrument: Cached instrument master data from Upstox API
 - SymbolInstrumentMapping: Maps NSE securities to Upstox instrument keys
+- UpstoxLoginJob: Status of background Playwright login runs
 """
 
 from sqlalchemy import (
     Column, Integer, String, Text, Boolean, DateTime, Date,
-    Numeric, ForeignKey, Index, UniqueConstraint
+    Numeric, ForeignKey, Index, UniqueConstraint, JSON
 )
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.database.base import Base
 
 
@@ -40,23 +41,25 @@ class UpstoxToken(Base):
     # Token metadata
     token_type = Column(String(20), default='Bearer',
                        comment="Token type (always 'Bearer' for OAuth2)")
-    expires_at = Column(DateTime, nullable=False,
+    expires_at = Column(DateTime(timezone=True), nullable=False,
                        comment="Token expiration timestamp (typically 23:59 IST)")
 
     # Tracking
-    is_active = Column(Boolean, default=True, index=True,
+    is_active = Column(Boolean, default=True,
                       comment="Whether token is currently valid and usable")
-    last_used_at = Column(DateTime, nullable=True,
+    last_used_at = Column(DateTime(timezone=True), nullable=True,
                          comment="Last time this token was used for API calls")
 
     # Metadata
-    created_at = Column(DateTime, server_default=func.now(),
+    created_at = Column(DateTime(timezone=True), server_default=func.now(),
                        comment="Token issuance timestamp")
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(),
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(),
                        comment="Last update timestamp")
 
     __table_args__ = (
-        Index('idx_upstox_tokens_active_expires', 'is_active', 'expires_at'),
+        # Partial: only live tokens are ever looked up (also serves the deactivate-all update)
+        Index('idx_upstox_tokens_active_expires', text('expires_at DESC'),
+              postgresql_where='is_active = true'),
     )
 
     def __repr__(self):
@@ -82,15 +85,16 @@ class UpstoxInstrument(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
 
     # Upstox identifiers
-    instrument_key = Column(String(50), unique=True, nullable=False, index=True,
+    # The UNIQUE constraint's btree already serves equality lookups; no extra index
+    instrument_key = Column(String(50), unique=True, nullable=False,
                            comment="Unique Upstox instrument identifier (e.g., 'NSE_EQ|INE002A01018')")
     exchange = Column(String(20), nullable=False, index=True,
                      comment="Exchange (NSE, BSE, NFO, MCX, etc.)")
 
     # Security identifiers
-    symbol = Column(String(50), nullable=False, index=True,
+    symbol = Column(String(50), nullable=False,
                    comment="NSE/BSE trading symbol (e.g., 'RELIANCE')")
-    isin = Column(String(12), nullable=True, index=True,
+    isin = Column(String(12), nullable=True,
                  comment="12-character ISIN code")
 
     # Instrument metadata
@@ -104,13 +108,18 @@ class UpstoxInstrument(Base):
                       comment="Whether instrument is actively traded")
 
     # Sync tracking
-    created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(),
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(),
                        comment="Last sync from Upstox API")
 
     __table_args__ = (
         UniqueConstraint('exchange', 'symbol', name='uq_upstox_exchange_symbol'),
+        # Also serves symbol-only lookups (leading column)
         Index('idx_upstox_instr_symbol_exchange', 'symbol', 'exchange'),
+        # ISIN is only ever matched by equality (mapping refresh) and is NULL
+        # for non-equity instruments
+        Index('ix_upstox_instruments_isin', 'isin', postgresql_using='hash',
+              postgresql_where='isin IS NOT NULL'),
     )
 
     def __repr__(self):
@@ -128,6 +137,10 @@ class SymbolInstrumentMapping(Base):
     - n8n workflows need fast symbol→instrument_key resolution
     - One NSE symbol may map to multiple Upstox instruments (rare edge case)
     - Enables bulk OHLCV fetch with proper instrument identification
+    - Regenerable from securities + upstox_instruments, so the FKs carry no
+      ON DELETE CASCADE; create_symbol_mappings() clears stale rows itself
+    - FKs are DEFERRABLE INITIALLY IMMEDIATE so bulk rebuilds can defer the
+      checks to commit with SET CONSTRAINTS ALL DEFERRED
     """
     __tablename__ = 'symbol_instrument_mapping'
 
@@ -135,15 +148,15 @@ class SymbolInstrumentMapping(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
 
     # Foreign keys
-    security_id = Column(Integer, ForeignKey('securities.id', ondelete='CASCADE'),
+    security_id = Column(Integer, ForeignKey('securities.id', deferrable=True, initially='IMMEDIATE'),
                         nullable=False, index=True,
                         comment="FK to securities table")
-    instrument_id = Column(Integer, ForeignKey('upstox_instruments.id', ondelete='CASCADE'),
+    instrument_id = Column(Integer, ForeignKey('upstox_instruments.id', deferrable=True, initially='IMMEDIATE'),
                           nullable=False, index=True,
                           comment="FK to upstox_instruments table")
 
     # Identifiers (denormalized for query speed)
-    symbol = Column(String(50), nullable=False, index=True,
+    symbol = Column(String(50), nullable=False,
                    comment="NSE symbol (denormalized from securities.symbol)")
     instrument_key = Column(String(50), nullable=False,
                            comment="Upstox instrument_key (denormalized from upstox_instruments)")
@@ -157,12 +170,46 @@ class SymbolInstrumentMapping(Base):
                          comment="How mapping was created (auto_isin, auto_symbol, manual)")
 
     # Tracking
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     __table_args__ = (
         UniqueConstraint('security_id', 'instrument_id', name='uq_mapping_security_instrument'),
+        # Also serves symbol-only lookups (leading column)
         Index('idx_mapping_symbol_instrument', 'symbol', 'instrument_key'),
     )
 
     def __repr__(self):
         return f"<SymbolInstrumentMapping(symbol='{self.symbol}', key='{self.instrument_key}')>"
+
+
+class UpstoxLoginJob(Base):
+    """
+    Tracks background Upstox login runs.
+
+    Purpose: POST /auth/upstox/login returns 202 with a job_id immediately and
+    runs the 10-30s Playwright flow in a background task; clients poll
+    GET /auth/upstox/token-status?job_id=... for the outcome.
+
+    Status lifecycle: pending -> running -> success | failed
+    """
+    __tablename__ = 'upstox_login_jobs'
+
+    # Primary key (UUID4 string handed back to the client)
+    id = Column(String(36), primary_key=True,
+               comment="Job identifier (UUID4)")
+
+    status = Column(String(20), nullable=False, default='pending',
+                   comment="pending, running, success, failed")
+    message = Column(Text, nullable=True,
+                    comment="Status message from the login flow")
+    errors = Column(JSON, nullable=True,
+                   comment="JSON array of error strings if login failed")
+    expires_at = Column(DateTime(timezone=True), nullable=True,
+                       comment="Expiry of the token obtained by this job")
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True,
+                         comment="When the job reached success/failed")
+
+    def __repr__(self):
+        return f"<UpstoxLoginJob(id='{self.id}', status='{self.status}')>"
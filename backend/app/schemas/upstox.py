@@ -34,6 +34,15 @@ class UpstoxLoginResponse(BaseModel):
     errors: Optional[List[str]] = Field(None, description="List of errors if login failed")
 
 
+class UpstoxLoginJobResponse(BaseModel):
+    """Response schema for a background Upstox login job."""
+    job_id: str = Field(..., description="Login job identifier (poll /upstox/token-status?job_id=...)")
+    status: str = Field(..., description="Job status: pending, running, success, failed")
+    message: Optional[str] = Field(None, description="Status message")
+    expires_at: Optional[datetime_type] = Field(None, description="Token expiration timestamp once the job succeeds")
+    errors: Optional[List[str]] = Field(None, description="List of errors if login failed")
+
+
 # ============================================================================
 # Instrument Schemas
 # ============================================================================
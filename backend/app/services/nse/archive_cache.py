@@ -0,0 +1,119 @@
+"""
+Shared HTTP session and conditional GETs for NSE archive files.
+
+All nsearchives.nseindia.com downloads go through one pooled requests.Session,
+so keep-alive reuses the TCP/TLS connection across ingestion runs instead of
+handshaking on every call.
+
+EQUITY_L.csv, eq_etfseclist.csv and bulk/block.csv keep the same URL and
+change at most once a day, but n8n may trigger their ingestion several
+times. The ETag / Last-Modified of the last successfully ingested download
+is kept per URL in the ingest_cache table and sent back as If-None-Match /
+If-Modified-Since; a 304 (or a 200 with the same body hash) means the file
+is unchanged and the parse/write can be skipped.
+"""
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database.session import get_db_context
+from app.models.metadata import IngestCache
+
+
+_NSE_SESSION = requests.Session()
+_NSE_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_NSE_SESSION.headers.update({
+    # NSE's CDN rejects/throttles the default python-requests agent
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+    # The CSVs compress ~5x; requests decodes transparently
+    "Accept-Encoding": "gzip, deflate",
+})
+
+
+def get_nse_session() -> requests.Session:
+    """Return the process-wide session used for NSE archive downloads."""
+    return _NSE_SESSION
+
+
+def close_nse_session() -> None:
+    """Close the pooled NSE connections (called on application shutdown)."""
+    _NSE_SESSION.close()
+
+
+# Validators older than a day are ignored, so a manually cleared table is
+# refilled by the next run at the latest
+ARCHIVE_VALIDATOR_MAX_AGE = timedelta(hours=24)
+
+
+def conditional_get(url: str, timeout: int = 30) -> Tuple[requests.Response, bool]:
+    """
+    GET an archive URL, revalidating against the last ingested copy.
+
+    Args:
+        url: NSE archive URL
+        timeout: Request timeout in seconds
+
+    Returns:
+        (response, not_modified): not_modified is True on a 304, or on a 200
+        whose body is byte-identical to the last ingested download
+    """
+    with get_db_context() as db:
+        cached = db.get(IngestCache, url)
+        if cached is not None and cached.fetched_at < datetime.now(timezone.utc) - ARCHIVE_VALIDATOR_MAX_AGE:
+            cached = None
+        validators = {
+            "etag": cached.etag,
+            "last_modified": cached.last_modified,
+            "content_hash": cached.content_hash
+        } if cached is not None else {}
+
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    response = _NSE_SESSION.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        return response, True
+
+    # CDN edges do not always agree on ETags: fall back to the body hash
+    not_modified = (
+        response.status_code == 200
+        and validators.get("content_hash") is not None
+        and validators["content_hash"] == sha256(response.content).hexdigest()
+    )
+    return response, not_modified
+
+
+def response_validators(response: requests.Response) -> Dict[str, Optional[str]]:
+    """Extract the ETag / Last-Modified validators and body hash of a 200 response."""
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_hash": sha256(response.content).hexdigest()
+    }
+
+
+def remember_validators(url: str, validators: Optional[Dict[str, Optional[str]]]) -> None:
+    """
+    Record validators once the download behind them has been ingested.
+
+    Called only after a successful DB write, so a failed ingestion is
+    retried with a full download instead of being skipped on a 304.
+    """
+    if not validators or not any(validators.values()):
+        return
+
+    stmt = insert(IngestCache).values(url=url, **validators)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IngestCache.url],
+        set_={**validators, "fetched_at": stmt.excluded.fetched_at}
+    )
+    with get_db_context() as db:
+        db.execute(stmt)
+        db.commit()
@@ -11,6 +11,7 @@ References:
 import csv
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache
 from typing import Dict, List, Optional
 from io import StringIO
 
@@ -20,6 +21,8 @@ class DealsParseError(Exception):
     pass
 
 
+# bulk.csv/block.csv rows share one or two dates: parse each distinct string once
+@lru_cache(maxsize=64)
 def parse_deals_date(date_str: str) -> Optional[datetime.date]:
     """
     Parse deals date format: DD-MMM-YYYY (e.g., "24-NOV-2025").
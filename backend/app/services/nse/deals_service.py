@@ -5,13 +5,16 @@ Handles fetching, parsing, and storing NSE bulk and block deals data.
 Both endpoints use the same CSV format with different URLs.
 """
 import requests
+from contextlib import nullcontext
 from typing import Dict, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.dialects.postgresql import insert
 
 from app.models.events import BulkDeal, BlockDeal
 from app.services.nse.deals_parser import parse_deals_csv
+from app.services.nse.archive_cache import conditional_get, response_validators, remember_validators
+from app.services.nse.securities_service import get_security_symbols
+from app.utils.pg_copy import MAX_BATCH_SIZE, copy_insert, secondary_indexes_dropped
 
 
 # NSE Archive URLs
@@ -40,6 +43,8 @@ def fetch_deals_data(deal_type: str = "BULK", file_path: Optional[str] = None) -
         - source: URL or file path
         - deal_date: The date from the CSV file
         - stats: Parsing statistics
+        - not_modified: True if NSE answered 304 or sent the same body (unchanged since last ingestion)
+        - validators: ETag / Last-Modified / body hash of the download
     """
     result = {
         "success": False,
@@ -47,7 +52,9 @@ def fetch_deals_data(deal_type: str = "BULK", file_path: Optional[str] = None) -
         "errors": [],
         "source": "",
         "deal_date": None,
-        "stats": {}
+        "stats": {},
+        "not_modified": False,
+        "validators": None
     }
 
     deal_type = deal_type.upper()
@@ -65,10 +72,18 @@ def fetch_deals_data(deal_type: str = "BULK", file_path: Optional[str] = None) -
         else:
             # Fetch from NSE archive
             url = BULK_DEALS_URL if deal_type == "BULK" else BLOCK_DEALS_URL
-            response = requests.get(url, timeout=30)
+            response, not_modified = conditional_get(url, timeout=30)
+            result["source"] = url
+
+            # Unchanged since the last successful ingestion: nothing to parse
+            if not_modified:
+                result["success"] = True
+                result["not_modified"] = True
+                return result
+
             response.raise_for_status()
             csv_content = response.text
-            result["source"] = url
+            result["validators"] = response_validators(response)
 
         # Parse CSV
         parse_result = parse_deals_csv(csv_content, deal_category=deal_type)
@@ -96,19 +111,24 @@ def ingest_deals(
     db: Session,
     deals_data: list,
     deal_type: str = "BULK",
-    skip_missing_symbols: bool = False
+    skip_missing_symbols: bool = False,
+    batch_size: int = MAX_BATCH_SIZE,
+    rebuild_indexes: bool = False
 ) -> Dict:
     """
     Insert deal records into database.
 
     Note: Unlike market cap, we don't use UPSERT here. Each deal is a unique event,
     even if same client/symbol/date. We allow duplicates intentionally.
+    Rows are appended with a single COPY.
 
     Args:
         db: SQLAlchemy database session
         deals_data: List of deal dicts from parser
         deal_type: "BULK" or "BLOCK"
         skip_missing_symbols: If True, skip symbols not in securities table
+        batch_size: Rows per COPY/MERGE batch (max 10,000)
+        rebuild_indexes: Drop secondary indexes for the load and rebuild them once after
 
     Returns:
         Dict with ingestion statistics
@@ -129,43 +149,31 @@ def ingest_deals(
     Model = BulkDeal if deal_type == "BULK" else BlockDeal
 
     # Get list of valid symbols if skip_missing_symbols
-    valid_symbols = set()
-    if skip_missing_symbols:
-        from app.models.security import Security
-        symbols_query = db.query(Security.symbol).all()
-        valid_symbols = {s[0] for s in symbols_query}
+    valid_symbols = get_security_symbols(db) if skip_missing_symbols else frozenset()
+
+    rows = []
+    for record in deals_data:
+        # Skip if symbol not in securities table
+        if skip_missing_symbols and record.get('symbol') not in valid_symbols:
+            result["records_skipped"] += 1
+            continue
+        rows.append(record)
 
     try:
-        for record in deals_data:
-            try:
-                symbol = record.get('symbol')
-
-                # Skip if symbol not in securities table
-                if skip_missing_symbols and symbol not in valid_symbols:
-                    result["records_skipped"] += 1
-                    continue
-
-                # Insert new record (no upsert - each deal is unique)
-                deal = Model(**record)
-                db.add(deal)
-                result["records_inserted"] += 1
-
-            except IntegrityError as e:
-                db.rollback()
-                result["errors"].append(f"Integrity error for {record.get('symbol')}: {str(e)}")
-                result["records_failed"] += 1
-            except Exception as e:
-                db.rollback()
-                result["errors"].append(f"Error inserting {record.get('symbol')}: {str(e)}")
-                result["records_failed"] += 1
-
-        # Commit all changes
+        # Insert new records (no upsert - each deal is unique)
+        with secondary_indexes_dropped(db, Model) if rebuild_indexes else nullcontext():
+            result["records_inserted"] = copy_insert(db, Model, rows, batch_size=batch_size)
         db.commit()
-        result["success"] = True  # Success even if some failed, as long as we didn't crash
+        result["success"] = True
 
+    except IntegrityError as e:
+        db.rollback()
+        result["errors"].append(f"Integrity error in {deal_type.lower()} deals batch: {str(e)}")
+        result["records_failed"] = len(rows)
     except Exception as e:
         db.rollback()
         result["errors"].append(f"Database transaction failed: {str(e)}")
+        result["records_failed"] = len(rows)
         result["success"] = False
 
     return result
@@ -175,7 +183,9 @@ def ingest_deals_from_nse(
     db: Session,
     deal_type: str = "BULK",
     file_path: Optional[str] = None,
-    skip_missing_symbols: bool = False
+    skip_missing_symbols: bool = False,
+    batch_size: int = MAX_BATCH_SIZE,
+    rebuild_indexes: bool = False
 ) -> Dict:
     """
     Complete workflow: Fetch, parse, and ingest deals data.
@@ -185,6 +195,8 @@ def ingest_deals_from_nse(
         deal_type: "BULK" or "BLOCK"
         file_path: Optional local file path (for testing)
         skip_missing_symbols: If True, only insert symbols that exist in securities table
+        batch_size: Rows per COPY/MERGE batch (max 10,000)
+        rebuild_indexes: Drop secondary indexes for the load and rebuild them once after
 
     Returns:
         Dict with complete ingestion results
@@ -202,6 +214,18 @@ def ingest_deals_from_nse(
             "ingestion_result": None
         }
 
+    if fetch_result["not_modified"]:
+        return {
+            "success": True,
+            "message": "Source file unchanged since last ingestion",
+            "source": fetch_result["source"],
+            "deal_date": None,
+            "not_modified": True,
+            "parse_stats": {},
+            "ingestion_result": None,
+            "total_errors": []
+        }
+
     # Handle "no records" case
     if fetch_result["stats"].get("no_records", False):
         return {
@@ -224,8 +248,12 @@ def ingest_deals_from_nse(
         db=db,
         deals_data=fetch_result["data"],
         deal_type=deal_type,
-        skip_missing_symbols=skip_missing_symbols
+        skip_missing_symbols=skip_missing_symbols,
+        batch_size=batch_size,
+        rebuild_indexes=rebuild_indexes
     )
+    if ingestion_result["success"]:
+        remember_validators(fetch_result["source"], fetch_result["validators"])
 
     return {
         "success": ingestion_result["success"],
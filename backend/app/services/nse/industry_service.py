@@ -2,7 +2,8 @@
 NSE Industry Classification & Index Constituent Service.
 
 Handles fetching industry classification and index membership data from NSE Quote Equity API.
-Requires Playwright for cookie-based authentication.
+The API only needs the session cookies (nsit, nseappid, ...) that the NSE homepage
+sets, so a plain HTTP GET primes a shared httpx cookie jar; no browser is needed.
 
 Data Source: https://www.nseindia.com/api/quote-equity?symbol={SYMBOL}
 """
@@ -12,9 +13,8 @@ from typing import Dict, List, Optional, Tuple
 from datetime import date, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, select
 
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 import httpx
 
 from app.models.metadata import IndustryClassification, IndexConstituent
@@ -25,10 +25,21 @@ from app.models.security import Security, Index
 NSE_QUOTE_API = "https://www.nseindia.com/api/quote-equity"
 NSE_HOMEPAGE = "https://www.nseindia.com"
 
+NSE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+    "Accept": "application/json",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": NSE_HOMEPAGE
+}
+
 # Rate limiting
-RATE_LIMIT_DELAY = 1.0  # seconds between requests
+RATE_LIMIT_DELAY = 0.1  # seconds each request slot waits after a request
+MAX_CONCURRENT_REQUESTS = 10
 MAX_RETRIES = 3
 
+# NSE session cookies are refreshed after this many seconds
+COOKIE_TTL_SECONDS = 20 * 60
+
 
 class IndustryServiceError(Exception):
     """Raised when industry service operations fail."""
@@ -37,64 +48,60 @@ class IndustryServiceError(Exception):
 
 class NSECookieManager:
     """
-    Manages NSE cookie authentication using Playwright.
+    Manages NSE cookie authentication for the Quote Equity API.
 
-    NSE Quote API requires cookies (_abck, nsit, nseappid) that are set via JavaScript.
-    This manager uses a headless browser to obtain and refresh cookies.
+    NSE Quote API rejects requests without the cookies (nsit, nseappid, ...) that
+    its homepage sets. This manager owns one pooled httpx.AsyncClient whose cookie
+    jar is primed from the homepage and re-primed when it expires or NSE answers 403.
     """
 
     def __init__(self):
-        self.cookies: Dict[str, str] = {}
-        self.browser: Optional[Browser] = None
-        self.context: Optional[BrowserContext] = None
+        self.client: Optional[httpx.AsyncClient] = None
         self.cookie_expiry: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
 
     async def initialize(self):
-        """Initialize Playwright browser and fetch initial cookies."""
-        playwright = await async_playwright().start()
-        self.browser = await playwright.chromium.launch(headless=True)
-        self.context = await self.browser.new_context(
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+        """Create the HTTP client and fetch initial cookies."""
+        self.client = httpx.AsyncClient(
+            http2=True,
+            headers=NSE_HEADERS,
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=MAX_CONCURRENT_REQUESTS)
         )
         await self._refresh_cookies()
 
-    async def _refresh_cookies(self):
-        """Navigate to NSE homepage and extract cookies."""
-        if not self.context:
-            raise IndustryServiceError("Browser context not initialized")
+    async def _refresh_cookies(self, stale_expiry: Optional[float] = None):
+        """
+        GET the NSE homepage so it sets fresh session cookies on the client.
 
-        page = await self.context.new_page()
-        try:
-            # Navigate to NSE homepage and wait for cookies to be set
-            await page.goto(NSE_HOMEPAGE, wait_until="networkidle", timeout=30000)
-            await page.wait_for_timeout(3000)  # Wait 3s for JavaScript to set cookies
-
-            # Extract cookies
-            cookies = await self.context.cookies()
-            self.cookies = {
-                cookie['name']: cookie['value']
-                for cookie in cookies
-                if cookie['name'] in ('_abck', 'nsit', 'nseappid', 'ak_bmsc', 'bm_sv')
-            }
+        Args:
+            stale_expiry: cookie_expiry the caller saw before its request failed; if
+                another request already refreshed since then, the refresh is skipped
+        """
+        if not self.client:
+            raise IndustryServiceError("HTTP client not initialized")
 
-            # Set cookie expiry (refresh after 20 minutes)
-            self.cookie_expiry = time.time() + (20 * 60)
+        async with self._refresh_lock:
+            if stale_expiry is not None and self.cookie_expiry != stale_expiry:
+                return
+
+            self.client.cookies.clear()
+            response = await self.client.get(NSE_HOMEPAGE, headers={"Accept": "text/html"})
+            response.raise_for_status()
 
-        finally:
-            await page.close()
+            # Set cookie expiry (refresh after 20 minutes)
+            self.cookie_expiry = time.time() + COOKIE_TTL_SECONDS
 
-    async def get_cookies(self) -> Dict[str, str]:
-        """Get current cookies, refreshing if expired."""
-        if not self.cookies or (self.cookie_expiry and time.time() > self.cookie_expiry):
-            await self._refresh_cookies()
-        return self.cookies
+    async def ensure_cookies(self) -> Optional[float]:
+        """Refresh cookies if expired; returns the current cookie_expiry."""
+        if self.cookie_expiry is None or time.time() > self.cookie_expiry:
+            await self._refresh_cookies(stale_expiry=self.cookie_expiry)
+        return self.cookie_expiry
 
     async def close(self):
-        """Close browser and cleanup resources."""
-        if self.context:
-            await self.context.close()
-        if self.browser:
-            await self.browser.close()
+        """Close the HTTP client and its pooled connections."""
+        if self.client:
+            await self.client.aclose()
 
 
 async def fetch_quote_data(symbol: str, cookie_manager: NSECookieManager) -> Dict:
@@ -117,35 +124,24 @@ async def fetch_quote_data(symbol: str, cookie_manager: NSECookieManager) -> Dic
 
     for attempt in range(MAX_RETRIES):
         try:
-            cookies = await cookie_manager.get_cookies()
-
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    NSE_QUOTE_API,
-                    params={"symbol": symbol},
-                    headers={
-                        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-                        "Accept": "application/json",
-                        "Accept-Language": "en-US,en;q=0.9",
-                        "Referer": NSE_HOMEPAGE
-                    },
-                    cookies=cookies
-                )
-
-                if response.status_code == 403:
-                    # Cookie expired, refresh and retry
-                    await cookie_manager._refresh_cookies()
-                    if attempt < MAX_RETRIES - 1:
-                        await asyncio.sleep(2)
-                        continue
-                    result["error"] = "Authentication failed after retries"
-                    return result
-
-                response.raise_for_status()
-                result["data"] = response.json()
-                result["success"] = True
+            cookie_expiry = await cookie_manager.ensure_cookies()
+
+            response = await cookie_manager.client.get(NSE_QUOTE_API, params={"symbol": symbol})
+
+            if response.status_code == 403:
+                # Cookie expired, refresh (once across concurrent requests) and retry
+                await cookie_manager._refresh_cookies(stale_expiry=cookie_expiry)
+                if attempt < MAX_RETRIES - 1:
+                    await asyncio.sleep(2)
+                    continue
+                result["error"] = "Authentication failed after retries"
                 return result
 
+            response.raise_for_status()
+            result["data"] = response.json()
+            result["success"] = True
+            return result
+
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
                 result["error"] = f"Symbol not found: {symbol}"
@@ -154,13 +150,38 @@ async def fetch_quote_data(symbol: str, cookie_manager: NSECookieManager) -> Dic
         except Exception as e:
             result["error"] = f"Request failed: {str(e)}"
 
-        # Rate limiting between retries
+        # Back off between retries
         if attempt < MAX_RETRIES - 1:
-            await asyncio.sleep(RATE_LIMIT_DELAY * (attempt + 1))
+            await asyncio.sleep(1.0 * (attempt + 1))
 
     return result
 
 
+async def fetch_all_quotes(symbol_list: List[str], cookie_manager: NSECookieManager) -> List[Dict]:
+    """
+    Fetch NSE Quote Equity data for many symbols with bounded concurrency.
+
+    At most MAX_CONCURRENT_REQUESTS requests are in flight; each slot pauses
+    RATE_LIMIT_DELAY after its request to stay polite to NSE.
+
+    Args:
+        symbol_list: NSE symbols
+        cookie_manager: Initialized NSECookieManager instance
+
+    Returns:
+        fetch_quote_data results, in symbol_list order
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def fetch(symbol: str) -> Dict:
+        async with semaphore:
+            quote_result = await fetch_quote_data(symbol, cookie_manager)
+            await asyncio.sleep(RATE_LIMIT_DELAY)
+            return quote_result
+
+    return await asyncio.gather(*(fetch(symbol) for symbol in symbol_list))
+
+
 def parse_industry_classification(quote_data: Dict, symbol: str) -> Optional[Dict]:
     """
     Parse industry classification from NSE Quote data.
@@ -239,7 +260,7 @@ async def scrape_all_securities(
     cookie_manager = NSECookieManager()
 
     try:
-        # Initialize Playwright browser
+        # Create the HTTP client and prime NSE cookies
         await cookie_manager.initialize()
 
         # Get list of symbols to scrape
@@ -256,17 +277,13 @@ async def scrape_all_securities(
 
         # Track all index names seen (for bulk insert into indices table)
         all_index_names = set()
+        symbol_index_names: Dict[str, List[str]] = {}
 
-        # Scrape each symbol
-        for i, symbol in enumerate(symbol_list, 1):
-            try:
-                # Rate limiting
-                if i > 1:
-                    await asyncio.sleep(RATE_LIMIT_DELAY)
-
-                # Fetch quote data
-                quote_result = await fetch_quote_data(symbol, cookie_manager)
+        # Fetch all quotes concurrently, then store them one by one
+        quote_results = await fetch_all_quotes(symbol_list, cookie_manager)
 
+        for i, (symbol, quote_result) in enumerate(zip(symbol_list, quote_results), 1):
+            try:
                 if not quote_result["success"]:
                     result["symbols_failed"] += 1
                     result["errors"].append(f"{symbol}: {quote_result['error']}")
@@ -283,12 +300,13 @@ async def scrape_all_securities(
                 # Parse index constituents
                 index_names = parse_index_constituents(quote_data, symbol, scrape_date)
                 all_index_names.update(index_names)
+                symbol_index_names[symbol] = index_names
 
                 result["symbols_processed"] += 1
 
                 # Log progress every 50 symbols
                 if i % 50 == 0:
-                    print(f"Progress: {i}/{result['total_symbols']} symbols scraped")
+                    print(f"Progress: {i}/{result['total_symbols']} symbols stored")
 
             except Exception as e:
                 result["symbols_failed"] += 1
@@ -297,9 +315,9 @@ async def scrape_all_securities(
         # Ensure all indices exist in indices table
         ensure_indices_exist(db, list(all_index_names))
 
-        # Now process index constituents for all symbols
-        result["index_constituent_records"] = await process_index_constituents(
-            db, symbol_list, cookie_manager, scrape_date
+        # Now process index constituents from the same quotes
+        result["index_constituent_records"] = process_index_constituents(
+            db, symbol_index_names, scrape_date
         )
 
         db.commit()
@@ -322,25 +340,23 @@ async def scrape_all_securities(
     return result
 
 
-async def process_index_constituents(
+def process_index_constituents(
     db: Session,
-    symbol_list: List[str],
-    cookie_manager: NSECookieManager,
+    symbol_index_names: Dict[str, List[str]],
     scrape_date: date
 ) -> int:
     """
     Process index constituents for all symbols and track entry/exit.
 
     This function:
-    1. Fetches current index membership for each symbol
+    1. Takes current index membership parsed from each symbol's quote
     2. Compares with existing database records
     3. Inserts new constituents (effective_from = scrape_date)
     4. Marks removed constituents (effective_to = scrape_date - 1)
 
     Args:
         db: Database session
-        symbol_list: List of symbols to process
-        cookie_manager: Initialized NSECookieManager
+        symbol_index_names: Map of symbol -> index names from its NSE quote
         scrape_date: Date of this scrape
 
     Returns:
@@ -348,27 +364,18 @@ async def process_index_constituents(
     """
     records_affected = 0
 
-    # Build map of symbol -> current index IDs from API
-    symbol_current_indices: Dict[str, set] = {}
-
-    for symbol in symbol_list:
-        try:
-            # Fetch quote data (may have been cached in previous step, but re-fetch for safety)
-            quote_result = await fetch_quote_data(symbol, cookie_manager)
-            if not quote_result["success"]:
-                continue
-
-            index_names = parse_index_constituents(quote_result["data"], symbol, scrape_date)
-
-            # Resolve index names to index IDs
-            if index_names:
-                index_ids = db.query(Index.id).filter(Index.index_name.in_(index_names)).all()
-                symbol_current_indices[symbol] = {idx.id for idx in index_ids}
+    # Resolve all index names to IDs in one query
+    all_index_names = {name for index_names in symbol_index_names.values() for name in index_names}
+    index_ids_by_name = dict(db.execute(
+        select(Index.index_name, Index.id).where(Index.index_name.in_(all_index_names))
+    ).all()) if all_index_names else {}
 
-            await asyncio.sleep(RATE_LIMIT_DELAY)
-
-        except Exception:
-            continue
+    # Build map of symbol -> current index IDs from API
+    symbol_current_indices: Dict[str, set] = {
+        symbol: {index_ids_by_name[name] for name in index_names if name in index_ids_by_name}
+        for symbol, index_names in symbol_index_names.items()
+        if index_names
+    }
 
     # For each symbol, compare current vs database state
     for symbol, current_index_ids in symbol_current_indices.items():
@@ -511,22 +518,24 @@ def get_index_constituents(
         List of symbol strings
     """
     # Get index ID
-    index = db.query(Index).filter(Index.index_name == index_name).first()
-    if not index:
+    index_id = db.execute(
+        select(Index.id).where(Index.index_name == index_name)
+    ).scalar()
+    if index_id is None:
         return []
 
     query_date = as_of_date if as_of_date else date.today()
 
     # Query constituents active on query_date
-    records = db.query(IndexConstituent).filter(
+    symbols = db.execute(select(IndexConstituent.symbol).where(
         and_(
-            IndexConstituent.index_id == index.id,
+            IndexConstituent.index_id == index_id,
             IndexConstituent.effective_from <= query_date,
             or_(
                 IndexConstituent.effective_to.is_(None),
                 IndexConstituent.effective_to >= query_date
             )
         )
-    ).all()
+    )).scalars().all()
 
-    return [record.symbol for record in records]
+    return list(symbols)
@@ -0,0 +1,325 @@
+"""
+Background runner for NSE (and long-running Upstox) ingestion jobs.
+
+The ingest endpoints create an ingestion_jobs row and hand the actual
+fetch/parse/write to run_ingestion_job via FastAPI BackgroundTasks, so the
+request returns 202 immediately instead of holding a worker for the whole
+NSE download or Upstox backfill. Clients poll GET /ingest/status/{job_id}
+for the outcome.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+from sqlalchemy.orm import Session
+
+from app.database.session import SessionLocal, get_db_context
+from app.models.metadata import IngestionJob
+from app.services.nse.archive_cache import remember_validators
+from app.services.nse.deals_service import ingest_deals_from_nse
+from app.services.nse.market_cap_service import ingest_market_cap_from_nse
+from app.services.nse.securities_service import ingest_securities_from_nse
+from app.services.nse.surveillance_service import fetch_surveillance_data, ingest_surveillance
+from app.services.upstox.batch_historical_service import BatchHistoricalService
+from app.services.upstox.index_historical_service import IndexHistoricalService
+from app.services.upstox.instrument_service import ingest_instruments_from_upstox
+from app.utils.pg_copy import MAX_BATCH_SIZE
+from app.utils.resource_monitor import monitor_resources
+
+logger = logging.getLogger(__name__)
+
+# NSE throttles aggressive clients: at most this many archive downloads at once
+NSE_MAX_CONCURRENT_FETCHES = 3
+
+
+# Keys holding error lists in service results, in precedence order:
+# total_errors already combines fetch_errors with the nested
+# ingestion_result errors, so a dict reports only its first present key
+ERROR_LIST_KEYS = ("total_errors", "errors", "fetch_errors")
+
+
+def collect_errors(result: Dict[str, Any]) -> List[Any]:
+    """
+    Gather every error from a service result, including nested results.
+
+    A dict with an error list contributes that list (the first of
+    ERROR_LIST_KEYS present); dicts without one (e.g. /all's per-source
+    results) are searched recursively.
+    """
+    for key in ERROR_LIST_KEYS:
+        if isinstance(result.get(key), list):
+            return list(result[key])
+
+    errors = []
+    for value in result.values():
+        if isinstance(value, dict):
+            errors.extend(collect_errors(value))
+    return errors
+
+
+def _update_ingestion_job(job_id: str, **fields) -> None:
+    """Apply field updates to an ingestion_jobs row in its own short-lived session."""
+    with get_db_context() as db:
+        job = db.get(IngestionJob, job_id)
+        if job is None:
+            return
+        for key, value in fields.items():
+            setattr(job, key, value)
+        db.commit()
+
+
+def run_surveillance_ingestion(
+    db: Session,
+    filename: Optional[str] = None,
+    ingestion_date: Optional[date] = None,
+    file_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Fetch + ingest surveillance data as a single job.
+
+    Args:
+        db: Database session
+        filename: NSE filename (e.g., 'REG1_IND160125.csv')
+        ingestion_date: Optional date override
+        file_path: Optional local file path for testing
+
+    Returns:
+        Dict with success, ingestion_date, source, parse_stats, records_inserted,
+        records_updated, total_records, not_modified and errors
+    """
+    fetch_result = fetch_surveillance_data(
+        filename=filename,
+        ingestion_date=ingestion_date,
+        file_path=file_path
+    )
+
+    if not fetch_result["success"]:
+        return {
+            "success": False,
+            "message": "Surveillance data fetch/parse failed",
+            "source": fetch_result.get("source", ""),
+            "parse_stats": fetch_result.get("stats", {}),
+            "errors": fetch_result.get("errors", [])
+        }
+
+    if fetch_result["not_modified"]:
+        return {
+            "success": True,
+            "message": "Source file unchanged since last ingestion",
+            "source": fetch_result["source"],
+            "not_modified": True,
+            "parse_stats": {},
+            "total_records": 0,
+            "errors": []
+        }
+
+    ingest_result = ingest_surveillance(
+        db=db,
+        surveillance_data=fetch_result["data"],
+        skip_missing_symbols=True,
+        # The four tables are written concurrently on their own connections
+        session_factory=SessionLocal
+    )
+
+    # Only a run where every table was written marks the file as ingested
+    if ingest_result["success"] and not ingest_result.get("records_failed"):
+        remember_validators(fetch_result["source"], fetch_result["validators"])
+
+    return {
+        "success": ingest_result["success"],
+        "message": (
+            f"Surveillance data ingestion completed for {fetch_result['ingestion_date']}"
+            if ingest_result["success"] else "Surveillance data ingestion failed"
+        ),
+        "ingestion_date": fetch_result["ingestion_date"],
+        "source": fetch_result.get("source", ""),
+        "parse_stats": fetch_result.get("stats", {}),
+        "records_inserted": ingest_result.get("records_inserted", {}),
+        "records_updated": ingest_result.get("records_updated", {}),
+        "total_records": sum(ingest_result.get("records_inserted", {}).values()),
+        "errors": fetch_result.get("errors", []) + ingest_result.get("errors", [])
+    }
+
+
+def _run_in_own_session(ingest_func: Callable[..., Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+    """Run one ingestion service on its own session, turning exceptions into a failed result."""
+    try:
+        with get_db_context() as db:
+            return ingest_func(db=db, **kwargs)
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Unexpected error during ingestion: {str(e)}",
+            "error_type": type(e).__name__,
+            "errors": [str(e)]
+        }
+
+
+def run_all_nse_ingestion(
+    db: Session,
+    target_date: date,
+    batch_size: int = MAX_BATCH_SIZE
+) -> Dict[str, Any]:
+    """
+    Ingest securities, ETFs, market cap and bulk/block deals as a single job.
+
+    Sources run concurrently on their own sessions, in two phases: the
+    securities/ETF lists first, since market cap skips symbols missing from
+    securities; then market cap and both deal files.
+
+    Args:
+        db: Unused; every source gets its own session so they can overlap
+        target_date: Trade date for the market cap archive
+        batch_size: Rows per COPY/MERGE batch
+
+    Returns:
+        Dict with success, message, failed_sources and results (per-source result dicts)
+    """
+    phases = [
+        {
+            "securities": (ingest_securities_from_nse, {"use_equity": True}),
+            "etf": (ingest_securities_from_nse, {"use_equity": False}),
+        },
+        {
+            "market_cap": (ingest_market_cap_from_nse, {"target_date": target_date, "skip_missing_symbols": True}),
+            "bulk_deals": (ingest_deals_from_nse, {"deal_type": "BULK", "skip_missing_symbols": False}),
+            "block_deals": (ingest_deals_from_nse, {"deal_type": "BLOCK", "skip_missing_symbols": False}),
+        },
+    ]
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=NSE_MAX_CONCURRENT_FETCHES) as executor:
+        for phase in phases:
+            futures = {
+                source: executor.submit(_run_in_own_session, ingest_func, batch_size=batch_size, **kwargs)
+                for source, (ingest_func, kwargs) in phase.items()
+            }
+            results.update({source: future.result() for source, future in futures.items()})
+
+    failed_sources = [source for source, result in results.items() if not result.get("success", False)]
+
+    return {
+        "success": not failed_sources,
+        "message": (
+            f"NSE ingestion failed for: {', '.join(failed_sources)}" if failed_sources
+            else f"NSE ingestion completed for all {len(results)} sources"
+        ),
+        "failed_sources": failed_sources,
+        "results": results
+    }
+
+
+def run_upstox_instruments_ingestion(db: Session) -> Dict[str, Any]:
+    """
+    Ingest the Upstox instrument master and rebuild symbol mappings.
+
+    Every worker picks up the rebuilt mappings on its next lookup
+    (get_symbol_instrument_map checks a version token).
+
+    Args:
+        db: Database session
+
+    Returns:
+        Dict from ingest_instruments_from_upstox (success, total_instruments,
+        instruments_inserted/updated, mappings_created, errors, duration_seconds)
+    """
+    return ingest_instruments_from_upstox(db=db)
+
+
+@monitor_resources("Historical OHLCV Batch Ingestion")
+def run_historical_ohlcv_batch(
+    db: Session,
+    symbols: Optional[List[str]] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    batch_size: int = 50
+) -> Dict[str, Any]:
+    """
+    Backfill historical OHLCV from Upstox for many securities.
+
+    Args:
+        db: Database session
+        symbols: Symbols to process (default: all active securities)
+        start_date: Start date (default: 5 years ago)
+        end_date: End date (default: yesterday)
+        batch_size: Symbols per batch
+
+    Returns:
+        Dict from BatchHistoricalService.fetch_batch_historical_ohlcv
+    """
+    return BatchHistoricalService(db).fetch_batch_historical_ohlcv(
+        symbols=symbols,
+        start_date=start_date,
+        end_date=end_date,
+        batch_size=batch_size
+    )
+
+
+@monitor_resources("Historical Index OHLCV Ingestion")
+def run_indices_historical_ohlcv(
+    db: Session,
+    index_symbols: Optional[List[str]] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    batch_size: int = 20
+) -> Dict[str, Any]:
+    """
+    Backfill historical OHLCV from Upstox for NSE indices.
+
+    Args:
+        db: Database session
+        index_symbols: Index symbols to process (default: all NSE indices)
+        start_date: Start date (default: 5 years ago)
+        end_date: End date (default: yesterday)
+        batch_size: Indices processed in parallel
+
+    Returns:
+        Dict from IndexHistoricalService.ingest_historical_ohlcv_batch
+    """
+    return IndexHistoricalService(db).ingest_historical_ohlcv_batch(
+        index_symbols=index_symbols,
+        start_date=start_date,
+        end_date=end_date,
+        batch_size=batch_size
+    )
+
+
+def run_ingestion_job(
+    job_id: str,
+    ingest_func: Callable[..., Dict[str, Any]],
+    **kwargs
+) -> None:
+    """
+    Background task wrapper around an NSE ingestion service.
+
+    Runs after the response is sent (in the threadpool, since the services are
+    sync), so it never borrows the request-scoped session: the service gets its
+    own session and job status is written in separate short transactions.
+
+    Args:
+        job_id: ingestion_jobs.id created by the endpoint
+        ingest_func: Service function taking db as a keyword argument
+        **kwargs: Remaining keyword arguments for ingest_func
+    """
+    _update_ingestion_job(job_id, status="running")
+
+    result = _run_in_own_session(ingest_func, **kwargs)
+
+    success = bool(result.get("success", False))
+    if not success:
+        # /status/{job_id} only returns the first errors; keep the full lists in the log
+        logger.error(
+            f"Ingestion job {job_id} failed: {result.get('message')}",
+            extra={"errors": collect_errors(result)}
+        )
+    _update_ingestion_job(
+        job_id,
+        status="success" if success else "failed",
+        message=result.get("message") or ("Ingestion completed" if success else "Ingestion failed"),
+        # Results carry dates/Decimals; round-trip through orjson (dates natively,
+        # Decimals via str) so the JSON column accepts them
+        result=orjson.loads(orjson.dumps(result, default=str)),
+        completed_at=datetime.now(timezone.utc)
+    )
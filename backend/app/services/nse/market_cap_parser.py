@@ -10,6 +10,7 @@ References:
 import csv
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache
 from typing import Dict, List, Optional
 from io import StringIO
 
@@ -19,6 +20,9 @@ class MarketCapParseError(Exception):
     pass
 
 
+# Every row of an MCAP file carries the same Trade Date: after the first row
+# the strptime is a cache hit
+@lru_cache(maxsize=64)
 def parse_market_cap_date(date_str: str) -> Optional[datetime.date]:
     """
     Parse market cap date format: DD MMM YYYY (e.g., "16 JAN 2025").
@@ -5,17 +5,20 @@ Handles fetching, extracting, parsing, and storing NSE market cap data.
 ZIP archives are downloaded, extracted, and the MCAP CSV file is parsed.
 """
 import requests
-import zipfile
 import tempfile
-import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime, date
-from typing import Dict, Optional
+from typing import AbstractSet, BinaryIO, Dict, Optional, Union
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.dialects.postgresql import insert
 
 from app.models.timeseries import MarketCapHistory
 from app.services.nse.market_cap_parser import parse_market_cap_csv
+from app.services.nse.archive_cache import get_nse_session
+from app.services.nse.securities_service import get_security_symbols
+from app.utils.pg_copy import MAX_BATCH_SIZE, copy_merge, secondary_indexes_dropped
 
 
 def get_market_cap_url(target_date: date) -> str:
@@ -35,7 +38,7 @@ def get_market_cap_url(target_date: date) -> str:
     return f"https://nsearchives.nseindia.com/archives/equities/bhavcopy/pr/PR{date_str}.zip"
 
 
-def extract_mcap_csv_from_zip(zip_path: str, target_date: date) -> Optional[str]:
+def extract_mcap_csv_from_zip(zip_path: Union[str, BinaryIO], target_date: date) -> Optional[str]:
     """
     Extract MCAP CSV file from ZIP archive.
 
@@ -43,7 +46,7 @@ def extract_mcap_csv_from_zip(zip_path: str, target_date: date) -> Optional[str]
     We need to find MCAP{DDMMYYYY}.csv (4-digit year).
 
     Args:
-        zip_path: Path to ZIP file
+        zip_path: Path to ZIP file, or a file-like object holding the archive
         target_date: Date to locate correct CSV file
 
     Returns:
@@ -54,15 +57,22 @@ def extract_mcap_csv_from_zip(zip_path: str, target_date: date) -> Optional[str]
         csv_filename = f"MCAP{target_date.strftime('%d%m%Y')}.csv"
 
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            # List all files in ZIP
-            zip_files = zip_ref.namelist()
-
-            # Find the MCAP CSV file (may be in a subdirectory)
+            # NSE archives keep the file under PR{DDMMYY}/: look that (and the
+            # root) up directly before falling back to scanning every entry
             mcap_file = None
-            for file in zip_files:
-                if csv_filename in file and not file.startswith('__MACOSX'):
-                    mcap_file = file
+            for candidate in (f"PR{target_date.strftime('%d%m%y')}/{csv_filename}", csv_filename):
+                try:
+                    mcap_file = zip_ref.getinfo(candidate).filename
                     break
+                except KeyError:
+                    continue
+
+            # Find the MCAP CSV file (may be in another subdirectory)
+            if mcap_file is None:
+                for file in zip_ref.namelist():
+                    if csv_filename in file and not file.startswith('__MACOSX'):
+                        mcap_file = file
+                        break
 
             if not mcap_file:
                 return None
@@ -82,6 +92,26 @@ class MarketCapParseError(Exception):
     pass
 
 
+# PR archives are usually a few MB and stay in memory; anything larger spills
+# to a temp file instead of growing the worker's RSS
+MCAP_ZIP_SPOOL_MAX_BYTES = 8 << 20
+
+
+def _download_archive(url: str) -> tempfile.SpooledTemporaryFile:
+    """Stream an archive from NSE into a spooled temp file, rewound for reading."""
+    spool = tempfile.SpooledTemporaryFile(max_size=MCAP_ZIP_SPOOL_MAX_BYTES)
+    try:
+        with get_nse_session().get(url, timeout=60, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
 def fetch_market_cap_data(target_date: date, file_path: Optional[str] = None) -> Dict:
     """
     Fetch and parse NSE market cap data for a specific date.
@@ -106,30 +136,21 @@ def fetch_market_cap_data(target_date: date, file_path: Optional[str] = None) ->
         "trade_date": None
     }
 
-    temp_zip_path = None
-
     try:
         # Fetch ZIP file
         if file_path:
             # Use local file
-            temp_zip_path = file_path
+            archive = nullcontext(file_path)
             result["source"] = f"file://{file_path}"
         else:
             # Download from NSE
             url = get_market_cap_url(target_date)
             result["source"] = url
-
-            # Download to temporary file
-            response = requests.get(url, timeout=60)
-            response.raise_for_status()
-
-            # Save to temp file
-            with tempfile.NamedTemporaryFile(mode='wb', suffix='.zip', delete=False) as tmp:
-                tmp.write(response.content)
-                temp_zip_path = tmp.name
+            archive = _download_archive(url)
 
         # Extract and parse CSV
-        csv_content = extract_mcap_csv_from_zip(temp_zip_path, target_date)
+        with archive as zip_source:
+            csv_content = extract_mcap_csv_from_zip(zip_source, target_date)
 
         if not csv_content:
             result["errors"].append(f"MCAP CSV file not found in archive for date {target_date}")
@@ -153,27 +174,31 @@ def fetch_market_cap_data(target_date: date, file_path: Optional[str] = None) ->
     except Exception as e:
         result["errors"].append(f"Unexpected error: {str(e)}")
         result["success"] = False
-    finally:
-        # Clean up temporary file if we downloaded it
-        if temp_zip_path and not file_path and os.path.exists(temp_zip_path):
-            try:
-                os.unlink(temp_zip_path)
-            except:
-                pass
 
     return result
 
 
-def ingest_market_cap(db: Session, market_cap_data: list, skip_missing_symbols: bool = True) -> Dict:
+def ingest_market_cap(
+    db: Session,
+    market_cap_data: list,
+    skip_missing_symbols: bool = True,
+    batch_size: int = MAX_BATCH_SIZE,
+    rebuild_indexes: bool = False,
+    valid_symbols: Optional[AbstractSet[str]] = None
+) -> Dict:
     """
     Insert or update market cap records in database.
 
-    Uses PostgreSQL UPSERT (INSERT ... ON CONFLICT) to handle duplicates.
+    Streams rows into a temp table with COPY and upserts them with one MERGE
+    on (symbol, date).
 
     Args:
         db: SQLAlchemy database session
         market_cap_data: List of market cap dicts from parser
         skip_missing_symbols: If True, skip symbols not in securities table
+        batch_size: Rows per COPY/MERGE batch (max 10,000)
+        rebuild_indexes: Drop secondary indexes for the load and rebuild them once after
+        valid_symbols: Pre-loaded securities symbols (queried here when None)
 
     Returns:
         Dict with ingestion statistics
@@ -192,57 +217,40 @@ def ingest_market_cap(db: Session, market_cap_data: list, skip_missing_symbols:
         return result
 
     # Get list of valid symbols from securities table if skip_missing_symbols
-    valid_symbols = set()
-    if skip_missing_symbols:
-        from app.models.security import Security
-        symbols_query = db.query(Security.symbol).all()
-        valid_symbols = {s[0] for s in symbols_query}
+    if skip_missing_symbols and valid_symbols is None:
+        valid_symbols = get_security_symbols(db)
 
-    try:
-        for record in market_cap_data:
-            try:
-                symbol = record.get('symbol')
+    rows = []
+    for record in market_cap_data:
+        # Skip if symbol not in securities table
+        if skip_missing_symbols and record.get('symbol') not in valid_symbols:
+            result["records_skipped"] += 1
+            continue
+        rows.append(record)
 
-                # Skip if symbol not in securities table
-                if skip_missing_symbols and symbol not in valid_symbols:
-                    result["records_skipped"] += 1
-                    continue
+    # MERGE cannot match the same (symbol, date) twice
+    rows = list({(row['symbol'], row['date']): row for row in rows}.values())
 
-                # Use PostgreSQL INSERT ... ON CONFLICT for upsert
-                stmt = insert(MarketCapHistory).values(**record)
-
-                # On conflict (symbol + date), update the record
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=['symbol', 'date'],
-                    set_={
-                        'market_cap': stmt.excluded.market_cap,
-                        'close_price': stmt.excluded.close_price,
-                        'issue_size': stmt.excluded.issue_size,
-                        'face_value': stmt.excluded.face_value,
-                        'category': stmt.excluded.category,
-                        'series': stmt.excluded.series,
-                    }
-                )
-
-                db.execute(stmt)
-                result["records_inserted"] += 1
-
-            except IntegrityError as e:
-                db.rollback()
-                result["errors"].append(f"Integrity error for {record.get('symbol')}: {str(e)}")
-                result["records_failed"] += 1
-            except Exception as e:
-                db.rollback()
-                result["errors"].append(f"Error inserting {record.get('symbol')}: {str(e)}")
-                result["records_failed"] += 1
-
-        # Commit all changes
+    try:
+        # COPY into a temp table, then MERGE on (symbol, date)
+        with secondary_indexes_dropped(db, MarketCapHistory) if rebuild_indexes else nullcontext():
+            result["records_inserted"] = copy_merge(
+                db, MarketCapHistory, rows,
+                key_columns=['symbol', 'date'],
+                update_columns=['market_cap', 'close_price', 'issue_size', 'face_value', 'category', 'series'],
+                batch_size=batch_size
+            )
         db.commit()
         result["success"] = result["records_inserted"] > 0
 
+    except IntegrityError as e:
+        db.rollback()
+        result["errors"].append(f"Integrity error in market cap batch: {str(e)}")
+        result["records_failed"] = len(rows)
     except Exception as e:
         db.rollback()
         result["errors"].append(f"Database transaction failed: {str(e)}")
+        result["records_failed"] = len(rows)
         result["success"] = False
 
     return result
@@ -252,7 +260,9 @@ def ingest_market_cap_from_nse(
     db: Session,
     target_date: date,
     file_path: Optional[str] = None,
-    skip_missing_symbols: bool = True
+    skip_missing_symbols: bool = True,
+    batch_size: int = MAX_BATCH_SIZE,
+    rebuild_indexes: bool = False
 ) -> Dict:
     """
     Complete workflow: Fetch, extract, parse, and ingest market cap data.
@@ -262,12 +272,18 @@ def ingest_market_cap_from_nse(
         target_date: Date to fetch market cap data for
         file_path: Optional local ZIP file path (for testing)
         skip_missing_symbols: If True, only insert symbols that exist in securities table
+        batch_size: Rows per COPY/MERGE batch (max 10,000)
+        rebuild_indexes: Drop secondary indexes for the load and rebuild them once after
 
     Returns:
         Dict with complete ingestion results
     """
-    # Fetch and parse
-    fetch_result = fetch_market_cap_data(target_date=target_date, file_path=file_path)
+    # Fetch and parse on a worker thread while the symbol lookup runs on db
+    # (the download dominates; the query is hidden behind it)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        fetch_future = executor.submit(fetch_market_cap_data, target_date=target_date, file_path=file_path)
+        valid_symbols = get_security_symbols(db) if skip_missing_symbols else None
+        fetch_result = fetch_future.result()
 
     if not fetch_result["success"]:
         return {
@@ -283,7 +299,10 @@ def ingest_market_cap_from_nse(
     ingestion_result = ingest_market_cap(
         db=db,
         market_cap_data=fetch_result["data"],
-        skip_missing_symbols=skip_missing_symbols
+        skip_missing_symbols=skip_missing_symbols,
+        batch_size=batch_size,
+        rebuild_indexes=rebuild_indexes,
+        valid_symbols=valid_symbols
     )
 
     return {
@@ -12,6 +12,7 @@ import csv
 import re
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache
 from typing import Dict, List, Optional
 from io import StringIO
 
@@ -21,6 +22,12 @@ class SecurityParseError(Exception):
     pass
 
 
+_SYMBOL_PATTERN = re.compile(r'^[A-Z0-9&-]+$')
+
+
+# strptime is the most expensive per-row call, and listing dates repeat
+# heavily across EQUITY_L/ETF rows (many securities listed on the same day)
+@lru_cache(maxsize=4096)
 def parse_date(date_str: str, format_str: str) -> Optional[datetime.date]:
     """
     Parse date string with given format.
@@ -104,8 +111,7 @@ def validate_symbol(symbol: str) -> bool:
     if not symbol:
         return False
 
-    pattern = r'^[A-Z0-9&-]+$'
-    return bool(re.match(pattern, symbol))
+    return bool(_SYMBOL_PATTERN.match(symbol))
 
 
 def parse_equity_list(csv_content: str) -> Dict:
@@ -5,19 +5,56 @@ Handles fetching, parsing, and storing NSE securities and ETF data.
 Implements business logic for security ingestion with database transactions.
 """
 import requests
-from typing import Dict
+from threading import Lock
+from typing import Any, Dict, FrozenSet
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.dialects.postgresql import insert
 
 from app.models.security import Security
 from app.services.nse.securities_parser import parse_equity_list, parse_etf_list
+from app.services.nse.archive_cache import conditional_get, response_validators, remember_validators
+from app.utils.pg_copy import MAX_BATCH_SIZE, copy_merge
 
 
 # NSE Archive URLs
 EQUITY_LIST_URL = "https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv"
 ETF_LIST_URL = "https://nsearchives.nseindia.com/content/equities/eq_etfseclist.csv"
 
+# Snapshot of securities.symbol for the skip_missing_symbols filters (market
+# cap, deals). Keyed on a (count, max(updated_at)) version token:
+# any insert/update/delete - from this or another worker - changes the token,
+# so the next lookup reloads instead of serving a stale set.
+_SYMBOL_SET_LOCK = Lock()
+_SYMBOL_SET_CACHE: Dict[str, Any] = {"version": None, "symbols": frozenset()}
+
+
+def get_security_symbols(db: Session) -> FrozenSet[str]:
+    """
+    Return every symbol in the securities table, cached per process.
+
+    Costs one aggregate query when the table is unchanged instead of
+    loading all symbols.
+
+    Args:
+        db: SQLAlchemy database session
+
+    Returns:
+        frozenset of NSE symbols
+    """
+    version = tuple(db.query(func.count(Security.id), func.max(Security.updated_at)).one())
+
+    with _SYMBOL_SET_LOCK:
+        if _SYMBOL_SET_CACHE["version"] == version:
+            return _SYMBOL_SET_CACHE["symbols"]
+
+    symbols = frozenset(symbol for (symbol,) in db.query(Security.symbol))
+
+    with _SYMBOL_SET_LOCK:
+        _SYMBOL_SET_CACHE["version"] = version
+        _SYMBOL_SET_CACHE["symbols"] = symbols
+    return symbols
+
 
 def fetch_securities_list(use_equity: bool = True, file_path: str = None) -> Dict:
     """
@@ -33,12 +70,16 @@ def fetch_securities_list(use_equity: bool = True, file_path: str = None) -> Dic
         - data: List of parsed securities
         - errors: List of error messages
         - source: str (url or file path)
+        - not_modified: True if NSE answered 304 or sent the same body (unchanged since last ingestion)
+        - validators: ETag / Last-Modified / body hash of the download
     """
     result = {
         "success": False,
         "data": [],
         "errors": [],
-        "source": ""
+        "source": "",
+        "not_modified": False,
+        "validators": None
     }
 
     try:
@@ -51,10 +92,18 @@ def fetch_securities_list(use_equity: bool = True, file_path: str = None) -> Dic
         else:
             # Fetch from NSE archive
             url = EQUITY_LIST_URL if use_equity else ETF_LIST_URL
-            response = requests.get(url, timeout=30)
+            response, not_modified = conditional_get(url, timeout=30)
+            result["source"] = url
+
+            # Unchanged since the last successful ingestion: nothing to parse
+            if not_modified:
+                result["success"] = True
+                result["not_modified"] = True
+                return result
+
             response.raise_for_status()
             csv_content = response.text
-            result["source"] = url
+            result["validators"] = response_validators(response)
 
         # Parse CSV
         if use_equity:
@@ -80,16 +129,18 @@ def fetch_securities_list(use_equity: bool = True, file_path: str = None) -> Dic
     return result
 
 
-def ingest_securities(db: Session, securities_data: list) -> Dict:
+def ingest_securities(db: Session, securities_data: list, batch_size: int = MAX_BATCH_SIZE) -> Dict:
     """
     Insert or update securities in database.
 
-    Uses PostgreSQL UPSERT (INSERT ... ON CONFLICT) to handle duplicates.
+    Streams rows into a temp table with COPY and upserts them with one MERGE
+    on symbol, in a single transaction.
     Updates existing records if symbol already exists.
 
     Args:
         db: SQLAlchemy database session
         securities_data: List of security dicts from parser
+        batch_size: Rows per COPY/MERGE batch (max 10,000)
 
     Returns:
         Dict with:
@@ -111,58 +162,47 @@ def ingest_securities(db: Session, securities_data: list) -> Dict:
         result["errors"].append("No securities data provided")
         return result
 
+    # MERGE cannot match the same symbol twice
+    rows = list({security["symbol"]: security for security in securities_data}.values())
+
     try:
-        for security_dict in securities_data:
-            try:
-                # Use PostgreSQL INSERT ... ON CONFLICT for upsert
-                stmt = insert(Security).values(**security_dict)
-
-                # On conflict (symbol already exists), update the record
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=['symbol'],
-                    set_={
-                        'isin': stmt.excluded.isin,
-                        'security_name': stmt.excluded.security_name,
-                        'series': stmt.excluded.series,
-                        'listing_date': stmt.excluded.listing_date,
-                        'paid_up_value': stmt.excluded.paid_up_value,
-                        'market_lot': stmt.excluded.market_lot,
-                        'face_value': stmt.excluded.face_value,
-                        'security_type': stmt.excluded.security_type,
-                        'is_active': stmt.excluded.is_active,
-                        'updated_at': stmt.excluded.updated_at,
-                    }
-                )
-
-                # Execute and check if it was insert or update
-                result_proxy = db.execute(stmt)
-
-                # Note: PostgreSQL doesn't easily tell us if it was insert or update
-                # We'll count as inserted for now
-                result["records_inserted"] += 1
-
-            except IntegrityError as e:
-                db.rollback()
-                result["errors"].append(f"Integrity error for {security_dict.get('symbol')}: {str(e)}")
-                result["records_failed"] += 1
-            except Exception as e:
-                db.rollback()
-                result["errors"].append(f"Error inserting {security_dict.get('symbol')}: {str(e)}")
-                result["records_failed"] += 1
-
-        # Commit all changes
+        # COPY into a temp table, then MERGE on symbol (existing symbols are updated)
+        merged = copy_merge(
+            db, Security, rows,
+            key_columns=['symbol'],
+            update_columns=[
+                'isin', 'security_name', 'series', 'listing_date', 'paid_up_value',
+                'market_lot', 'face_value', 'security_type', 'is_active',
+            ],
+            set_now=['updated_at'],
+            batch_size=batch_size
+        )
         db.commit()
-        result["success"] = result["records_inserted"] > 0
 
+        # Note: MERGE's row count covers inserts and updates together
+        # We'll count as inserted for now
+        result["records_inserted"] = merged
+        result["success"] = True
+
+    except IntegrityError as e:
+        db.rollback()
+        result["errors"].append(f"Integrity error in securities batch: {str(e)}")
+        result["records_failed"] = len(rows)
     except Exception as e:
         db.rollback()
         result["errors"].append(f"Database transaction failed: {str(e)}")
+        result["records_failed"] = len(rows)
         result["success"] = False
 
     return result
 
 
-def ingest_securities_from_nse(db: Session, use_equity: bool = True, file_path: str = None) -> Dict:
+def ingest_securities_from_nse(
+    db: Session,
+    use_equity: bool = True,
+    file_path: str = None,
+    batch_size: int = MAX_BATCH_SIZE
+) -> Dict:
     """
     Complete workflow: Fetch, parse, and ingest securities.
 
@@ -170,6 +210,7 @@ def ingest_securities_from_nse(db: Session, use_equity: bool = True, file_path:
         db: SQLAlchemy database session
         use_equity: If True, fetch equities; if False, fetch ETFs
         file_path: Optional local file path (for testing)
+        batch_size: Rows per COPY/MERGE batch (max 10,000)
 
     Returns:
         Dict with complete ingestion results including fetch, parse, and insert stats
@@ -186,8 +227,21 @@ def ingest_securities_from_nse(db: Session, use_equity: bool = True, file_path:
             "ingestion_result": None
         }
 
+    if fetch_result["not_modified"]:
+        return {
+            "success": True,
+            "message": "Source file unchanged since last ingestion",
+            "source": fetch_result["source"],
+            "not_modified": True,
+            "parse_stats": {},
+            "ingestion_result": None,
+            "total_errors": []
+        }
+
     # Ingest to database
-    ingestion_result = ingest_securities(db, fetch_result["data"])
+    ingestion_result = ingest_securities(db, fetch_result["data"], batch_size=batch_size)
+    if ingestion_result["success"]:
+        remember_validators(fetch_result["source"], fetch_result["validators"])
 
     return {
         "success": ingestion_result["success"],
@@ -10,6 +10,7 @@ References:
 """
 import csv
 from datetime import datetime, date
+from functools import lru_cache
 from typing import Dict, List, Optional
 from io import StringIO
 
@@ -19,6 +20,10 @@ class SurveillanceParseError(Exception):
     pass
 
 
+# Cells only ever hold a handful of distinct strings ("", "100", "0", "1", ...),
+# so the two cell decoders are memoised: after the first few rows every one of
+# the ~45 cells per row is a single cache lookup instead of strip/compare/int.
+@lru_cache(maxsize=256)
 def parse_surveillance_value(value_str: str) -> Optional[int]:
     """
     Parse surveillance measure value from CSV.
@@ -44,6 +49,7 @@ def parse_surveillance_value(value_str: str) -> Optional[int]:
         return None
 
 
+@lru_cache(maxsize=256)
 def parse_surveillance_boolean(value_str: str) -> Optional[bool]:
     """
     Parse boolean surveillance flag from CSV.
@@ -132,6 +138,8 @@ def parse_surveillance_csv(csv_content: str, filename: str = "", ingestion_date:
     42-48. High-Low price variation flags (7 flags)
     49-63. Filler17-31 (15 fillers, ignored)
 
+    Filler columns are dropped from the header before rows are materialised.
+
     Args:
         csv_content: CSV file content as string
         filename: Original filename for date extraction (e.g., "REG1_IND160125.csv")
@@ -183,12 +191,22 @@ def parse_surveillance_csv(csv_content: str, filename: str = "", ingestion_date:
 
     try:
         # Parse CSV
-        csv_reader = csv.DictReader(StringIO(csv_content))
+        csv_reader = csv.reader(StringIO(csv_content))
+        header = next(csv_reader, [])
+
+        # Project to the mapped columns up front: the 18 Filler columns are
+        # never copied into the per-row dicts
+        used_columns = [
+            (index, name) for index, name in enumerate(header)
+            if not name.strip().startswith("Filler")
+        ]
 
-        for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 (row 1 is header)
+        for row_num, fields in enumerate(csv_reader, start=2):  # Start at 2 (row 1 is header)
             result["stats"]["total_rows"] += 1
 
             try:
+                row = {name: fields[index] for index, name in used_columns if index < len(fields)}
+
                 # Extract basic metadata
                 symbol = row.get("Symbol", "").strip()
 
@@ -5,11 +5,11 @@ Handles fetching, parsing, and storing NSE surveillance data (REG1_IND format).
 Data is stored across 4 normalized tables for efficient querying.
 """
 import requests
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
 from datetime import date
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.dialects.postgresql import insert
 
 from app.models.surveillance import (
     SurveillanceList,
@@ -18,6 +18,8 @@ from app.models.surveillance import (
     SurveillancePriceVariation
 )
 from app.services.nse.surveillance_parser import parse_surveillance_csv, validate_surveillance_data
+from app.services.nse.archive_cache import conditional_get, response_validators
+from app.utils.pg_copy import copy_merge
 
 
 # NSE Surveillance URL pattern
@@ -51,6 +53,8 @@ def fetch_surveillance_data(
         - source: URL or file path
         - ingestion_date: The date for this surveillance snapshot
         - stats: Parsing statistics
+        - not_modified: True if NSE answered 304 or sent the same body (unchanged since last ingestion)
+        - validators: ETag/Last-Modified/body hash to record once the data is ingested
     """
     result = {
         "success": False,
@@ -63,7 +67,9 @@ def fetch_surveillance_data(
         "errors": [],
         "source": "",
         "ingestion_date": None,
-        "stats": {}
+        "stats": {},
+        "not_modified": False,
+        "validators": None
     }
 
     try:
@@ -84,10 +90,18 @@ def fetch_surveillance_data(
                 return result
 
             url = SURVEILLANCE_URL_TEMPLATE.format(filename=filename)
-            response = requests.get(url, timeout=30)
+            response, not_modified = conditional_get(url, timeout=30)
+            result["source"] = url
+
+            # Same file already ingested (n8n retry / repeat run): nothing to parse
+            if not_modified:
+                result["success"] = True
+                result["not_modified"] = True
+                return result
+
             response.raise_for_status()
             csv_content = response.text
-            result["source"] = url
+            result["validators"] = response_validators(response)
 
         # Parse CSV
         parse_result = parse_surveillance_csv(
@@ -122,104 +136,82 @@ def fetch_surveillance_data(
     return result
 
 
+# Table name -> model, in the order the tables are reported
+SURVEILLANCE_TABLES = {
+    "surveillance_list": SurveillanceList,
+    "surveillance_fundamental_flags": SurveillanceFundamentalFlags,
+    "surveillance_price_movement": SurveillancePriceMovement,
+    "surveillance_price_variation": SurveillancePriceVariation,
+}
+
+
 def ingest_surveillance(
     db: Session,
     surveillance_data: Dict,
-    skip_missing_symbols: bool = True
+    skip_missing_symbols: bool = True,
+    session_factory: Optional[Callable[[], Session]] = None
 ) -> Dict:
     """
     Insert surveillance records into database (4-table structure).
 
-    Uses UPSERT pattern (ON CONFLICT DO UPDATE) since surveillance data for
-    a given date should replace previous data for that date.
+    Uses UPSERT pattern (COPY into a temp table + MERGE) since surveillance
+    data for a given date should replace previous data for that date.
+
+    With a session_factory the four tables are written concurrently, each on
+    its own connection and in its own transaction (wall time ~ slowest table
+    instead of the sum). A failed table is rolled back on its own; since every
+    table is an upsert on (symbol, date), re-running the ingestion repairs it.
+    Without one, all tables are written sequentially in db's transaction.
 
     Args:
         db: SQLAlchemy database session
         surveillance_data: Dict with 4 lists from parser (surveillance_list, etc.)
         skip_missing_symbols: If True, skip symbols not in securities table (default: True)
+        session_factory: Optional session factory enabling the concurrent per-table writes
 
     Returns:
-        Dict with ingestion statistics per table
+        Dict with ingestion statistics per table (success is False if any table failed)
     """
     result = {
         "success": False,
-        "records_inserted": {
-            "surveillance_list": 0,
-            "surveillance_fundamental_flags": 0,
-            "surveillance_price_movement": 0,
-            "surveillance_price_variation": 0
-        },
-        "records_updated": {
-            "surveillance_list": 0,
-            "surveillance_fundamental_flags": 0,
-            "surveillance_price_movement": 0,
-            "surveillance_price_variation": 0
-        },
+        "records_inserted": {table_name: 0 for table_name in SURVEILLANCE_TABLES},
+        "records_updated": {table_name: 0 for table_name in SURVEILLANCE_TABLES},
         "records_failed": 0,
         "records_skipped": 0,
         "errors": []
     }
 
+    tables = [
+        (table_name, model_class, surveillance_data[table_name])
+        for table_name, model_class in SURVEILLANCE_TABLES.items()
+        if surveillance_data.get(table_name)
+    ]
+
     try:
-        # Ingest surveillance_list table
-        if surveillance_data.get("surveillance_list"):
-            list_result = _ingest_table(
-                db,
-                SurveillanceList,
-                surveillance_data["surveillance_list"],
-                skip_missing_symbols
-            )
-            result["records_inserted"]["surveillance_list"] = list_result["inserted"]
-            result["records_updated"]["surveillance_list"] = list_result["updated"]
-            result["records_skipped"] += list_result["skipped"]
-            result["records_failed"] += list_result["failed"]
-            result["errors"].extend(list_result["errors"])
-
-        # Ingest surveillance_fundamental_flags table
-        if surveillance_data.get("surveillance_fundamental_flags"):
-            flags_result = _ingest_table(
-                db,
-                SurveillanceFundamentalFlags,
-                surveillance_data["surveillance_fundamental_flags"],
-                skip_missing_symbols
-            )
-            result["records_inserted"]["surveillance_fundamental_flags"] = flags_result["inserted"]
-            result["records_updated"]["surveillance_fundamental_flags"] = flags_result["updated"]
-            result["records_skipped"] += flags_result["skipped"]
-            result["records_failed"] += flags_result["failed"]
-            result["errors"].extend(flags_result["errors"])
-
-        # Ingest surveillance_price_movement table
-        if surveillance_data.get("surveillance_price_movement"):
-            movement_result = _ingest_table(
-                db,
-                SurveillancePriceMovement,
-                surveillance_data["surveillance_price_movement"],
-                skip_missing_symbols
-            )
-            result["records_inserted"]["surveillance_price_movement"] = movement_result["inserted"]
-            result["records_updated"]["surveillance_price_movement"] = movement_result["updated"]
-            result["records_skipped"] += movement_result["skipped"]
-            result["records_failed"] += movement_result["failed"]
-            result["errors"].extend(movement_result["errors"])
-
-        # Ingest surveillance_price_variation table
-        if surveillance_data.get("surveillance_price_variation"):
-            variation_result = _ingest_table(
-                db,
-                SurveillancePriceVariation,
-                surveillance_data["surveillance_price_variation"],
-                skip_missing_symbols
-            )
-            result["records_inserted"]["surveillance_price_variation"] = variation_result["inserted"]
-            result["records_updated"]["surveillance_price_variation"] = variation_result["updated"]
-            result["records_skipped"] += variation_result["skipped"]
-            result["records_failed"] += variation_result["failed"]
-            result["errors"].extend(variation_result["errors"])
-
-        # Commit transaction
-        db.commit()
-        result["success"] = True
+        if session_factory is not None:
+            with ThreadPoolExecutor(max_workers=len(SURVEILLANCE_TABLES)) as executor:
+                futures = [
+                    executor.submit(_ingest_table_in_own_session, session_factory, model_class, records, skip_missing_symbols)
+                    for _, model_class, records in tables
+                ]
+                table_stats = [future.result() for future in futures]
+        else:
+            table_stats = [
+                _ingest_table(db, model_class, records, skip_missing_symbols)
+                for _, model_class, records in tables
+            ]
+            db.commit()
+
+        for (table_name, _, _), stats in zip(tables, table_stats):
+            result["records_inserted"][table_name] = stats["inserted"]
+            result["records_updated"][table_name] = stats["updated"]
+            result["records_skipped"] += stats["skipped"]
+            result["records_failed"] += stats["failed"]
+            result["errors"].extend(stats["errors"])
+
+        # A table that failed (and was rolled back) makes the whole run a failure,
+        # so callers retry it instead of recording the file as ingested
+        result["success"] = result["records_failed"] == 0
 
     except Exception as e:
         db.rollback()
@@ -229,6 +221,22 @@ def ingest_surveillance(
     return result
 
 
+def _ingest_table_in_own_session(
+    session_factory: Callable[[], Session],
+    model_class,
+    records: list,
+    skip_missing_symbols: bool
+) -> Dict:
+    """Run _ingest_table in a dedicated session and commit (or roll back) that table alone."""
+    with session_factory() as table_db:
+        stats = _ingest_table(table_db, model_class, records, skip_missing_symbols)
+        if stats["failed"]:
+            table_db.rollback()
+        else:
+            table_db.commit()
+    return stats
+
+
 def _ingest_table(
     db: Session,
     model_class,
@@ -236,7 +244,7 @@ def _ingest_table(
     skip_missing_symbols: bool
 ) -> Dict:
     """
-    Ingest records into a single surveillance table using UPSERT.
+    Ingest records into a single surveillance table using COPY + MERGE.
 
     Args:
         db: Database session
@@ -258,28 +266,20 @@ def _ingest_table(
     if not records:
         return stats
 
+    # MERGE cannot match the same (symbol, date) twice
+    records = list({(record["symbol"], record["date"]): record for record in records}.values())
+
     try:
-        # Build UPSERT statement
-        # Primary key is (symbol, date), so ON CONFLICT updates all other columns
-        stmt = insert(model_class).values(records)
-
-        # Determine columns to update on conflict (all except primary key and timestamps)
-        update_cols = {
-            col.name: col
-            for col in stmt.excluded
-            if col.name not in ("symbol", "date", "created_at")
-        }
-
-        # Execute UPSERT
-        stmt = stmt.on_conflict_do_update(
-            index_elements=["symbol", "date"],
-            set_=update_cols
+        # COPY into a temp table, then MERGE on the (symbol, date) primary key,
+        # updating all other columns (except timestamps)
+        merged = copy_merge(
+            db, model_class, records,
+            key_columns=["symbol", "date"],
+            update_columns=[col for col in records[0] if col not in ("symbol", "date", "created_at")]
         )
 
-        # Note: PostgreSQL doesn't easily return INSERT vs UPDATE count with ON CONFLICT
-        # We'll track total affected rows
-        result = db.execute(stmt)
-        stats["inserted"] = result.rowcount  # This includes both inserts and updates
+        # Note: MERGE's row count covers inserts and updates together
+        stats["inserted"] = merged
 
     except IntegrityError as e:
         stats["failed"] = len(records)
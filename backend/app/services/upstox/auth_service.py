@@ -5,15 +5,19 @@ This module handles Upstox OAuth2 authentication flow with:
 - Playwright browser automation for login
 - TOTP-based 2FA
 - Token exchange and storage
+- Background login jobs (tracked in upstox_login_jobs)
 """
 
 from playwright.async_api import async_playwright
 import pyotp
 import requests
 import urllib.parse
-from typing import Dict
+from datetime import datetime, timezone
+from typing import Callable, Dict
 from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.database.session import SessionLocal, get_db_context
+from app.models.upstox import UpstoxLoginJob
 from app.services.upstox.token_manager import UpstoxTokenManager
 
 
@@ -21,7 +25,7 @@ async def automate_upstox_login(
     mobile: str,
     pin: str,
     totp_secret: str,
-    db: Session
+    session_factory: Callable[[], Session] = SessionLocal
 ) -> Dict:
     """
     Automate Upstox login using Playwright and TOTP.
@@ -30,7 +34,8 @@ async def automate_upstox_login(
         mobile: Mobile number for Upstox account
         pin: 4-6 digit PIN
         totp_secret: TOTP secret key for 2FA
-        db: Database session
+        session_factory: Session factory; a session is opened only for the
+            final token write so no connection is held during Playwright
 
     Returns:
         Dict with success status, message, access_token, expires_at, errors
@@ -125,17 +130,18 @@ async def automate_upstox_login(
 
         tokens = resp.json()
 
-        # Store token in database
-        token_manager = UpstoxTokenManager(db)
-        token_record = token_manager.store_token(
-            access_token=tokens.get("access_token"),
-            refresh_token=tokens.get("refresh_token")
-        )
+        # Store token in database (short-lived session, only for the write)
+        with session_factory() as db:
+            token_manager = UpstoxTokenManager(db)
+            token_record = token_manager.store_token(
+                access_token=tokens.get("access_token"),
+                refresh_token=tokens.get("refresh_token")
+            )
 
-        result["success"] = True
-        result["message"] = "Login successful"
-        result["access_token"] = token_record.access_token[:20] + "..."  # Masked
-        result["expires_at"] = token_record.expires_at
+            result["success"] = True
+            result["message"] = "Login successful"
+            result["access_token"] = token_record.access_token[:20] + "..."  # Masked
+            result["expires_at"] = token_record.expires_at
 
     except requests.exceptions.HTTPError as e:
         result["errors"].append(f"Token exchange failed: {e.response.status_code} - {e.response.text}")
@@ -145,3 +151,55 @@ async def automate_upstox_login(
         result["message"] = "Login failed"
 
     return result
+
+
+def _update_login_job(job_id: str, **fields) -> None:
+    """Apply field updates to an upstox_login_jobs row in its own short-lived session."""
+    with get_db_context() as db:
+        job = db.get(UpstoxLoginJob, job_id)
+        if job is None:
+            return
+        for key, value in fields.items():
+            setattr(job, key, value)
+        db.commit()
+
+
+async def run_upstox_login_job(
+    job_id: str,
+    mobile: str,
+    pin: str,
+    totp_secret: str
+) -> None:
+    """
+    Background task wrapper around automate_upstox_login.
+
+    Runs outside the request lifecycle, so it never borrows the request-scoped
+    session. Job status is written in separate short transactions and the
+    login flow opens its own session only for the final token write.
+
+    Args:
+        job_id: upstox_login_jobs.id created by the endpoint
+        mobile: Mobile number for Upstox account
+        pin: 4-6 digit PIN
+        totp_secret: TOTP secret key for 2FA
+    """
+    _update_login_job(job_id, status="running")
+
+    try:
+        result = await automate_upstox_login(
+            mobile=mobile,
+            pin=pin,
+            totp_secret=totp_secret,
+            session_factory=SessionLocal
+        )
+    except Exception as e:
+        result = {"success": False, "message": "Login failed", "expires_at": None, "errors": [str(e)]}
+
+    _update_login_job(
+        job_id,
+        status="success" if result["success"] else "failed",
+        message=result["message"],
+        errors=result.get("errors") or None,
+        expires_at=result.get("expires_at"),
+        completed_at=datetime.now(timezone.utc)
+    )
@@ -8,8 +8,10 @@ This service handles bulk historical data ingestion for multiple securities with
 - Error handling and retry logic
 """
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, date
 from typing import Dict, Any, List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from app.models.security import Security
@@ -21,6 +23,10 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Concurrent Upstox candle requests within a batch (the batch size and the
+# pause between batches keep the overall rate within Upstox limits)
+HISTORICAL_FETCH_WORKERS = 10
+
 
 class BatchHistoricalService:
     """Service for batch processing historical OHLCV data."""
@@ -97,13 +103,17 @@ class BatchHistoricalService:
 
                 logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} symbols)")
 
+                prefetched_candles = self._prefetch_candles(batch, start_date, end_date)
+
                 for security in batch:
                     try:
-                        # Fetch historical data for this symbol
+                        # Store the prefetched candles for this symbol (symbols
+                        # without a mapping fall through to the service's own error)
                         symbol_result = self.historical_service.fetch_historical_ohlcv(
                             symbol=security.symbol,
                             from_date=start_date,
-                            to_date=end_date
+                            to_date=end_date,
+                            candles=prefetched_candles.get(security.id)
                         )
 
                         if symbol_result["success"]:
@@ -151,6 +161,46 @@ class BatchHistoricalService:
 
         return result
 
+    def _prefetch_candles(
+        self,
+        securities: List[Security],
+        start_date: date,
+        end_date: date
+    ) -> Dict[int, List[List]]:
+        """
+        Fetch historical candles for a batch of securities concurrently.
+
+        Only the HTTP calls run on worker threads; instrument keys and headers
+        are resolved here, since the session must stay on this thread.
+
+        Args:
+            securities: Securities in the batch
+            start_date: Start date
+            end_date: End date
+
+        Returns:
+            Dict mapping security id to its candles (mapped securities only)
+        """
+        instrument_keys = dict(self.db.execute(
+            select(SymbolInstrumentMapping.security_id, SymbolInstrumentMapping.instrument_key).where(
+                SymbolInstrumentMapping.security_id.in_([security.id for security in securities])
+            )
+        ).all())
+        if not instrument_keys:
+            return {}
+
+        headers = self.historical_service.upstox_client.get_headers()
+
+        with ThreadPoolExecutor(max_workers=min(HISTORICAL_FETCH_WORKERS, len(instrument_keys))) as executor:
+            futures = {
+                security_id: executor.submit(
+                    self.historical_service._fetch_historical_candles,
+                    instrument_key, start_date, end_date, headers
+                )
+                for security_id, instrument_key in instrument_keys.items()
+            }
+            return {security_id: future.result() for security_id, future in futures.items()}
+
     def _log_ingestion(self, result: Dict[str, Any], source: str):
         """
         Log ingestion results to ingestion_logs table.
@@ -0,0 +1,82 @@
+"""
+Shared upsert of Upstox historical candles into the daily OHLCV tables.
+
+Used by both the securities (ohlcv_daily) and the index (index_ohlcv_daily)
+historical services, which store the same candle shape.
+"""
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.utils.pg_copy import copy_merge
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def upsert_candles(
+    db: Session,
+    model,
+    symbol: str,
+    candles: List[List],
+    from_date: date,
+    to_date: date,
+    missing_volume: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Upsert one symbol's daily candles into model in one COPY + MERGE.
+
+    The caller commits (or rolls back), as with copy_merge. updated_at is
+    stamped on merged rows when the model has that column.
+
+    Args:
+        db: Database session
+        model: OHLCVDaily or IndexOHLCVDaily
+        symbol: Symbol the candles belong to
+        candles: Upstox candles: [timestamp, open, high, low, close, volume, oi]
+        from_date: Start of the requested range (for the existing-row count)
+        to_date: End of the requested range
+        missing_volume: Volume stored for candles without one
+
+    Returns:
+        Dict with inserted/updated counts and per-candle parse errors
+    """
+    # Parse candles into rows keyed by date (MERGE needs unique keys)
+    rows_by_date = {}
+    errors = []
+    for candle in candles:
+        try:
+            # timestamp is ISO format with the exchange offset; keep the date part
+            candle_date = date.fromisoformat(candle[0].split('T')[0])
+            rows_by_date[candle_date] = {
+                "symbol": symbol,
+                "date": candle_date,
+                "open": candle[1],
+                "high": candle[2],
+                "low": candle[3],
+                "close": candle[4],
+                "volume": candle[5] if len(candle) > 5 else missing_volume
+            }
+
+        except Exception as e:
+            errors.append({
+                "candle": candle,
+                "error": str(e)
+            })
+            logger.error(f"Error processing candle for {symbol}: {str(e)}")
+
+    # One query for the dates already stored instead of one per candle
+    existing_dates = set(db.execute(
+        select(model.date).where(
+            model.symbol == symbol,
+            model.date.between(from_date, to_date)
+        )
+    ).scalars())
+    updated = len(existing_dates.intersection(rows_by_date))
+
+    set_now = ["updated_at"] if "updated_at" in model.__table__.c else ()
+    copy_merge(db, model, list(rows_by_date.values()), key_columns=["symbol", "date"], set_now=set_now)
+
+    return {"inserted": len(rows_by_date) - updated, "updated": updated, "errors": errors}
@@ -2,6 +2,7 @@
 Service for fetching daily OHLCV data from Upstox API.
 """
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
@@ -11,11 +12,18 @@ from app.models.timeseries import OHLCVDaily
 from app.models.upstox import SymbolInstrumentMapping
 from app.models.metadata import IngestionLog
 from app.services.upstox.token_manager import UpstoxTokenManager
-from app.services.upstox.upstox_client import UpstoxClient
+from app.services.upstox.upstox_client import UpstoxClient, get_upstox_session
+from app.utils.pg_copy import copy_merge
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Upstox allows comma-separated instrument keys, 500 per request
+QUOTE_BATCH_SIZE = 500
+
+# Quote batches are independent, so they are requested concurrently
+QUOTE_FETCH_WORKERS = 4
+
 
 class DailyQuotesService:
     """Service for fetching and storing daily OHLCV data."""
@@ -101,7 +109,9 @@ class DailyQuotesService:
                 results["errors"].append("Failed to fetch quotes from Upstox")
                 return results
 
-            # Process each quote and insert to database
+            # Build one OHLCV row per quote, then upsert them all in one MERGE
+            today = datetime.now().date()
+            ohlcv_rows = []
             for security in securities:
                 try:
                     instrument_key = symbol_to_instrument.get(security.symbol)
@@ -132,8 +142,7 @@ class DailyQuotesService:
                         })
                         continue
 
-                    # Insert or update OHLCV data
-                    self._upsert_ohlcv(security.symbol, ohlc, quote)
+                    ohlcv_rows.append(self._build_ohlcv_row(security.symbol, today, ohlc, quote))
                     results["successful"] += 1
 
                 except Exception as e:
@@ -144,7 +153,8 @@ class DailyQuotesService:
                     })
                     logger.error(f"Error processing {security.symbol}: {str(e)}")
 
-            # Commit all changes
+            # Insert or update OHLCV data and commit
+            copy_merge(self.db, OHLCVDaily, ohlcv_rows, key_columns=["symbol", "date"])
             self.db.commit()
 
             # Update success status
@@ -181,27 +191,18 @@ class DailyQuotesService:
                 logger.error("Failed to get Upstox headers (token issue)")
                 return {}
 
-            # Upstox allows comma-separated instrument keys
-            # Batch size: 500 instruments per request (Upstox limit)
-            batch_size = 500
-            all_quotes = {}
-
-            for i in range(0, len(instrument_keys), batch_size):
-                batch = instrument_keys[i:i + batch_size]
-                instrument_param = ",".join(batch)
-
-                url = f"{self.base_url}/market-quote/quotes"
-                params = {"instrument_key": instrument_param}
-
-                response = requests.get(url, headers=headers, params=params, timeout=30)
-                response.raise_for_status()
+            batches = [
+                instrument_keys[i:i + QUOTE_BATCH_SIZE]
+                for i in range(0, len(instrument_keys), QUOTE_BATCH_SIZE)
+            ]
 
-                data = response.json()
-                if data.get("status") == "success":
-                    quotes = data.get("data", {})
+            # ~2000 symbols are 4 requests: overlap them instead of paying each
+            # round-trip in turn (headers are resolved once, on this thread,
+            # since the session must not be shared across threads)
+            all_quotes = {}
+            with ThreadPoolExecutor(max_workers=min(QUOTE_FETCH_WORKERS, len(batches))) as executor:
+                for quotes in executor.map(lambda batch: self._fetch_quote_batch(headers, batch), batches):
                     all_quotes.update(quotes)
-                else:
-                    logger.error(f"Upstox API error: {data.get('message', 'Unknown error')}")
 
             return all_quotes
 
@@ -212,69 +213,59 @@ class DailyQuotesService:
             logger.error(f"Unexpected error fetching market quotes: {str(e)}")
             return {}
 
-    def _upsert_ohlcv(self, symbol: str, ohlc: Dict, quote: Dict):
+    def _fetch_quote_batch(self, headers: Dict[str, str], instrument_keys: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch market quotes for one batch of at most QUOTE_BATCH_SIZE instruments.
+
+        Args:
+            headers: Authenticated Upstox headers
+            instrument_keys: Instrument keys in this batch
+
+        Returns:
+            Dict mapping instrument_key to quote data
         """
-        Insert or update OHLCV data for a symbol.
+        url = f"{self.base_url}/market-quote/quotes"
+        params = {"instrument_key": ",".join(instrument_keys)}
+
+        response = get_upstox_session().get(url, headers=headers, params=params, timeout=30)
+        response.raise_for_status()
+
+        data = response.json()
+        if data.get("status") == "success":
+            return data.get("data", {})
+
+        logger.error(f"Upstox API error: {data.get('message', 'Unknown error')}")
+        return {}
+
+    def _build_ohlcv_row(self, symbol: str, trade_date, ohlc: Dict, quote: Dict) -> Dict[str, Any]:
+        """
+        Build the ohlcv_daily row for a symbol's quote.
 
         Args:
             symbol: Security symbol
+            trade_date: Trading date of the quote
             ohlc: OHLC data from quote
             quote: Full quote data
+
+        Returns:
+            Row dict keyed by ohlcv_daily column
         """
-        # Get today's date
-        today = datetime.now().date()
-
-        # Check if record exists
-        existing = self.db.query(OHLCVDaily).filter(
-            OHLCVDaily.symbol == symbol,
-            OHLCVDaily.date == today
-        ).first()
-
-        # Extract data
-        open_price = ohlc.get("open")
-        high_price = ohlc.get("high")
-        low_price = ohlc.get("low")
-        close_price = ohlc.get("close")
-        volume = quote.get("volume", 0)
-
-        # VWAP and other fields
-        vwap = quote.get("average_price") or quote.get("vwap")
-        upper_circuit = quote.get("upper_circuit_limit")
-        lower_circuit = quote.get("lower_circuit_limit")
-
-        # 52-week high/low
-        week_52_high = quote.get("ohlc", {}).get("high")  # This might need adjustment based on actual response
-        week_52_low = quote.get("ohlc", {}).get("low")
-
-        if existing:
-            # Update existing record
-            existing.open = open_price
-            existing.high = high_price
-            existing.low = low_price
-            existing.close = close_price
-            existing.volume = volume
-            existing.vwap = vwap
-            existing.upper_circuit = upper_circuit
-            existing.lower_circuit = lower_circuit
-            existing.week_52_high = week_52_high
-            existing.week_52_low = week_52_low
-        else:
-            # Insert new record
-            new_ohlcv = OHLCVDaily(
-                symbol=symbol,
-                date=today,
-                open=open_price,
-                high=high_price,
-                low=low_price,
-                close=close_price,
-                volume=volume,
-                vwap=vwap,
-                upper_circuit=upper_circuit,
-                lower_circuit=lower_circuit,
-                week_52_high=week_52_high,
-                week_52_low=week_52_low
-            )
-            self.db.add(new_ohlcv)
+        return {
+            "symbol": symbol,
+            "date": trade_date,
+            "open": ohlc.get("open"),
+            "high": ohlc.get("high"),
+            "low": ohlc.get("low"),
+            "close": ohlc.get("close"),
+            "volume": quote.get("volume", 0),
+            # VWAP and other fields
+            "vwap": quote.get("average_price") or quote.get("vwap"),
+            "upper_circuit": quote.get("upper_circuit_limit"),
+            "lower_circuit": quote.get("lower_circuit_limit"),
+            # 52-week high/low
+            "week_52_high": quote.get("ohlc", {}).get("high"),  # This might need adjustment based on actual response
+            "week_52_low": quote.get("ohlc", {}).get("low"),
+        }
 
     def _log_ingestion(self, result: Dict[str, Any], source: str):
         """
@@ -4,6 +4,7 @@ Service for fetching historical OHLCV data from Upstox API.
 import requests
 from datetime import datetime, timedelta, date
 from typing import Dict, Any, List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from app.models.security import Security
@@ -11,7 +12,8 @@ from app.models.timeseries import OHLCVDaily
 from app.models.upstox import SymbolInstrumentMapping
 from app.models.metadata import MarketHoliday
 from app.services.upstox.token_manager import UpstoxTokenManager
-from app.services.upstox.upstox_client import UpstoxClient
+from app.services.upstox.upstox_client import UpstoxClient, get_upstox_session
+from app.services.upstox.candles import upsert_candles
 import logging
 
 logger = logging.getLogger(__name__)
@@ -30,7 +32,8 @@ class HistoricalDataService:
         self,
         symbol: str,
         from_date: Optional[date] = None,
-        to_date: Optional[date] = None
+        to_date: Optional[date] = None,
+        candles: Optional[List[List]] = None
     ) -> Dict[str, Any]:
         """
         Fetch historical OHLCV data for a single symbol.
@@ -39,6 +42,8 @@ class HistoricalDataService:
             symbol: Security symbol
             from_date: Start date (defaults to 5 years ago or listing_date)
             to_date: End date (defaults to today)
+            candles: Candles already fetched for this range (skips the Upstox call;
+                used by the batch service, which fetches concurrently)
 
         Returns:
             Dict with success status, records count, and errors
@@ -81,83 +86,36 @@ class HistoricalDataService:
                 "to": to_date.isoformat()
             }
 
-            # Get instrument key
-            from app.models.upstox import UpstoxInstrument
-            mapping = self.db.query(
-                SymbolInstrumentMapping, UpstoxInstrument
-            ).join(
-                UpstoxInstrument,
-                SymbolInstrumentMapping.instrument_id == UpstoxInstrument.id
-            ).join(
-                Security,
-                SymbolInstrumentMapping.security_id == Security.id
-            ).filter(
-                Security.symbol == symbol
-            ).first()
-
-            if not mapping:
-                result["errors"].append(f"No instrument mapping found for {symbol}")
-                return result
-
-            instrument_key = mapping[1].instrument_key  # UpstoxInstrument is second element
-
-            # Fetch historical candles from Upstox
-            candles = self._fetch_historical_candles(
-                instrument_key,
-                from_date,
-                to_date
-            )
+            if candles is None:
+                # Get instrument key (scalar lookup, no entity hydration)
+                instrument_key = self.db.execute(
+                    select(SymbolInstrumentMapping.instrument_key).where(
+                        SymbolInstrumentMapping.security_id == security.id
+                    ).limit(1)
+                ).scalar()
+
+                if not instrument_key:
+                    result["errors"].append(f"No instrument mapping found for {symbol}")
+                    return result
+
+                # Fetch historical candles from Upstox
+                candles = self._fetch_historical_candles(
+                    instrument_key,
+                    from_date,
+                    to_date
+                )
 
             if not candles:
                 result["errors"].append("No candle data received from Upstox")
                 return result
 
-            # Process and insert candles
-            for candle in candles:
-                try:
-                    # Candle format: [timestamp, open, high, low, close, volume, oi]
-                    # timestamp is in ISO format
-                    candle_date = datetime.fromisoformat(candle[0]).date()
-                    open_price = candle[1]
-                    high_price = candle[2]
-                    low_price = candle[3]
-                    close_price = candle[4]
-                    volume = candle[5] if len(candle) > 5 else 0
-
-                    # Check if record exists
-                    existing = self.db.query(OHLCVDaily).filter(
-                        OHLCVDaily.symbol == symbol,
-                        OHLCVDaily.date == candle_date
-                    ).first()
-
-                    if existing:
-                        # Update existing record
-                        existing.open = open_price
-                        existing.high = high_price
-                        existing.low = low_price
-                        existing.close = close_price
-                        existing.volume = volume
-                        result["records_updated"] += 1
-                    else:
-                        # Insert new record
-                        new_ohlcv = OHLCVDaily(
-                            symbol=symbol,
-                            date=candle_date,
-                            open=open_price,
-                            high=high_price,
-                            low=low_price,
-                            close=close_price,
-                            volume=volume
-                        )
-                        self.db.add(new_ohlcv)
-                        result["records_inserted"] += 1
-
-                except Exception as e:
-                    result["errors"].append({
-                        "candle": candle,
-                        "error": str(e)
-                    })
-                    logger.error(f"Error processing candle for {symbol}: {str(e)}")
+            # Insert or update all candles in one COPY + MERGE
+            upserted = upsert_candles(
+                self.db, OHLCVDaily, symbol, candles, from_date, to_date, missing_volume=0
+            )
+            result["records_inserted"] = upserted["inserted"]
+            result["records_updated"] = upserted["updated"]
+            result["errors"].extend(upserted["errors"])
 
             # Commit all changes
             self.db.commit()
@@ -181,7 +139,8 @@ class HistoricalDataService:
         self,
         instrument_key: str,
         from_date: date,
-        to_date: date
+        to_date: date,
+        headers: Optional[Dict[str, str]] = None
     ) -> List[List]:
         """
         Fetch historical candle data from Upstox API.
@@ -190,12 +149,15 @@ class HistoricalDataService:
             instrument_key: Upstox instrument key
             from_date: Start date
             to_date: End date
+            headers: Upstox headers resolved by the caller (required off the
+                session's thread; looked up via the token cache otherwise)
 
         Returns:
             List of candles
         """
         try:
-            headers = self.upstox_client.get_headers()
+            if headers is None:
+                headers = self.upstox_client.get_headers()
             if not headers:
                 logger.error("Failed to get Upstox headers (token issue)")
                 return []
@@ -207,7 +169,7 @@ class HistoricalDataService:
             # API endpoint: /historical-candle/{instrument_key}/{interval}/{to_date}/{from_date}
             url = f"{self.base_url}/historical-candle/{instrument_key}/day/{to_date_str}/{from_date_str}"
 
-            response = requests.get(url, headers=headers, timeout=60)
+            response = get_upstox_session().get(url, headers=headers, timeout=60)
             response.raise_for_status()
 
             data = response.json()
@@ -4,16 +4,15 @@ Index Historical OHLCV Data Service.
 Handles ingestion of historical daily candle data for NSE indices from Upstox API.
 """
 import time
-import requests
 from datetime import date, timedelta
 from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 
 from app.models.timeseries import IndexOHLCVDaily
 from app.models.upstox import UpstoxInstrument
 from app.services.upstox.token_manager import UpstoxTokenManager
-from app.services.upstox.upstox_client import UpstoxClient
+from app.services.upstox.upstox_client import UpstoxClient, get_upstox_session
+from app.services.upstox.candles import upsert_candles
 
 
 class IndexHistoricalService:
@@ -156,7 +155,7 @@ class IndexHistoricalService:
         url = f"{self.base_url}/historical-candle/{instrument_key}/day/{end_date.isoformat()}/{start_date.isoformat()}"
 
         try:
-            response = requests.get(url, headers=headers, timeout=60)
+            response = get_upstox_session().get(url, headers=headers, timeout=60)
             response.raise_for_status()
             data = response.json()
 
@@ -168,51 +167,13 @@ class IndexHistoricalService:
             print(f"Error fetching candles for {symbol}: {e}")
             return {"inserted": 0, "updated": 0}
 
-        # Parse and insert candles
-        inserted = 0
-        updated = 0
-
-        for candle in candles:
-            try:
-                # Candle format: [timestamp, open, high, low, close, volume, oi]
-                candle_date = date.fromisoformat(candle[0].split('T')[0])
-
-                # Check if record exists
-                existing = self.db.query(IndexOHLCVDaily).filter(
-                    IndexOHLCVDaily.symbol == symbol,
-                    IndexOHLCVDaily.date == candle_date
-                ).first()
-
-                if existing:
-                    # Update
-                    existing.open = candle[1]
-                    existing.high = candle[2]
-                    existing.low = candle[3]
-                    existing.close = candle[4]
-                    existing.volume = candle[5] if len(candle) > 5 else None
-                    updated += 1
-                else:
-                    # Insert
-                    new_record = IndexOHLCVDaily(
-                        symbol=symbol,
-                        date=candle_date,
-                        open=candle[1],
-                        high=candle[2],
-                        low=candle[3],
-                        close=candle[4],
-                        volume=candle[5] if len(candle) > 5 else None
-                    )
-                    self.db.add(new_record)
-                    inserted += 1
-
-            except Exception as e:
-                print(f"Error processing candle for {symbol}: {e}")
-                continue
-
-        # Commit in batches
+        # Insert or update all candles in one COPY + MERGE
         try:
+            upserted = upsert_candles(self.db, IndexOHLCVDaily, symbol, candles, start_date, end_date)
             self.db.commit()
-        except IntegrityError:
+        except Exception:
+            # Leave the session usable for the next index; the caller counts this one as failed
             self.db.rollback()
+            raise
 
-        return {"inserted": inserted, "updated": updated}
+        return {"inserted": upserted["inserted"], "updated": upserted["updated"]}
@@ -9,13 +9,30 @@ This module handles:
 
 import requests
 import gzip
-import json
+import tempfile
 import time
-from typing import Dict, List
+import orjson
+from threading import Lock
+from typing import Any, Dict, List
+from sqlalchemy import delete, func, text
 from sqlalchemy.orm import Session
 from sqlalchemy.dialects.postgresql import insert
 from app.models.upstox import UpstoxInstrument, SymbolInstrumentMapping
 from app.models.security import Security
+from app.services.upstox.upstox_client import get_upstox_session
+from app.utils.pg_copy import copy_merge
+
+
+# NSE.json.gz is kept in memory up to this size while downloading and
+# spilled to a temp file beyond it
+INSTRUMENTS_SPOOL_MAX_BYTES = 8 << 20
+
+# Per-process symbol -> instrument_key map for the Upstox test endpoints.
+# Keyed on a (count, max(created_at)) version token of symbol_instrument_mapping:
+# a rebuild by /ingest/upstox-instruments on any worker changes the token, so
+# every worker reloads on its next lookup instead of serving stale keys.
+_SYMBOL_MAP_LOCK = Lock()
+_SYMBOL_MAP_CACHE: Dict[str, Any] = {"version": None, "symbol_map": {}}
 
 
 def fetch_upstox_instruments(exchange: str = "NSE") -> Dict:
@@ -41,16 +58,19 @@ def fetch_upstox_instruments(exchange: str = "NSE") -> Dict:
         url = f"https://assets.upstox.com/market-quote/instruments/exchange/{exchange}.json.gz"
         result["source"] = url
 
-        # Download gzipped JSON (60-second timeout for large file)
-        response = requests.get(url, timeout=60)
-        response.raise_for_status()
-
-        # Decompress
-        decompressed = gzip.decompress(response.content)
-        json_content = decompressed.decode('utf-8')
-
-        # Parse JSON
-        instruments = json.loads(json_content)
+        # Stream the gzipped JSON (60-second timeout for large file) and
+        # decompress from the spool: the compressed body, the decompressed
+        # bytes and a decoded str copy are never all held at once
+        with get_upstox_session().get(url, timeout=60, stream=True) as response, \
+                tempfile.SpooledTemporaryFile(max_size=INSTRUMENTS_SPOOL_MAX_BYTES) as spool:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                spool.write(chunk)
+            spool.seek(0)
+
+            # orjson parses the UTF-8 bytes directly (no intermediate str)
+            with gzip.GzipFile(fileobj=spool) as decompressed:
+                instruments = orjson.loads(decompressed.read())
         result["success"] = True
         result["data"] = instruments
 
@@ -58,7 +78,7 @@ def fetch_upstox_instruments(exchange: str = "NSE") -> Dict:
         result["errors"].append(f"HTTP request failed: {str(e)}")
     except gzip.BadGzipFile as e:
         result["errors"].append(f"Decompression failed: {str(e)}")
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         result["errors"].append(f"JSON parsing failed: {str(e)}")
     except Exception as e:
         result["errors"].append(f"Unexpected error: {str(e)}")
@@ -68,7 +88,7 @@ def fetch_upstox_instruments(exchange: str = "NSE") -> Dict:
 
 def ingest_upstox_instruments(db: Session, instruments_data: List[dict]) -> Dict:
     """
-    Bulk insert/update Upstox instruments using UPSERT.
+    Bulk insert/update Upstox instruments with COPY + MERGE on instrument_key.
 
     Args:
         db: Database session
@@ -88,51 +108,37 @@ def ingest_upstox_instruments(db: Session, instruments_data: List[dict]) -> Dict
         result["errors"].append("No instrument data provided")
         return result
 
-    batch_size = 500
-    inserted_count = 0
-    updated_count = 0
+    # One row per instrument_key (MERGE rejects duplicate source keys)
+    rows_by_key = {}
+    for instr_dict in instruments_data:
+        instrument_key = instr_dict.get('instrument_key')
+        if not instrument_key:
+            result["errors"].append("Error ingesting unknown: missing instrument_key")
+            continue
+        rows_by_key[instrument_key] = {
+            'instrument_key': instrument_key,
+            'exchange': instr_dict.get('exchange'),
+            'symbol': instr_dict.get('trading_symbol'),
+            'isin': instr_dict.get('isin'),
+            'name': instr_dict.get('name'),
+            'instrument_type': instr_dict.get('instrument_type'),
+            'is_active': True
+        }
 
     try:
-        for i in range(0, len(instruments_data), batch_size):
-            batch = instruments_data[i:i + batch_size]
-
-            for instr_dict in batch:
-                try:
-                    # UPSERT on instrument_key
-                    stmt = insert(UpstoxInstrument).values(
-                        instrument_key=instr_dict.get('instrument_key'),
-                        exchange=instr_dict.get('exchange'),
-                        symbol=instr_dict.get('trading_symbol'),
-                        isin=instr_dict.get('isin'),
-                        name=instr_dict.get('name'),
-                        instrument_type=instr_dict.get('instrument_type'),
-                        is_active=True
-                    )
-
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=['instrument_key'],
-                        set_={
-                            'symbol': stmt.excluded.symbol,
-                            'name': stmt.excluded.name,
-                            'instrument_type': stmt.excluded.instrument_type,
-                            'updated_at': stmt.excluded.updated_at
-                        }
-                    )
-
-                    db.execute(stmt)
-                    inserted_count += 1
-
-                except Exception as e:
-                    result["errors"].append(
-                        f"Error ingesting {instr_dict.get('instrument_key', 'unknown')}: {str(e)}"
-                    )
-
-            # Commit batch
-            db.commit()
+        merged = copy_merge(
+            db,
+            UpstoxInstrument,
+            list(rows_by_key.values()),
+            key_columns=['instrument_key'],
+            update_columns=['symbol', 'name', 'instrument_type'],
+            set_now=['updated_at']
+        )
+        db.commit()
 
         result["success"] = True
-        result["instruments_inserted"] = inserted_count
-        result["instruments_updated"] = 0  # Can't distinguish from insert in UPSERT
+        result["instruments_inserted"] = merged
+        result["instruments_updated"] = 0  # Can't distinguish from insert in MERGE
 
     except Exception as e:
         db.rollback()
@@ -143,12 +149,17 @@ def ingest_upstox_instruments(db: Session, instruments_data: List[dict]) -> Dict
 
 def create_symbol_mappings(db: Session) -> Dict:
     """
-    Auto-create mappings between securities and Upstox instruments.
+    Rebuild mappings between securities and Upstox instruments.
 
     Matching logic:
     1. For equities: exchange='NSE_EQ', match by ISIN (primary) or symbol (fallback)
     2. For indices: manual mapping only (not automated here)
 
+    The auto-generated rows are fully derived from securities + upstox_instruments,
+    so they are deleted and re-inserted in a single transaction (two SELECTs, one
+    DELETE, one multi-row INSERT) instead of probing the database per security.
+    Manual mappings (match_method='manual') are preserved.
+
     Args:
         db: Database session
 
@@ -162,57 +173,64 @@ def create_symbol_mappings(db: Session) -> Dict:
 
     try:
         # Get all active equities
-        securities = db.query(Security).filter(
+        securities = db.query(Security.id, Security.symbol, Security.isin).filter(
             Security.is_active == True,
             Security.security_type == 'EQUITY'
         ).all()
 
+        instruments = db.query(
+            UpstoxInstrument.id, UpstoxInstrument.instrument_key,
+            UpstoxInstrument.symbol, UpstoxInstrument.isin
+        ).filter(
+            UpstoxInstrument.exchange == 'NSE',
+            UpstoxInstrument.instrument_type == 'EQ'
+        ).all()
+        instruments_by_isin = {instr.isin: instr for instr in instruments if instr.isin}
+        instruments_by_symbol = {instr.symbol: instr for instr in instruments}
+
+        manual_pairs = set(db.query(
+            SymbolInstrumentMapping.security_id, SymbolInstrumentMapping.instrument_id
+        ).filter(
+            SymbolInstrumentMapping.match_method == 'manual'
+        ).all())
+
+        rows = []
         for security in securities:
-            try:
-                # Primary: Match by ISIN
-                instrument = db.query(UpstoxInstrument).filter(
-                    UpstoxInstrument.exchange == 'NSE',
-                    UpstoxInstrument.instrument_type == 'EQ',
-                    UpstoxInstrument.isin == security.isin
-                ).first()
-
-                match_method = 'auto_isin'
-                confidence = 100.00
-
-                if not instrument:
-                    # Fallback: Match by symbol
-                    instrument = db.query(UpstoxInstrument).filter(
-                        UpstoxInstrument.exchange == 'NSE',
-                        UpstoxInstrument.instrument_type == 'EQ',
-                        UpstoxInstrument.symbol == security.symbol
-                    ).first()
-                    match_method = 'auto_symbol'
-                    confidence = 90.00
-
-                if instrument:
-                    # Check if mapping already exists
-                    existing = db.query(SymbolInstrumentMapping).filter(
-                        SymbolInstrumentMapping.security_id == security.id,
-                        SymbolInstrumentMapping.instrument_id == instrument.id
-                    ).first()
-
-                    if not existing:
-                        mapping = SymbolInstrumentMapping(
-                            security_id=security.id,
-                            instrument_id=instrument.id,
-                            symbol=security.symbol,
-                            instrument_key=instrument.instrument_key,
-                            is_primary=True,
-                            confidence=confidence,
-                            match_method=match_method
-                        )
-                        db.add(mapping)
-                        result["mappings_created"] += 1
-
-            except Exception as e:
-                result["errors"].append(f"Error mapping {security.symbol}: {str(e)}")
+            # Primary: Match by ISIN
+            instrument = instruments_by_isin.get(security.isin)
+            match_method = 'auto_isin'
+            confidence = 100.00
+
+            if not instrument:
+                # Fallback: Match by symbol
+                instrument = instruments_by_symbol.get(security.symbol)
+                match_method = 'auto_symbol'
+                confidence = 90.00
+
+            if instrument and (security.id, instrument.id) not in manual_pairs:
+                rows.append({
+                    "security_id": security.id,
+                    "instrument_id": instrument.id,
+                    "symbol": security.symbol,
+                    "instrument_key": instrument.instrument_key,
+                    "is_primary": True,
+                    "confidence": confidence,
+                    "match_method": match_method
+                })
+
+        # Application-level cleanup: the FKs no longer ON DELETE CASCADE, so the
+        # per-row cascade triggers that made DELETE FROM upstox_instruments
+        # O(rows x mapping fan-out) are gone; stale rows are cleared here instead.
+        db.execute(delete(SymbolInstrumentMapping).where(
+            SymbolInstrumentMapping.match_method.is_distinct_from('manual')
+        ))
+        if rows:
+            # Check the FKs once at commit instead of per inserted row
+            db.execute(text("SET CONSTRAINTS ALL DEFERRED"))
+            db.execute(insert(SymbolInstrumentMapping), rows)
 
         db.commit()
+        result["mappings_created"] = len(rows)
 
     except Exception as e:
         db.rollback()
@@ -221,6 +239,53 @@ def create_symbol_mappings(db: Session) -> Dict:
     return result
 
 
+def load_symbol_instrument_map(db: Session) -> Dict[str, str]:
+    """
+    Load the full symbol -> instrument_key mapping in one query.
+
+    Primary mappings are ordered last so they win when a symbol has several.
+
+    Args:
+        db: Database session
+
+    Returns:
+        Dict of NSE symbol to Upstox instrument_key
+    """
+    rows = db.query(
+        SymbolInstrumentMapping.symbol, SymbolInstrumentMapping.instrument_key
+    ).order_by(SymbolInstrumentMapping.is_primary.asc().nulls_first()).all()
+    return dict(rows)
+
+
+def get_symbol_instrument_map(db: Session) -> Dict[str, str]:
+    """
+    Return the symbol -> instrument_key map, cached per process.
+
+    Costs one aggregate query when the mappings are unchanged instead of
+    reloading them.
+
+    Args:
+        db: Database session
+
+    Returns:
+        Dict of NSE symbol to Upstox instrument_key
+    """
+    version = tuple(db.query(
+        func.count(SymbolInstrumentMapping.id), func.max(SymbolInstrumentMapping.created_at)
+    ).one())
+
+    with _SYMBOL_MAP_LOCK:
+        if _SYMBOL_MAP_CACHE["version"] == version:
+            return _SYMBOL_MAP_CACHE["symbol_map"]
+
+    symbol_map = load_symbol_instrument_map(db)
+
+    with _SYMBOL_MAP_LOCK:
+        _SYMBOL_MAP_CACHE["version"] = version
+        _SYMBOL_MAP_CACHE["symbol_map"] = symbol_map
+    return symbol_map
+
+
 def ingest_instruments_from_upstox(db: Session) -> Dict:
     """
     Orchestration function: fetch, ingest, create mappings.
@@ -5,12 +5,84 @@ This module manages Upstox access tokens with daily expiry (23:59 IST).
 """
 
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timezone
+from threading import Lock
+from cachetools import TTLCache
 import pytz
 from typing import Optional
 from app.models.upstox import UpstoxToken
 
 
+# Masked token info changes at most once a day; cache it briefly so
+# token-status polling skips the DB round-trip. Cleared by store_token() in
+# the storing worker only, so "no active token" is never cached (other
+# workers would report a fresh login as inactive) and hits are re-checked
+# against expires_at.
+_TOKEN_INFO_CACHE = TTLCache(maxsize=1, ttl=60)
+_TOKEN_INFO_LOCK = Lock()
+_TOKEN_INFO_KEY = "active_token"
+
+
+def get_cached_token_info(db: Session) -> Optional[dict]:
+    """
+    Cached wrapper around UpstoxTokenManager.get_token_info().
+
+    Args:
+        db: Database session (only used on cache miss)
+
+    Returns:
+        Dict with token info or None if no active token
+    """
+    with _TOKEN_INFO_LOCK:
+        cached = _TOKEN_INFO_CACHE.get(_TOKEN_INFO_KEY)
+    if cached and cached["expires_at"] > datetime.now(timezone.utc):
+        return cached
+
+    token_info = UpstoxTokenManager(db).get_token_info()
+    if token_info is None:
+        return None
+
+    with _TOKEN_INFO_LOCK:
+        _TOKEN_INFO_CACHE[_TOKEN_INFO_KEY] = token_info
+    return token_info
+
+
+# (access_token, expires_at) for building request headers; entries are
+# re-checked against expires_at so a cached token is never used past expiry.
+_ACCESS_TOKEN_CACHE = TTLCache(maxsize=1, ttl=60)
+
+
+def get_cached_access_token(db: Session) -> Optional[str]:
+    """
+    Cached wrapper around UpstoxTokenManager.get_active_token().
+
+    Args:
+        db: Database session (only used on cache miss)
+
+    Returns:
+        Access token string if valid token exists, None otherwise
+    """
+    with _TOKEN_INFO_LOCK:
+        cached = _ACCESS_TOKEN_CACHE.get(_TOKEN_INFO_KEY)
+    if cached and cached[1] > datetime.now(timezone.utc):
+        return cached[0]
+
+    token_record = UpstoxTokenManager(db).get_active_token_record()
+    if not token_record:
+        return None
+
+    with _TOKEN_INFO_LOCK:
+        _ACCESS_TOKEN_CACHE[_TOKEN_INFO_KEY] = (token_record.access_token, token_record.expires_at)
+    return token_record.access_token
+
+
+def invalidate_token_info_cache() -> None:
+    """Drop cached token info and access token (called whenever a new token is stored)."""
+    with _TOKEN_INFO_LOCK:
+        _TOKEN_INFO_CACHE.clear()
+        _ACCESS_TOKEN_CACHE.clear()
+
+
 class UpstoxTokenManager:
     """Manages Upstox token lifecycle (daily expiry at 23:59 IST)."""
 
@@ -25,6 +97,16 @@ class UpstoxTokenManager:
         Returns:
             Access token string if valid token exists, None otherwise
         """
+        token_record = self.get_active_token_record()
+        return token_record.access_token if token_record else None
+
+    def get_active_token_record(self) -> Optional[UpstoxToken]:
+        """
+        Get current valid token record and mark it as used.
+
+        Returns:
+            Active UpstoxToken record, or None if no valid token exists
+        """
         now = datetime.now(self.ist)
 
         token_record = self.db.query(UpstoxToken).filter(
@@ -36,7 +118,7 @@ class UpstoxTokenManager:
             # Update last_used_at
             token_record.last_used_at = now
             self.db.commit()
-            return token_record.access_token
+            return token_record
 
         return None
 
@@ -77,6 +159,8 @@ class UpstoxTokenManager:
         self.db.commit()
         self.db.refresh(new_token)
 
+        invalidate_token_info_cache()
+
         return new_token
 
     def is_token_expired(self) -> bool:
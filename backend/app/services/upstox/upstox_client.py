@@ -5,9 +5,140 @@ This module provides a simple client for making Upstox API calls
 with automatic token management.
 """
 
+import asyncio
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from fastapi import Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import Dict
-from app.services.upstox.token_manager import UpstoxTokenManager
+from typing import Dict, Optional
+from app.database.session import get_db
+from app.services.upstox.token_manager import UpstoxTokenManager, get_cached_access_token
+
+
+UPSTOX_API_BASE_URL = "https://api.upstox.com"
+
+# Shared keep-alive pool for async Upstox calls (opened/closed by the app lifespan)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def start_http_client() -> httpx.AsyncClient:
+    """
+    Create the shared Upstox AsyncClient (idempotent).
+
+    Returns:
+        The process-wide httpx.AsyncClient
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            base_url=UPSTOX_API_BASE_URL,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=10.0,
+            # Concurrent calls multiplex over one TLS connection; falls back to
+            # keep-alive HTTP/1.1 if the server does not negotiate h2
+            http2=True
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared Upstox AsyncClient and its pooled connections."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# Shared keep-alive pool for the sync services (daily quotes, historical
+# backfills, instrument master), which run on threadpool/background threads.
+# Sized for their concurrent fetches (see HISTORICAL_FETCH_WORKERS).
+_UPSTOX_SESSION = requests.Session()
+_UPSTOX_SESSION.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=16))
+
+
+def get_upstox_session() -> requests.Session:
+    """Return the process-wide session used for sync Upstox API calls."""
+    return _UPSTOX_SESSION
+
+
+def close_upstox_session() -> None:
+    """Close the pooled sync Upstox connections (called on application shutdown)."""
+    _UPSTOX_SESSION.close()
+
+
+# In-flight GETs keyed by URL + params (see get_coalesced)
+_INFLIGHT: Dict[str, asyncio.Task] = {}
+
+
+async def get_coalesced(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: Dict[str, str],
+    params: Optional[Dict[str, str]] = None
+) -> httpx.Response:
+    """
+    Single-flight GET: concurrent identical requests share one upstream call.
+
+    Fan-out n8n workflows often fire the same quote/candle request many times
+    at once; only the first reaches Upstox, the rest await its response.
+    The entry is dropped as soon as the call finishes, so nothing is cached.
+
+    Args:
+        client: Shared Upstox AsyncClient
+        url: Path relative to the client's base URL
+        headers: Request headers (same Bearer token for all callers)
+        params: Optional query parameters
+
+    Returns:
+        The (fully read) upstream httpx.Response
+    """
+    key = url if not params else f"{url}?{sorted(params.items())}"
+    task = _INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(client.get(url, params=params, headers=headers))
+        _INFLIGHT[key] = task
+        task.add_done_callback(lambda _: _INFLIGHT.pop(key, None))
+    # shield: one caller being cancelled must not cancel the shared call
+    return await asyncio.shield(task)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    FastAPI dependency returning the shared Upstox AsyncClient.
+
+    Falls back to creating it lazily when used outside the app lifespan
+    (e.g. scripts).
+    """
+    return _http_client or start_http_client()
+
+
+NO_TOKEN_MESSAGE = (
+    "No valid Upstox token available. Please login first using "
+    "POST /api/v1/auth/upstox/login"
+)
+
+
+def build_headers(token: str) -> Dict[str, str]:
+    """Build Upstox request headers for a Bearer token."""
+    return {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/json",
+        "Content-Type": "application/json"
+    }
+
+
+def get_upstox_headers(db: Session = Depends(get_db)) -> Dict[str, str]:
+    """
+    FastAPI dependency returning Upstox headers from the cached active token.
+
+    Raises:
+        HTTPException: 401 if no valid token is available
+    """
+    token = get_cached_access_token(db)
+    if not token:
+        raise HTTPException(status_code=401, detail={"message": NO_TOKEN_MESSAGE})
+    return build_headers(token)
 
 
 class UpstoxClient:
@@ -33,19 +164,12 @@ class UpstoxClient:
         Raises:
             Exception: If no valid token is available
         """
-        token = self.token_manager.get_active_token()
+        token = get_cached_access_token(self.db)
 
         if not token:
-            raise Exception(
-                "No valid Upstox token available. Please login first using "
-                "POST /api/v1/auth/upstox/login"
-            )
-
-        return {
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
+            raise Exception(NO_TOKEN_MESSAGE)
+
+        return build_headers(token)
 
     def is_token_valid(self) -> bool:
         """
@@ -0,0 +1,46 @@
+"""
+ETag helpers for endpoints whose payload changes rarely (market status, holidays).
+
+Clients that send the last ETag back in If-None-Match get an empty 304 instead
+of the full JSON body.
+"""
+
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+
+
+def compute_etag(*parts) -> str:
+    """
+    Build a strong ETag from the values that define a response's content.
+
+    Args:
+        parts: Values (str/bytes/anything with a stable str()) to hash
+
+    Returns:
+        Quoted ETag string
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"|")
+    return f'"{digest.hexdigest()}"'
+
+
+def not_modified_response(request: Request, etag: str, max_age: int) -> Optional[Response]:
+    """
+    Return a 304 response if the client already has this ETag, else None.
+
+    Args:
+        request: Incoming request (If-None-Match is read from it)
+        etag: Current ETag for the resource
+        max_age: Cache-Control max-age in seconds
+    """
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers(etag, max_age))
+    return None
+
+
+def cache_headers(etag: str, max_age: int) -> dict:
+    """ETag + Cache-Control headers for a revalidatable response."""
+    return {"ETag": etag, "Cache-Control": f"max-age={max_age}, must-revalidate"}
@@ -0,0 +1,189 @@
+"""
+Bulk loading helpers built on PostgreSQL COPY.
+
+Parsed NSE files are streamed into the database with COPY ... FROM STDIN
+instead of per-row INSERTs. Upserts COPY into a transaction-scoped temp
+table and apply it with MERGE.
+
+Both helpers run on the session's own connection, so they share its
+transaction: the caller still decides when to commit or roll back.
+Rows are sent in batches of at most MAX_BATCH_SIZE per COPY/MERGE, which
+bounds the in-memory CSV buffer and the size of each MERGE.
+"""
+import csv
+import io
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Unquoted \N is NULL; None would otherwise be written as "" (an empty string)
+COPY_NULL = r"\N"
+
+# Larger batches stop paying off for PostgreSQL (and grow the CSV buffer)
+MAX_BATCH_SIZE = 10_000
+
+
+def _batches(rows: List[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+
+def _copy_from_rows(cursor, table: str, columns: Sequence[str], rows: List[Dict]) -> None:
+    """Serialize rows to CSV in memory and COPY them into table."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([COPY_NULL if row.get(column) is None else row.get(column) for column in columns])
+    buffer.seek(0)
+
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+        buffer
+    )
+
+
+def copy_insert(db: Session, model, rows: List[Dict], batch_size: int = MAX_BATCH_SIZE) -> int:
+    """
+    Append rows to a table with COPY.
+
+    Args:
+        db: SQLAlchemy database session
+        model: SQLAlchemy model class of the target table
+        rows: Row dicts keyed by column name (all rows share the first row's keys)
+        batch_size: Rows per COPY (capped at MAX_BATCH_SIZE)
+
+    Returns:
+        Number of rows copied
+    """
+    if not rows:
+        return 0
+
+    columns = list(rows[0].keys())
+    copied = 0
+    cursor = db.connection().connection.cursor()
+    try:
+        for batch in _batches(rows, batch_size):
+            _copy_from_rows(cursor, model.__tablename__, columns, batch)
+            copied += cursor.rowcount
+        return copied
+    finally:
+        cursor.close()
+
+
+def copy_merge(
+    db: Session,
+    model,
+    rows: List[Dict],
+    key_columns: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+    set_now: Sequence[str] = (),
+    batch_size: int = MAX_BATCH_SIZE
+) -> int:
+    """
+    Upsert rows with COPY into a temp table followed by MERGE, per batch.
+
+    MERGE rejects a target row matched by more than one source row, so rows
+    must already be unique on key_columns.
+
+    Concurrent merges into the same table (e.g. an n8n retry overlapping the
+    original run, or /ingest/all next to a single-source call) are serialised
+    with a transaction-scoped advisory lock on the table name, so they queue
+    instead of deadlocking on each other's row locks. The lock is released
+    when the caller commits or rolls back.
+
+    Args:
+        db: SQLAlchemy database session
+        model: SQLAlchemy model class of the target table
+        rows: Row dicts keyed by column name (all rows share the first row's keys)
+        key_columns: Columns identifying an existing row (the conflict target)
+        update_columns: Columns overwritten on a match (default: all non-key columns)
+        set_now: Columns set to now() on a match (e.g. updated_at)
+        batch_size: Rows per COPY + MERGE round (capped at MAX_BATCH_SIZE)
+
+    Returns:
+        Number of rows inserted or updated
+    """
+    if not rows:
+        return 0
+
+    table = model.__tablename__
+    staging = f"tmp_{table}"
+    columns = list(rows[0].keys())
+    if update_columns is None:
+        update_columns = [column for column in columns if column not in key_columns]
+
+    merged = 0
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"copy_merge:{table}",))
+
+        # Only the loaded columns, no defaults/constraints; dropped at commit.
+        # Temp tables are never WAL-logged, so the COPY itself writes no WAL;
+        # only the MERGE into the logged target does. Both statements go in
+        # one round-trip.
+        cursor.execute(
+            f"DROP TABLE IF EXISTS {staging}; "
+            f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {', '.join(columns)} FROM {table} WITH NO DATA"
+        )
+
+        match = " AND ".join(f"t.{column} = s.{column}" for column in key_columns)
+        update_set = ", ".join(
+            [f"{column} = s.{column}" for column in update_columns] + [f"{column} = now()" for column in set_now]
+        )
+        insert_values = ", ".join(f"s.{column}" for column in columns)
+        merge_sql = (
+            f"MERGE INTO {table} t USING {staging} s ON {match} "
+            + (f"WHEN MATCHED THEN UPDATE SET {update_set} " if update_set else "")
+            + f"WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}) VALUES ({insert_values})"
+        )
+
+        for batch_number, batch in enumerate(_batches(rows, batch_size)):
+            # Empty the staging table between batches only; the last one is
+            # dropped at commit (a single batch is CREATE + COPY + MERGE)
+            if batch_number:
+                cursor.execute(f"TRUNCATE {staging}")
+            _copy_from_rows(cursor, staging, columns, batch)
+            cursor.execute(merge_sql)
+            merged += cursor.rowcount
+        return merged
+    finally:
+        cursor.close()
+
+
+@contextmanager
+def secondary_indexes_dropped(db: Session, model) -> Iterator[None]:
+    """
+    Drop a table's non-unique indexes for a bulk load and rebuild them after.
+
+    Building an index once over the loaded table is cheaper than maintaining
+    it row by row, which pays off for first-time loads and large catch-ups.
+    Unique/primary indexes are kept (MERGE and constraints rely on them).
+    Everything runs in the session's transaction: on an exception the caller's
+    rollback restores the dropped indexes. DROP INDEX locks the table until
+    commit, so reserve this for loads that can afford it.
+
+    Args:
+        db: SQLAlchemy database session
+        model: SQLAlchemy model class of the target table
+    """
+    definitions = db.execute(
+        text(
+            "SELECT i.relname, pg_get_indexdef(ix.indexrelid) "
+            "FROM pg_index ix JOIN pg_class i ON i.oid = ix.indexrelid "
+            "WHERE ix.indrelid = CAST(:table AS regclass) "
+            "AND NOT ix.indisunique AND NOT ix.indisprimary"
+        ),
+        {"table": model.__tablename__}
+    ).all()
+
+    for index_name, _ in definitions:
+        db.execute(text(f'DROP INDEX "{index_name}"'))
+
+    yield
+
+    for _, index_definition in definitions:
+        db.execute(text(index_definition))
@@ -2,35 +2,108 @@
 FastAPI application entry point for Stock Screener Platform.
 """
 import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
 from app.core.config import settings
 from app.core.logging_config import setup_logging
 from app.api.v1 import health, ingest, auth, status, metrics, screeners
-from app.database.session import engine
+from app.database.session import engine, async_engine, get_db_context
 from app.database.base import Base
+from app.services.upstox.upstox_client import start_http_client, close_http_client, close_upstox_session
+from app.services.upstox.instrument_service import get_symbol_instrument_map
+from app.services.nse.archive_cache import close_nse_session
 
-# Configure logging on application startup
+# Configure logging on application startup. Several worker processes would
+# write and rotate the same RotatingFileHandler files, so multi-worker
+# deployments log to stdout only (collected by the container runtime).
 setup_logging(
     log_level=settings.LOG_LEVEL if hasattr(settings, 'LOG_LEVEL') else "INFO",
     log_dir="logs",
-    enable_file_logging=True,
+    enable_file_logging=settings.WEB_WORKERS <= 1,
     enable_console_logging=True
 )
 
 logger = logging.getLogger(__name__)
 
+
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that leaves the NDJSON job progress streams uncompressed.
+
+    Starlette's gzip responder never flushes zlib between chunks, so a
+    compressed /ingest/status/{job_id}/stream would deliver no lines until
+    the job finished for any client sending Accept-Encoding: gzip.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith("/api/v1/ingest/status/") \
+                and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan handler.
+
+    Startup: creates database tables if they don't exist, warms the
+    symbol -> instrument_key map cache and opens the shared Upstox
+    HTTP client. Shutdown: closes the pooled connections of the Upstox
+    clients (async and sync), the NSE archive session and the async engine.
+    Runs once per Uvicorn worker, so each process owns its client and pools.
+    Note: In Phase 1.1+, table creation will be replaced by Alembic migrations.
+    """
+    logger.info(f"Starting Stock Screener API in {settings.ENV} mode")
+    logger.info(f"Database: {settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}")
+
+    # Create tables (will be replaced by Alembic in Phase 1.1)
+    Base.metadata.create_all(bind=engine)
+    logger.info("Database tables created/verified")
+
+    # Warm this worker's symbol map; each lookup re-checks a version token, so a
+    # rebuild by /ingest/upstox-instruments on any worker is picked up everywhere
+    with get_db_context() as db:
+        symbol_map = get_symbol_instrument_map(db)
+    logger.info(f"Loaded {len(symbol_map)} symbol instrument mappings")
+
+    start_http_client()
+
+    yield
+
+    logger.info("Shutting down Stock Screener API")
+    await close_http_client()
+    close_upstox_session()
+    close_nse_session()
+    await async_engine.dispose()
+
+    # Multiprocess Prometheus mode: drop this worker's live gauges
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(os.getpid())
+
+
 # Create FastAPI application
 app = FastAPI(
     title="Indian Stock Market Screener API",
     version="1.0.0",
     description="Data aggregation and screening platform for Indian stock markets (NSE)",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    # orjson (C extension) encodes the large candle/metrics payloads much faster than stdlib json
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
-# Prometheus metrics instrumentation
+# Prometheus metrics instrumentation. With several workers the Dockerfile sets
+# PROMETHEUS_MULTIPROC_DIR: every worker writes its samples there and /metrics
+# aggregates all of them instead of returning one random worker's counters.
 Instrumentator().instrument(app).expose(app, endpoint="/metrics")
 
 # Configure CORS middleware
@@ -42,6 +115,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON payloads (candle arrays, ingestion stats/error lists);
+# small responses like /health and the NDJSON progress streams stay uncompressed
+app.add_middleware(StreamingAwareGZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Include API routers
 app.include_router(health.router, prefix="/api/v1", tags=["Health"])
 app.include_router(status.router, prefix="/api/v1/status", tags=["Status & Monitoring"])
@@ -51,27 +128,6 @@ app.include_router(metrics.router, prefix="/api/v1/metrics", tags=["Metrics Calc
 app.include_router(screeners.router, prefix="/api/v1/screeners", tags=["Stock Screeners"])
 
 
-@app.on_event("startup")
-async def startup_event():
-    """
-    Application startup event handler.
-    Creates database tables if they don't exist.
-    Note: In Phase 1.1+, this will be replaced by Alembic migrations.
-    """
-    logger.info(f"Starting Stock Screener API in {settings.ENV} mode")
-    logger.info(f"Database: {settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}")
-
-    # Create tables (will be replaced by Alembic in Phase 1.1)
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created/verified")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Application shutdown event handler."""
-    logger.info("Shutting down Stock Screener API")
-
-
 @app.get("/")
 async def root():
     """Root endpoint with API information."""